@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+"""
+Benchmarks of the session hot paths against an in-process fake of the TMEX library.
+
+The fake implements the tmex.tmex functions used by TMEXBackend on a simulated bus of DS18B20 and DS2438 devices, with
+a simulated round trip latency for every library call and a simulated time for every byte on the wire. The devices
+convert in their datasheet conversion times. Every benchmark reports the library calls, the 1-Wire bytes, the wall
+time and the CPU time per cycle. The CPU time includes the fake.
+
+The DS18B20s have alarm thresholds around their temperatures, so pollAlarms finds no alarming devices.
+
+usage: python benchmark.py [--devices 1,10,100,1000] [--cycles 3] [--call-latency 0.0005] [--byte-latency 0.00007]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tmex
+
+# CPU time of the process
+if hasattr(time, 'process_time'):
+    cpuTime = time.process_time
+else:
+    cpuTime = time.clock # Python 2
+
+# Simulated time of a reset pulse and presence detect in bytes on the wire
+RESET_BYTES = 1
+# Simulated time of a search step, the ROM command and three time slots for each of the 64 ROM bits, in bytes
+SEARCH_BYTES = 25
+
+_IDLE = 0
+_ROM = 1
+_MATCH = 2
+_FUNCTION = 3
+
+class FakeTMEX(object):
+    """
+    Fake of the TMEX library functions used by TMEXBackend, see tmex.tmex.
+
+    The function commands are passed to simulated devices, see tmex.simulator. The ROM commands and the searches are
+    handled by the fake itself with lookups instead of bit by bit, so a bus of a thousand devices does not dominate the
+    measured CPU time.
+    """
+
+    def __init__(self, devices, callLatency=0.0005, byteLatency=0.00007, clock=tmex.system.monotonic):
+        """
+        Initializes the fake library.
+
+        devices:
+            A list of simulated devices on the bus.
+
+        callLatency:
+            The simulated round trip time in seconds of a library call to the adapter.
+
+        byteLatency:
+            The simulated time in seconds of a byte on the wire, about 70 us at standard speed.
+        """
+        self.callLatency = callLatency
+        self.byteLatency = byteLatency
+        self.clock = clock
+        self.devices = list(devices)
+        self._byRom = dict((bytes(bytearray(device.rom)), device) for device in self.devices)
+        self._order = sorted(self.devices, key=lambda device: self._searchKey(device.rom))
+        self._keys = [self._searchKey(device.rom) for device in self._order]
+        self._mode = _IDLE
+        self._selected = []
+        self._touched = set()
+        self._buffer = bytearray()
+        self._position = -1
+        self._current = None
+        self._alarms = []
+        self._busyUntil = 0.0
+        self.calls = 0
+        self.bytes = 0
+
+    def _searchKey(self, rom):
+        """
+        Returns a key sorting ROMs in the order of the search algorithm, least significant bit first.
+        """
+        return ''.join(['1' if rom[i >> 3] & (1 << (i & 0x07)) else '0' for i in range(64)])
+
+    def _call(self, byteCount):
+        """
+        Accounts for a library call that puts a number of bytes on the wire, and waits out its simulated time.
+        """
+        self.calls += 1
+        self.bytes += byteCount
+        now = self.clock()
+        self._busyUntil = max(self._busyUntil, now) + self.callLatency + byteCount * self.byteLatency
+        # Sleep in chunks to keep the sleep overhead from adding up on short calls
+        if self._busyUntil - now > 0.001:
+            time.sleep(self._busyUntil - now)
+
+    def _reset(self):
+        for device in self._touched:
+            device.reset()
+        self._touched = set()
+        self._selected = []
+        self._mode = _ROM if self.devices else _IDLE
+        return 1 if self.devices else 0
+
+    def _touch(self, byte):
+        byte &= 0xFF
+        if self._mode == _FUNCTION:
+            now = self.clock()
+            result = byte
+            for device in self._selected:
+                result &= device.touch(byte, now)
+            return result
+        if self._mode == _ROM:
+            if byte == 0xCC: # SKIP ROM
+                self._selected = self.devices
+                self._touched.update(self.devices)
+                self._mode = _FUNCTION
+            elif byte == 0x55: # MATCH ROM
+                self._buffer = bytearray()
+                self._mode = _MATCH
+            else:
+                self._mode = _IDLE
+            return byte
+        if self._mode == _MATCH:
+            self._buffer.append(byte)
+            if len(self._buffer) == 8:
+                device = self._byRom.get(bytes(self._buffer))
+                self._selected = [device] if device is not None else []
+                self._touched.update(self._selected)
+                self._mode = _FUNCTION
+            return byte
+        return 0xFF
+
+    def TMReadDefaultPort(self, portNumber, portType):
+        self._call(0)
+        return 1
+
+    def TMExtendedStartSession(self, portNumber, portType, reserved):
+        self._call(0)
+        return 1
+
+    def TMSetup(self, handle):
+        self._call(RESET_BYTES)
+        return 1
+
+    def TMValidSession(self, handle):
+        self._call(0)
+        return 1
+
+    def TMEndSession(self, handle):
+        self._call(0)
+        return 1
+
+    def TMTouchReset(self, handle):
+        self._call(RESET_BYTES)
+        return self._reset()
+
+    def TMTouchBit(self, handle, bit):
+        self._call(1)
+        return bit & 0x01
+
+    def TMTouchByte(self, handle, byte):
+        self._call(1)
+        return self._touch(byte)
+
+    def TMBlockIO(self, handle, block, length):
+        self._call(RESET_BYTES + length)
+        self._reset()
+        for index in range(length):
+            block[index] = self._touch(block[index])
+        return length
+
+    def TMBlockStream(self, handle, block, length):
+        self._call(length)
+        for index in range(length):
+            block[index] = self._touch(block[index])
+        return length
+
+    def TMOneWireLevel(self, handle, operation, level, prime):
+        self._call(0)
+        return level
+
+    def TMFirst(self, handle, context):
+        self._position = -1
+        return self.TMNext(handle, context)
+
+    def TMNext(self, handle, context):
+        self._call(RESET_BYTES + SEARCH_BYTES)
+        self._reset()
+        self._position += 1
+        if self._position >= len(self._order):
+            self._current = None
+            return 0
+        self._current = self._order[self._position]
+        return 1
+
+    def TMFirstAlarm(self, handle, context):
+        now = self.clock()
+        self._alarms = [device for device in self._order if device.alarming(now)]
+        self._position = -1
+        return self.TMNextAlarm(handle, context)
+
+    def TMNextAlarm(self, handle, context):
+        self._call(RESET_BYTES + SEARCH_BYTES)
+        self._reset()
+        self._position += 1
+        if self._position >= len(self._alarms):
+            self._current = None
+            return 0
+        self._current = self._alarms[self._position]
+        return 1
+
+    def TMFamilySearchSetup(self, handle, context, family):
+        self._call(0)
+        key = self._searchKey([family, 0, 0, 0, 0, 0, 0, 0])
+        # The next search finds the first device at or after the family in the search order
+        self._position = -1
+        for index, deviceKey in enumerate(self._keys):
+            if deviceKey >= key:
+                self._position = index - 1
+                break
+        else:
+            self._position = len(self._order) - 1
+        return 1
+
+    def TMRom(self, handle, context, rom):
+        self._call(0)
+        if rom[0] != 0:
+            self._current = self._byRom.get(bytes(bytearray([x & 0xFF for x in rom])))
+            return 1
+        if self._current is None:
+            return -1
+        for index, value in enumerate(self._current.rom):
+            rom[index] = value
+        return 1
+
+    def TMStrongAccess(self, handle, context):
+        self._call(RESET_BYTES + SEARCH_BYTES)
+        self._reset()
+        return 1 if self._current is not None else 0
+
+def createDevices(count):
+    """
+    Creates a bus of simulated devices, a DS2438 for every tenth device and DS18B20s for the rest.
+    """
+    devices = []
+    for index in range(count):
+        serial = 0x1000 + index
+        if index % 10 == 9:
+            devices.append(tmex.SimulatedDS2438(serial, temperature=20.0 + (index % 7), humidity=45.0))
+        else:
+            devices.append(tmex.SimulatedDS18B20(serial, temperature=15.0 + (index % 13) * 0.5, th=30, tl=0))
+    return devices
+
+def measure(library, cycles, func):
+    """
+    Runs a function a number of times.
+
+    returns a dict of the library calls, bytes, wall time and CPU time per cycle.
+    """
+    calls = library.calls
+    byteCount = library.bytes
+    wall = tmex.system.monotonic()
+    cpu = cpuTime()
+    for cycle in range(cycles):
+        func()
+    wall = tmex.system.monotonic() - wall
+    cpu = cpuTime() - cpu
+    return {
+        'transactions': (library.calls - calls) / float(cycles),
+        'bytes': (library.bytes - byteCount) / float(cycles),
+        'wall': wall / cycles,
+        'cpu': cpu / cycles,
+    }
+
+def benchmark(deviceCount, cycles, callLatency, byteLatency):
+    """
+    Benchmarks enumrate, readDevice of every device, readDevices of all devices and pollAlarms of all devices on a
+    bus.
+
+    returns a list of result dicts.
+    """
+    library = FakeTMEX(createDevices(deviceCount), callLatency, byteLatency)
+    session = tmex.Session(backend=tmex.TMEXBackend(library))
+    devices = {}
+
+    def enumerateBus():
+        devices.update(session.enumrate())
+
+    def readEach():
+        for deviceId in devices:
+            session.readDevice(deviceId)
+
+    def readAll():
+        session.readDevices(list(devices), timeStamp=False)
+
+    def pollAlarms():
+        session.pollAlarms(list(devices), timeStamp=False, sweepInterval=float('inf'))
+
+    results = []
+    for name, func in (('enumrate', enumerateBus), ('readDevice', readEach), ('readDevices', readAll),
+            ('pollAlarms', pollAlarms)):
+        if name == 'pollAlarms':
+            # The first poll is a full read
+            func()
+        result = measure(library, cycles, func)
+        result['benchmark'] = name
+        result['devices'] = deviceCount
+        results.append(result)
+    if len(devices) != deviceCount:
+        raise tmex.TMEXException('Found %d of %d devices' % (len(devices), deviceCount))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the session against a fake TMEX library.')
+    parser.add_argument('--devices', default='1,10,100,1000',
+        help='comma separated device counts of the simulated buses')
+    parser.add_argument('--cycles', type=int, default=3, help='cycles of each benchmark')
+    parser.add_argument('--call-latency', type=float, default=0.0005,
+        help='simulated round trip time of a library call in seconds')
+    parser.add_argument('--byte-latency', type=float, default=0.00007,
+        help='simulated time of a byte on the wire in seconds')
+    parser.add_argument('--json', help='a file to write the results to as JSON, for comparing runs')
+    args = parser.parse_args()
+
+    results = []
+    print('%-12s %8s %14s %12s %12s %12s' % ('benchmark', 'devices', 'transactions', 'bytes', 'wall ms', 'cpu ms'))
+    for deviceCount in [int(x) for x in args.devices.split(',')]:
+        for result in benchmark(deviceCount, args.cycles, args.call_latency, args.byte_latency):
+            print('%-12s %8d %14.0f %12.0f %12.2f %12.2f' % (result['benchmark'], result['devices'],
+                result['transactions'], result['bytes'], result['wall'] * 1000.0, result['cpu'] * 1000.0))
+            sys.stdout.flush()
+            results.append(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
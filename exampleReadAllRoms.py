@@ -4,7 +4,6 @@
 
 import sys
 import tmex
-import time
 
 def main():
     session = tmex.Session()
@@ -13,10 +12,11 @@ def main():
     for key, device in tmex.iteritems(devices):
         print('%s: %s %s' % (key, device['name'], device['description']))
 
-    while True:
-        try:
-            devices = list(devices)
-            data = session.readDevices(devices=devices, familyFilter=['DS18B2'], timeStamp=True)
+    devices = list(devices)
+    stream = session.stream(2.0, devices=devices, familyFilter=['DS18B2'], timeStamp=True)
+    try:
+        for batch in stream:
+            data = batch.readout
             deviceCount = 0
             for rom in data:
                 if rom in devices:
@@ -27,11 +27,12 @@ def main():
                     deviceCount += 1
             if 'delta' in data:
                 delta = data['delta'].total_seconds()
-                print("{} sensors were surveyed for {} seconds\n".format(deviceCount, delta))
-            print("Sleeping 2 seconds ...")
-            time.sleep(2)
-        except KeyboardInterrupt:
-            break
+                print("{} sensors were surveyed for {} seconds".format(deviceCount, delta))
+            print("{} reads skipped, {} dropped\n".format(batch.overruns, batch.dropped))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.close()
 
 if __name__ == "__main__":
     main();
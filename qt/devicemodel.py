@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from PyQt4 import QtCore
+
+COLUMN_ID = 0
+COLUMN_TEMPERATURE = 1
+COLUMN_HUMIDITY = 2
+COLUMN_DEVICE = 3
+COLUMN_DESCRIPTION = 4
+
+HEADERS = [u"Id", u"Temperature", u"Humidity", u"Device", u"Description"]
+
+# Number of rows made visible to the view at a time
+FETCH_SIZE = 256
+
+class DeviceRow(object):
+    __slots__ = ('deviceId', 'checked', 'temperature', 'humidity', 'name', 'description')
+
+    def __init__(self, deviceId, name, description):
+        self.deviceId = deviceId
+        self.checked = True
+        self.temperature = None
+        self.humidity = None
+        self.name = name
+        self.description = description
+
+class DeviceModel(QtCore.QAbstractTableModel):
+    """
+    Table model of the devices on the bus and their latest readings.
+
+    Rows are found by device id through an index, and the readings of a batch are announced with a single dataChanged
+    signal. Rows are handed to the view in chunks of FETCH_SIZE as it scrolls, see canFetchMore.
+    """
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self._rows = []
+        self._index = {}
+        self._fetched = 0
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._fetched
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(HEADERS)
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+        return self._fetched < len(self._rows)
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(FETCH_SIZE, len(self._rows) - self._fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return QtCore.QVariant(HEADERS[section])
+        return QtCore.QVariant()
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        flags = QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled
+        if index.column() == COLUMN_ID:
+            flags |= QtCore.Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._fetched:
+            return QtCore.QVariant()
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            if column == COLUMN_ID:
+                return QtCore.QVariant(row.deviceId)
+            elif column == COLUMN_TEMPERATURE and row.temperature is not None:
+                return QtCore.QVariant(u"%.2f °C" % row.temperature)
+            elif column == COLUMN_HUMIDITY and row.humidity is not None:
+                return QtCore.QVariant(u"%.0f %%" % row.humidity)
+            elif column == COLUMN_DEVICE:
+                return QtCore.QVariant(row.name)
+            elif column == COLUMN_DESCRIPTION:
+                return QtCore.QVariant(row.description)
+        elif role == QtCore.Qt.CheckStateRole and column == COLUMN_ID:
+            return QtCore.QVariant(QtCore.Qt.Checked if row.checked else QtCore.Qt.Unchecked)
+        return QtCore.QVariant()
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole or index.column() != COLUMN_ID:
+            return False
+        state, ok = value.toInt()
+        self._rows[index.row()].checked = state == QtCore.Qt.Checked
+        self.dataChanged.emit(index, index)
+        return True
+
+    def setDevices(self, devices):
+        """
+        Adds or updates devices.
+
+        devices:
+            A dict of device information by device id, see tmex.Session.enumrate.
+
+        returns a list of the device ids of the added devices.
+        """
+        added = []
+        first = None
+        last = None
+        for deviceId, information in devices.iteritems():
+            name = unicode(information.get('name', u""))
+            description = unicode(information.get('description', u""))
+            rowIndex = self._index.get(deviceId)
+            if rowIndex is None:
+                self._index[deviceId] = len(self._rows)
+                self._rows.append(DeviceRow(deviceId, name, description))
+                added.append(deviceId)
+            else:
+                row = self._rows[rowIndex]
+                row.name = name
+                row.description = description
+                if rowIndex < self._fetched:
+                    first = rowIndex if first is None else min(first, rowIndex)
+                    last = rowIndex if last is None else max(last, rowIndex)
+        if first is not None:
+            self.dataChanged.emit(self.index(first, COLUMN_DEVICE), self.index(last, COLUMN_DESCRIPTION))
+        # Show the first chunk right away, the rest is fetched by the view as it scrolls
+        if self._fetched < FETCH_SIZE and self.canFetchMore(QtCore.QModelIndex()):
+            self.fetchMore(QtCore.QModelIndex())
+        return added
+
+    def updateReadouts(self, readouts):
+        """
+        Sets the latest readings of devices.
+
+        readouts:
+            A dict of readings by device id, see tmex.Session.readDevices. Unknown device ids are ignored.
+
+        returns a list of the device ids that were updated.
+        """
+        updated = []
+        first = None
+        last = None
+        for deviceId, readout in readouts.iteritems():
+            rowIndex = self._index.get(deviceId)
+            if rowIndex is None or not isinstance(readout, dict):
+                continue
+            row = self._rows[rowIndex]
+            if 'temperature' in readout:
+                row.temperature = readout['temperature']
+            if 'humidity' in readout:
+                row.humidity = readout['humidity']
+            updated.append(deviceId)
+            if rowIndex < self._fetched:
+                first = rowIndex if first is None else min(first, rowIndex)
+                last = rowIndex if last is None else max(last, rowIndex)
+        if first is not None:
+            self.dataChanged.emit(self.index(first, COLUMN_TEMPERATURE), self.index(last, COLUMN_HUMIDITY))
+        return updated
+
+    def checkedDevices(self):
+        """
+        Returns the device ids of the checked devices.
+        """
+        return [row.deviceId for row in self._rows if row.checked]
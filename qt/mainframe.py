@@ -5,13 +5,13 @@
 import sys
 import time, datetime
 import multiprocessing
-import csv
 
 from PyQt4 import QtGui
 from PyQt4 import QtCore
 
 from worker import oneWireWorker, Command, Result
-from tmex import TMEXException
+from devicemodel import DeviceModel
+from tmex import TMEXException, HistoryStore
 
 class MainFrame(QtGui.QMainWindow):
     def __init__(self):
@@ -24,7 +24,12 @@ class MainFrame(QtGui.QMainWindow):
 
         # Initialize members
         self.updateTimer = None
+        # True while a batch read is in progress in the worker
+        self.readPending = False
         self.workerTimer = self.startTimer(100)
+        # Readings are buffered by the history store and written once a minute
+        self.history = HistoryStore('history')
+        self.historyTimer = self.startTimer(60000)
 
         self.initializeWidgets()
         self.initializeMenus()
@@ -35,9 +40,16 @@ class MainFrame(QtGui.QMainWindow):
     def initializeWidgets(self):
         box = QtGui.QVBoxLayout()
 
-        self.sourcesList = QtGui.QTreeWidget(self)
-        self.sourcesList.setRootIsDecorated(False)
-        self.sourcesList.setHeaderLabels(QtCore.QStringList([u"Id", u"Temperature", u"Humidity", u"Device", u"Description"]))
+        self.devices = DeviceModel(self)
+        self.sourcesList = QtGui.QTableView(self)
+        self.sourcesList.setModel(self.devices)
+        self.sourcesList.setSelectionBehavior(QtGui.QAbstractItemView.SelectRows)
+        self.sourcesList.setShowGrid(False)
+        self.sourcesList.setWordWrap(False)
+        # Fixed row heights, so the view does not measure every row
+        self.sourcesList.verticalHeader().setResizeMode(QtGui.QHeaderView.Fixed)
+        self.sourcesList.verticalHeader().hide()
+        self.sourcesList.horizontalHeader().setStretchLastSection(True)
         self.sourcesList.setColumnWidth(0, 150)
         self.sourcesList.setColumnWidth(1, 75)
         self.sourcesList.setColumnWidth(2, 75)
@@ -86,6 +98,8 @@ class MainFrame(QtGui.QMainWindow):
             self.killTimer(self.updateTimer)
         self.workerChannelLocal.send(Command('exit', None))
         self.killTimer(self.workerTimer)
+        self.killTimer(self.historyTimer)
+        self.history.flush()
 
     def timerEvent(self, event):
         timerId = event.timerId()
@@ -93,14 +107,13 @@ class MainFrame(QtGui.QMainWindow):
             self.workerTimerEvent()
         if (timerId == self.updateTimer):
             self.updateTimerEvent()
+        if (timerId == self.historyTimer):
+            self.history.flush()
 
     def updateTimerEvent(self):
-        root = self.sourcesList.invisibleRootItem()
-        for index in xrange(root.childCount()):
-            item = root.child(index)
-            if item.checkState(0) == QtCore.Qt.Checked:
-                key = str(item.text(0))
-                self.readDevice(key)
+        deviceIds = self.devices.checkedDevices()
+        if deviceIds and not self.readPending:
+            self.readDevices(deviceIds)
 
     def updateUpdateInterval(self, int):
         self.startUpdatetimer(int * 1000.0)
@@ -109,42 +122,31 @@ class MainFrame(QtGui.QMainWindow):
         while self.workerChannelLocal.poll():
             obj = self.workerChannelLocal.recv()
             if isinstance(obj, Result):
-                root = self.sourcesList.invisibleRootItem()
-                treeNode = None
-                if obj.deviceId:
-                    for index in xrange(root.childCount()):
-                        node = root.child(index)
-                        if node.text(0) == obj.deviceId:
-                            treeNode = node
-                            break
                 if obj.command == 'enumerate':
-                    if treeNode:
-                        treeNode.setText(3, unicode(obj.result['name']))
-                        treeNode.setText(4, unicode(obj.result['description']))
-                    else:
-                        node = QtGui.QTreeWidgetItem(root, QtCore.QStringList([obj.deviceId, u"", u"", obj.result['name'], obj.result['description']]))
-                        node.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)
-                        node.setCheckState(0, QtCore.Qt.Checked)
-                        root.addChild(node)
-                        self.readDevice(obj.deviceId)
-                elif obj.command == 'read' and treeNode:
-                    dt = datetime.datetime.today()
-                    dt = dt.replace(microsecond=0)
-                    fields = [obj.deviceId, dt.isoformat(' '), "0", "0"]
-                    if 'temperature' in obj.result:
-                        treeNode.setText(1, u"%.2f °C" % obj.result['temperature'])
-                        fields[2] = "%.2f" % (obj.result['temperature'])
-                    if 'humidity' in obj.result:
-                        treeNode.setText(2, u"%.0f %%" % obj.result['humidity'])
-                        fields[3] = "%.2f" % (obj.result['humidity'])
-                    with open('%s.csv' % (obj.deviceId), 'a') as f:
-                        w = csv.writer(f)
-                        w.writerow(fields)
+                    added = self.devices.setDevices(obj.result)
+                    if added:
+                        self.readDevices(added)
+                elif obj.command == 'readDevices':
+                    self.readPending = False
+                    self.storeReadouts(obj.result)
+                elif obj.command == 'read':
+                    self.storeReadouts({obj.deviceId: obj.result})
             if isinstance(obj, TMEXException):
                 print(obj)
 
+    def storeReadouts(self, readouts):
+        now = datetime.datetime.today()
+        for deviceId in self.devices.updateReadouts(readouts):
+            readout = readouts[deviceId]
+            if 'temperature' in readout or 'humidity' in readout:
+                self.history.append(deviceId, readout.get('timestamp', now), readout)
+
     def enumerateDevices(self):
         self.workerChannelLocal.send(Command('enumerate', None))
     
     def readDevice(self, deviceId):
-        self.workerChannelLocal.send(Command('read', deviceId))
\ No newline at end of file
+        self.workerChannelLocal.send(Command('read', deviceId))
+
+    def readDevices(self, deviceIds):
+        self.readPending = True
+        self.workerChannelLocal.send(Command('readDevices', tuple(deviceIds)))
\ No newline at end of file
@@ -1,10 +1,13 @@
-import time
 import multiprocessing
 from collections import namedtuple
 
 from tmex import Session, TMEXException
 
+# Commands to the worker. deviceId is a device id for 'read', a tuple of device ids for 'readDevices' and None for
+# the others.
 Command = namedtuple('Command', ['command', 'deviceId'])
+# Results from the worker. result is a dict of the changed readings by device id for 'readDevices' and a dict of
+# device information by device id for 'enumerate'.
 Result = namedtuple('Result', ['command', 'deviceId', 'result'])
 
 def oneWireWorker(channel, port=0):
@@ -15,29 +18,55 @@ def oneWireWorker(channel, port=0):
     except TMEXException, e:
         channel.send(e)
         run = False
+    # A command received while skipping batch reads, handled next
+    pending = None
     while run:
-        if channel.poll():
-            obj = channel.recv()
-            if isinstance(obj, Command):
-                if obj.command == 'exit':
-                    run = False
-                elif obj.command == 'enumerate':
-                    try:
-                        devices = session.enumrate()
-                        for deviceId, information in devices.iteritems():
-                            channel.send(Result('enumerate', deviceId, information))
-                    except TMEXException, e:
-                        channel.send(e)
-                elif obj.command == 'read':
-                    try:
-                        readout = session.readDevice(obj.deviceId, enableWireLeveling=True)
-                        channel.send(Result('read', obj.deviceId, readout))
-                    except ValueError:
-                        channel.send(TMEXException('Invalid id'))
-                    except TMEXException, e:
-                        channel.send(e)
-        else:
-            time.sleep(0.1)
+        try:
+            if pending is not None:
+                obj = pending
+                pending = None
+            else:
+                obj = channel.recv()
+            # Only the latest of the batch reads in a row is of interest when the reads have fallen behind, a command
+            # of another kind stops the skipping so the batch read is still answered
+            while isinstance(obj, Command) and obj.command == 'readDevices' and channel.poll():
+                following = channel.recv()
+                if isinstance(following, Command) and following.command == 'readDevices':
+                    obj = following
+                else:
+                    pending = following
+                    break
+        except EOFError:
+            break
+        if isinstance(obj, Command):
+            if obj.command == 'exit':
+                run = False
+            elif obj.command == 'enumerate':
+                try:
+                    devices = session.enumrate()
+                    channel.send(Result('enumerate', None, devices))
+                except TMEXException, e:
+                    channel.send(e)
+            elif obj.command == 'read':
+                try:
+                    readout = session.readDevice(obj.deviceId, enableWireLeveling=True)
+                    channel.send(Result('read', obj.deviceId, readout))
+                except ValueError:
+                    channel.send(TMEXException('Invalid id'))
+                except TMEXException, e:
+                    channel.send(e)
+            elif obj.command == 'readDevices':
+                try:
+                    # One broadcast conversion for all devices, and only the readings that changed are passed on,
+                    # see Session.readChanges
+                    known = session.devices()
+                    readout = session.readChanges([deviceId for deviceId in obj.deviceId if deviceId in known]).asDict()
+                    readout.pop('time', None)
+                    readout.pop('delta', None)
+                    channel.send(Result('readDevices', None, readout))
+                except TMEXException, e:
+                    channel.send(Result('readDevices', None, {}))
+                    channel.send(e)
     try:
         channel.send(Result('exit', None, None))
     except IOError:
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from tmex.crc import crc8
+from tmex.simulator import SimulatedDS18B20
+
+def scratchpad(raw, resolution=12):
+    """
+    Returns a DS18B20 scratchpad with a raw temperature and a resolution, including the CRC.
+    """
+    data = [raw & 0xFF, (raw >> 8) & 0xFF, 75, 70, ((resolution - 9) << 5) | 0x1F, 0xFF, 0x0C, 0x10]
+    return bytearray(data + [crc8(data)])
+
+class CorruptDS18B20(SimulatedDS18B20):
+    """
+    A DS18B20 answering READ SCRATCHPAD with a flipped bit, so the CRC check fails.
+    """
+
+    def scratchpad(self):
+        data = SimulatedDS18B20.scratchpad(self)
+        data[0] ^= 0x01
+        return data
+
+class StuckDS18B20(SimulatedDS18B20):
+    """
+    A DS18B20 that never finishes a conversion, it holds the bus low and keeps the power-on value.
+    """
+
+    def _converting(self, now):
+        return 0x00
+
+    def _update(self, now):
+        pass
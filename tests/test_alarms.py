@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2438, SimulatedDS2409
+from tmex.session import Session
+
+class AlarmTest(unittest.TestCase):
+    def setUp(self):
+        self.thermometers = [SimulatedDS18B20(serial, 20.0 + serial, resolution=9) for serial in range(1, 4)]
+        # The last thermometer is behind a coupler
+        self.coupler = SimulatedDS2409(0x900, main=[self.thermometers[2]])
+        self.monitor = SimulatedDS2438(9, 18.0, 40.0)
+        self.session = Session(backend=SimulatedBackend(self.thermometers[:2] + [self.coupler, self.monitor]))
+        self.session.enumrate()
+        self.thermometerIds = [device.deviceId for device in self.thermometers]
+        self.devices = self.thermometerIds + [self.monitor.deviceId]
+        for deviceId in self.thermometerIds:
+            self.assertEqual(self.session.setAlarm(deviceId, 10, 30), {'th': 30, 'tl': 10, 'resolution': 9})
+
+    def poll(self, **kwargs):
+        """
+        Polls the devices, returns the temperatures read by device id.
+        """
+        batch = self.session.pollAlarms(self.devices, **kwargs)
+        return dict((deviceId, batch.temperatures[index]) for index, deviceId in enumerate(batch.devices))
+
+    def testInvalidThresholds(self):
+        self.assertRaises(ValueError, self.session.setAlarm, self.thermometerIds[0], 30, 30)
+
+    def testPoll(self):
+        # The first poll reads all of the devices
+        self.assertEqual(self.poll(), {self.thermometerIds[0]: 21.0, self.thermometerIds[1]: 22.0,
+            self.thermometerIds[2]: 23.0, self.monitor.deviceId: 18.0})
+        # Then only the alarming devices, and the devices of families without alarms
+        self.assertEqual(self.poll(), {self.monitor.deviceId: 18.0})
+        self.thermometers[0].temperature = 35.0
+        self.thermometers[2].temperature = 9.5
+        self.assertEqual(self.poll(), {self.thermometerIds[0]: 35.0, self.thermometerIds[2]: 9.5,
+            self.monitor.deviceId: 18.0})
+        self.assertEqual(sorted(self.session.alarmingDevices()), sorted([self.thermometerIds[0],
+            self.thermometerIds[2]]))
+        self.thermometers[0].temperature = 25.0
+        self.assertEqual(self.poll(), {self.thermometerIds[2]: 9.5, self.monitor.deviceId: 18.0})
+
+    def testThresholds(self):
+        self.poll()
+        # The alarm is raised at the thresholds, from the integer part of the temperature
+        self.thermometers[0].temperature = 30.0
+        self.thermometers[1].temperature = 10.9375
+        self.thermometers[2].temperature = 29.9375
+        self.assertEqual(sorted(self.poll()), sorted([self.thermometerIds[0], self.thermometerIds[1],
+            self.monitor.deviceId]))
+
+    def testSweep(self):
+        self.poll()
+        # Every poll is a full read without a sweep interval
+        self.assertEqual(len(self.poll(sweepInterval=0)), 4)
+        self.assertEqual(len(self.poll()), 1)
+
+    def testFamilyFilter(self):
+        self.poll()
+        self.thermometers[1].temperature = 40.0
+        self.assertEqual(self.poll(familyFilter=[SimulatedDS18B20.family]), {self.thermometerIds[1]: 40.0})
+
+if __name__ == '__main__':
+    unittest.main()
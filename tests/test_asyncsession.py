@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import io
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2409
+from tmex.session import Session
+from tmex.replay import RecordingBackend, ReplayBackend
+from tests.simulated import StuckDS18B20
+
+try:
+    import asyncio
+    from tmex.asyncsession import AsyncSession
+except (ImportError, SyntaxError):
+    AsyncSession = None # Python 2
+
+def temperatures(batch):
+    return [None if value != value else value for value in batch.temperatures]
+
+@unittest.skipIf(AsyncSession is None, 'asyncio is not available')
+class AsyncSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def session(self, backend):
+        """
+        Returns an AsyncSession of a backend with its devices enumerated and their resolutions read.
+        """
+        session = AsyncSession(backend=backend)
+        self.devices = sorted(self.run_(session.enumerate()))
+        for deviceId in self.devices:
+            if deviceId.startswith('28'):
+                self.run_(session.readConfiguration(deviceId))
+        return session
+
+    def testReadBatch(self):
+        session = self.session(SimulatedBackend([SimulatedDS18B20(serial, 20.0 + serial, resolution=9)
+            for serial in (1, 2)]))
+        try:
+            ticks = []
+            def tick():
+                ticks.append(self.loop.call_later(0.01, tick))
+            tick()
+            batch = self.run_(session.readBatch(self.devices))
+            ticks[-1].cancel()
+            self.assertEqual(temperatures(batch), [21.0, 22.0])
+            # The event loop runs while the devices convert
+            self.assertTrue(len(ticks) >= 5)
+            readings = self.run_(session.readDevices(self.devices))
+            self.assertEqual(readings[self.devices[1]]['temperature'], 22.0)
+            # The read is the one of Session, with its metrics and health
+            bus = session._session.result()
+            self.assertEqual(bus.metrics.snapshot().histograms[('cycle', '')].count, 2)
+            self.assertEqual(bus.health.health(self.devices[0]).reads, 2)
+        finally:
+            self.run_(session.close())
+
+    def testRetryBudget(self):
+        stuck = StuckDS18B20(2, 21.0, resolution=9)
+        session = self.session(SimulatedBackend([SimulatedDS18B20(1, 20.0, resolution=9), stuck]))
+        try:
+            bus = session._session.result()
+            bus.retries = 5
+            bus.retryBudget = 0.2
+            batch = self.run_(session.readBatch(self.devices))
+            self.assertEqual(temperatures(batch), [20.0, None])
+            self.assertIsNone(batch[stuck.deviceId].timestamp)
+            counters = bus.metrics.snapshot().counters
+            self.assertTrue(counters[('timeouts', '')] >= 1)
+            self.assertTrue(counters[('retries', stuck.deviceId)] >= 1)
+            self.assertEqual(bus.health.health(stuck.deviceId).failures, 1)
+        finally:
+            self.run_(session.close())
+
+    def testPipelinedBranches(self):
+        deep = SimulatedDS18B20(5, 1.0, resolution=9)
+        coupler = SimulatedDS2409(0x900, main=[SimulatedDS18B20(2, 2.0, resolution=9)],
+            aux=[SimulatedDS2409(0x901, main=[deep])])
+        session = self.session(SimulatedBackend([SimulatedDS18B20(1, 9.0, resolution=9), coupler]))
+        try:
+            session._session.result().pipelineBranches = True
+            index = self.devices.index(deep.deviceId)
+            for temperature in (1.0, 2.0, 3.0):
+                deep.temperature = temperature
+                self.assertEqual(self.run_(session.readBatch(self.devices)).temperatures[index], temperature)
+        finally:
+            self.run_(session.close())
+
+    def testReplay(self):
+        def bus():
+            return SimulatedBackend([SimulatedDS18B20(1, 20.0, resolution=9), StuckDS18B20(2, 21.0, resolution=9)])
+        # A cycle recorded with Session replays with AsyncSession, and the other way around
+        log = io.BytesIO()
+        recorder = Session(backend=RecordingBackend(bus(), log))
+        devices = sorted(recorder.enumrate())
+        for deviceId in devices:
+            recorder.readConfiguration(deviceId)
+        recorded = [temperatures(recorder.readBatch(devices)) for i in range(2)]
+        recorder.backend.close()
+        session = self.session(ReplayBackend(io.BytesIO(log.getvalue())))
+        replayed = [temperatures(self.run_(session.readBatch(devices))) for i in range(2)]
+        self.assertEqual(replayed, recorded)
+        log = io.BytesIO()
+        session = self.session(RecordingBackend(bus(), log))
+        recorded = [temperatures(self.run_(session.readBatch(devices))) for i in range(2)]
+        self.run_(session.close())
+        replay = Session(backend=ReplayBackend(io.BytesIO(log.getvalue())))
+        replay.enumrate()
+        for deviceId in devices:
+            replay.readConfiguration(deviceId)
+        self.assertEqual([temperatures(replay.readBatch(devices)) for i in range(2)], recorded)
+
+if __name__ == '__main__':
+    unittest.main()
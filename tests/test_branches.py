@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2409
+from tmex.session import Session
+from tmex.system import monotonic
+
+# Conversion time in seconds of the 9 bit DS18B20s of the tests
+CONVERSION_TIME = SimulatedDS18B20.conversionTimes[9]
+
+class BranchTest(unittest.TestCase):
+    def setUp(self):
+        self.deep = SimulatedDS18B20(5, 1.0, resolution=9)
+        inner = SimulatedDS2409(0x901, main=[self.deep])
+        self.outer = outer = SimulatedDS2409(0x900, main=[SimulatedDS18B20(2, 2.0, resolution=9), inner],
+            aux=[SimulatedDS18B20(3, 3.0, resolution=9)])
+        self.top = SimulatedDS18B20(1, 9.0, resolution=9)
+        self.bus = SimulatedBackend([self.top, outer])
+        self.session = Session(backend=self.bus)
+        self.devices = sorted(self.session.enumrate())
+        # Learns the resolutions, so the conversions are waited for by the 9 bit conversion time
+        self.session.readConfigurations()
+
+    def readDeep(self, temperatures):
+        """
+        Reads the devices once for every temperature of the device on the deepest branch, returns the temperatures
+        read from it and the longest cycle.
+        """
+        index = self.devices.index(self.deep.deviceId)
+        readings = []
+        longest = 0.0
+        for temperature in temperatures:
+            self.deep.temperature = temperature
+            start = monotonic()
+            batch = self.session.readBatch(self.devices)
+            longest = max(longest, monotonic() - start)
+            readings.append(batch.temperatures[index])
+        return readings, longest
+
+    def testPipeliningIsOptIn(self):
+        self.assertFalse(self.session.pipelineBranches)
+
+    def testTopology(self):
+        topology = self.session.topology()
+        self.assertEqual(len(topology), 4)
+        self.assertEqual(len(topology[None]), 2)
+        branch = self.session.devices()[self.deep.deviceId].branch
+        self.assertEqual(len(branch), 2)
+        self.assertEqual(topology[branch], [self.deep.deviceId])
+
+    def testSequential(self):
+        readings, longest = self.readDeep([1.0, 2.0, 3.0])
+        self.assertEqual(readings, [1.0, 2.0, 3.0])
+
+    def testPipelined(self):
+        self.session.pipelineBranches = True
+        readings, longest = self.readDeep([1.0, 2.0, 3.0, 4.0])
+        # Every cycle reads the conversion it started, not the one of the cycle before
+        self.assertEqual(readings, [1.0, 2.0, 3.0, 4.0])
+        # The branches convert at the same time
+        self.assertLess(longest, 2 * CONVERSION_TIME)
+
+    def testReadDevice(self):
+        self.session.readBatch(self.devices)
+        self.deep.temperature = 5.0
+        # The branch of the device is connected, and the conversion of the device alone is waited for
+        self.assertEqual(self.session.readDevice(self.deep.deviceId, True), {'temperature': 5.0})
+
+    def testMissingCoupler(self):
+        self.bus.removeDevice(self.outer)
+        batch = self.session.readBatch(self.devices)
+        # The devices behind the coupler fail their reads, the one on the bus is read
+        for deviceId in self.devices:
+            if deviceId == self.top.deviceId:
+                self.assertEqual(batch[deviceId].temperature, 9.0)
+            elif deviceId.startswith('28'):
+                self.assertEqual(batch[deviceId].temperature, None)
+                self.assertEqual(batch[deviceId].timestamp, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2438
+from tmex.session import Session
+from tmex.records import ReadingBatch
+from tmex.changes import ChangeFilter
+
+THERMOMETER = '2801000000000029'
+MONITOR = '2609000000000000'
+
+def batch(readings, seconds):
+    """
+    Returns a batch of readings, a dict of values by device id, all read at a monotonic time in seconds.
+    """
+    devices = sorted(readings)
+    result = ReadingBatch(devices)
+    for index, deviceId in enumerate(devices):
+        if readings[deviceId] is not None:
+            result.set(index, readings[deviceId], int(seconds * 1000000000))
+    result.finish()
+    return result
+
+class ChangeFilterTest(unittest.TestCase):
+    def changed(self, changes, readings, seconds):
+        return list(changes.filter(batch(readings, seconds)).devices)
+
+    def testDeadband(self):
+        changes = ChangeFilter(deadband=0.5)
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 1), [THERMOMETER])
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.5}}, 2), [])
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 19.5}}, 3), [])
+        # Moves are measured from the last reported value, not the last read
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.5625}}, 4), [THERMOMETER])
+        self.assertEqual(changes.last(THERMOMETER).temperature, 20.5625)
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.125}}, 5), [])
+
+    def testDeadbandByValue(self):
+        changes = ChangeFilter(deadband={'humidity': 2.0})
+        self.changed(changes, {MONITOR: {'temperature': 20.0, 'humidity': 40.0}}, 1)
+        self.assertEqual(self.changed(changes, {MONITOR: {'temperature': 20.0, 'humidity': 41.5}}, 2), [])
+        # Values without a deadband report any change
+        self.assertEqual(self.changed(changes, {MONITOR: {'temperature': 20.03125, 'humidity': 40.0}}, 3), [MONITOR])
+
+    def testFamily(self):
+        changes = ChangeFilter(deadband=0.1)
+        changes.setFamily(0x28, deadband=1.0)
+        self.changed(changes, {THERMOMETER: {'temperature': 20.0}, MONITOR: {'temperature': 20.0}}, 1)
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.5}, MONITOR: {'temperature': 20.5}}, 2),
+            [MONITOR])
+
+    def testHeartbeat(self):
+        changes = ChangeFilter(deadband=1.0, maxSilence=60.0)
+        self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 100)
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 159.5), [])
+        # Reported after maxSilence without a change, and the silence starts over
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 160), [THERMOMETER])
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 200), [])
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}}, 220), [THERMOMETER])
+
+    def testNoHeartbeat(self):
+        changes = ChangeFilter(maxSilence=None)
+        changes.setFamily(0x26, maxSilence=10.0)
+        readings = {THERMOMETER: {'temperature': 20.0}, MONITOR: {'temperature': 20.0}}
+        self.changed(changes, readings, 100)
+        self.assertEqual(self.changed(changes, readings, 100000), [MONITOR])
+
+    def testMissingValues(self):
+        changes = ChangeFilter(deadband=1.0)
+        self.changed(changes, {MONITOR: {'temperature': 20.0, 'humidity': 40.0}}, 1)
+        # A failed read is not reported and keeps the last values
+        self.assertEqual(self.changed(changes, {MONITOR: None}, 2), [])
+        self.assertEqual(changes.last(MONITOR).humidity, 40.0)
+        # A value that disappears or appears is a change
+        self.assertEqual(self.changed(changes, {MONITOR: {'temperature': 20.0}}, 3), [MONITOR])
+        self.assertEqual(changes.last(MONITOR).humidity, None)
+        self.assertEqual(self.changed(changes, {MONITOR: {'temperature': 20.0, 'humidity': 40.0}}, 4), [MONITOR])
+
+    def testForget(self):
+        changes = ChangeFilter(deadband=1.0)
+        self.changed(changes, {THERMOMETER: {'temperature': 20.0}, MONITOR: {'temperature': 20.0}}, 1)
+        changes.forget(THERMOMETER)
+        self.assertEqual(changes.last(THERMOMETER), None)
+        self.assertEqual(self.changed(changes, {THERMOMETER: {'temperature': 20.0}, MONITOR: {'temperature': 20.0}}, 2),
+            [THERMOMETER])
+        changes.forget()
+        self.assertEqual(len(self.changed(changes, {THERMOMETER: {'temperature': 20.0}, MONITOR: {'temperature': 20.0}},
+            3)), 2)
+
+    def testReadChanges(self):
+        thermometer = SimulatedDS18B20(1, 20.0, resolution=9)
+        monitor = SimulatedDS2438(9, 18.0, 40.0)
+        session = Session(backend=SimulatedBackend([thermometer, monitor]))
+        devices = sorted(session.enumrate())
+        session.readConfigurations()
+        session.changes.deadband = 0.25
+        self.assertEqual(sorted(session.readChanges(devices).devices), devices)
+        self.assertEqual(len(session.readChanges(devices)), 0)
+        thermometer.temperature = 21.0
+        changed = session.readChanges(devices)
+        self.assertEqual(list(changed.devices), [thermometer.deviceId])
+        self.assertEqual(changed.temperatures[0], 21.0)
+        self.assertEqual(session.changes.last(thermometer.deviceId).temperature, 21.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.crc import CRCError, crc8, crc16, checkCrc8, checkCrc16, checkCrc8Blocks, checkCrc8Buffer
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tests.simulated import scratchpad, CorruptDS18B20
+
+class CrcTest(unittest.TestCase):
+    def testRom(self):
+        # The example ROM of the Maxim application note 27
+        rom = bytearray([0x02, 0x1C, 0xB8, 0x01, 0x00, 0x00, 0x00, 0xA2])
+        self.assertEqual(crc8(rom[:7]), 0xA2)
+        self.assertTrue(checkCrc8(rom))
+
+    def testParts(self):
+        data = scratchpad(0x0191)
+        self.assertEqual(crc8(data[4:], crc8(data[:4])), 0)
+
+    def testCorrupt(self):
+        data = scratchpad(0x0191)
+        for index in range(len(data)):
+            corrupt = bytearray(data)
+            corrupt[index] ^= 0x10
+            self.assertFalse(checkCrc8(corrupt))
+
+    def testBlocks(self):
+        good = scratchpad(0x0191)
+        bad = bytearray(good)
+        bad[1] ^= 0x01
+        self.assertEqual(checkCrc8Blocks([good, bad, good]), [True, False, True])
+        self.assertEqual(checkCrc8Buffer(bytes(good + bad + good), len(good)), [True, False, True])
+
+    def testCrc16(self):
+        data = bytearray(b'123456789')
+        self.assertEqual(crc16(data), 0xBB3D)
+        self.assertEqual(crc16(data[4:], crc16(data[:4])), 0xBB3D)
+        # The devices send the inverted CRC16, least significant byte first
+        inverted = crc16(data) ^ 0xFFFF
+        block = data + bytearray([inverted & 0xFF, inverted >> 8])
+        self.assertTrue(checkCrc16(block))
+        block[0] ^= 0x01
+        self.assertFalse(checkCrc16(block))
+
+    def testSessionRejectsCorruptScratchpad(self):
+        good = SimulatedDS18B20(1, 21.5, resolution=9)
+        corrupt = CorruptDS18B20(2, 22.5, resolution=9)
+        session = Session(backend=SimulatedBackend([good, corrupt]))
+        session.retries = 0
+        session.enumrate()
+        batch = session.readBatch([good.deviceId, corrupt.deviceId])
+        self.assertEqual(batch.temperatures[0], 21.5)
+        self.assertNotEqual(batch.temperatures[1], batch.temperatures[1]) # NaN
+        self.assertRaises(CRCError, session.readDevice, corrupt.deviceId)
+        self.assertEqual(session.readDevice(good.deviceId), {'temperature': 21.5})
+        self.assertEqual(session.health.health(corrupt.deviceId).crcFailures, 2)
+
+if __name__ == '__main__':
+    unittest.main()
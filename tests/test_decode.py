@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.decode import decodeDS18B20Temperature, decodeScratchpads, numpy
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2438, SimulatedDS1990A
+from tmex.session import Session
+from tests.simulated import scratchpad
+
+class DecodeTest(unittest.TestCase):
+    def testTemperature(self):
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0191)), 25.0625)
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0xFF5E)), -10.125)
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0550)), 85.0)
+
+    def testTemperatureOffset(self):
+        data = bytearray(3) + scratchpad(0x0191)
+        self.assertEqual(decodeDS18B20Temperature(data, 3), 25.0625)
+
+    def testScratchpads(self):
+        data = scratchpad(0x0191) + scratchpad(0xFF5E, 11)
+        corrupt = scratchpad(0x0191)
+        corrupt[0] ^= 0x01
+        values = decodeScratchpads([0x28, 0x28, 0x28], data + corrupt, useNumPy=False)
+        self.assertEqual(list(values['temperature'][:2]), [25.0625, -10.125])
+        self.assertEqual(list(values['valid']), [True, True, False])
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def testScratchpadsNumPy(self):
+        data = scratchpad(0x0191) + scratchpad(0xFF5E, 11) + scratchpad(0x0197, 9)
+        families = [0x28, 0x28, 0x28]
+        table = decodeScratchpads(families, data, useNumPy=False)
+        values = decodeScratchpads(families, data, useNumPy=True)
+        self.assertEqual(list(values['temperature']), list(table['temperature']))
+        self.assertEqual(list(values['valid']), list(table['valid']))
+
+class ScratchpadsTest(unittest.TestCase):
+    def testReadScratchpads(self):
+        thermometer = SimulatedDS18B20(1, 21.5, resolution=9)
+        monitor = SimulatedDS2438(2, 23.0, 40.0)
+        button = SimulatedDS1990A(3)
+        session = Session(backend=SimulatedBackend([thermometer, monitor, button]))
+        session.enumrate()
+        session.readConfigurations()
+        # The iButton has no scratchpad and the unknown device is not on the bus, both are left out
+        scratchpads = session.readScratchpads([thermometer.deviceId, monitor.deviceId, button.deviceId,
+            '2800000000000000'])
+        self.assertEqual(scratchpads.devices, [thermometer.deviceId, monitor.deviceId])
+        self.assertEqual(list(scratchpads.families), [0x28, 0x26])
+        values = decodeScratchpads(scratchpads.families, scratchpads.data, useNumPy=False)
+        self.assertEqual(list(values['temperature']), [21.5, 23.0])
+        self.assertAlmostEqual(values['humidity'][1], 40.0, delta=0.5)
+        self.assertEqual(list(values['valid']), [True, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import time
+import select
+import socket
+import threading
+import unittest
+from tmex.backend import LEVEL_NORMAL, LEVEL_STRONG_PULLUP, PRIME_NONE, PRIME_BYTE, RESET_PRESENCE
+from tmex.ds2480 import DS2480Backend, MODE_DATA, MODE_COMMAND, MODE_STOP_PULSE
+from tmex.system import monotonic
+from tmex.tmex import TMEXException
+
+class FakeDS2480(object):
+    """
+    The DS2480B commands used by DS2480Backend, on the other end of a socket pair. A strong pullup pulse is answered
+    when it is stopped, and an armed pulse starts again after every byte until it is disarmed.
+    """
+
+    def __init__(self, connection, answer=0x5A):
+        self.connection = connection
+        self.answer = answer
+        self.armed = False
+        self.pulse = False
+        self.pulses = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        command = True
+        escape = False
+        while True:
+            data = self.connection.recv(64)
+            if not data:
+                return
+            for byte in bytearray(data):
+                if command:
+                    command = self._command(byte)
+                elif escape:
+                    escape = False
+                    if byte == MODE_COMMAND:
+                        self._data(byte)
+                    else:
+                        command = self._command(byte)
+                elif byte == MODE_COMMAND:
+                    escape = True
+                else:
+                    self._data(byte)
+
+    def _send(self, byte):
+        self.connection.sendall(bytearray([byte]))
+
+    def _command(self, byte):
+        """
+        Handles a byte in command mode, returns False when it switches to data mode.
+        """
+        if byte == MODE_DATA:
+            return False
+        if byte == MODE_STOP_PULSE:
+            if self.pulse:
+                self.pulse = False
+                self._send(0xEC)
+        elif byte & 0xED == 0xED: # Pulse
+            self.armed = bool(byte & 0x02)
+            self.pulse = not self.armed
+            self.pulses += 1
+        elif byte & 0xE1 == 0xC1: # Reset
+            self._send(0xCD)
+        elif byte & 0xE3 == 0x81: # Bit
+            self._send((byte & 0xFC) | (0x03 if byte & 0x10 else 0x00))
+        elif not byte & 0x80 and byte & 0x01: # Configuration
+            self._send(byte & 0xFE)
+        return True
+
+    def _data(self, byte):
+        if self.armed:
+            self.pulse = True
+        self._send(self.answer if byte == 0xFF else byte)
+
+class DS2480Test(unittest.TestCase):
+    def setUp(self):
+        self.local, remote = socket.socketpair()
+        self.adapter = FakeDS2480(remote)
+        self.backend = DS2480Backend(timeout=0.5)
+        self.backend._fd = self.local.fileno()
+
+    def tearDown(self):
+        self.backend._fd = None
+        self.local.close()
+
+    def waitForPulse(self):
+        """
+        Waits for the adapter to start a strong pullup, which it does not answer.
+        """
+        deadline = monotonic() + 1.0
+        while not self.adapter.pulse and monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertTrue(self.adapter.pulse)
+
+    def assertDrained(self):
+        readable, _, _ = select.select([self.local], [], [], 0.05)
+        self.assertEqual(readable, [])
+
+    def testPrimedPullup(self):
+        self.assertEqual(self.backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_BYTE), LEVEL_STRONG_PULLUP)
+        self.assertEqual(self.backend.touchByte(0x44), 0x44)
+        self.assertTrue(self.adapter.pulse)
+        self.backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+        # Disarmed, the following bytes are without a strong pullup and in step with their answers
+        self.assertFalse(self.adapter.armed)
+        self.assertFalse(self.adapter.pulse)
+        self.assertEqual(self.backend.touchByte(0xFF), 0x5A)
+        self.assertEqual(self.backend.touchBlock([0xBE, 0xFF]), bytearray([0xBE, 0x5A]))
+        self.assertFalse(self.adapter.pulse)
+        self.assertDrained()
+
+    def testPullup(self):
+        self.backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_NONE)
+        self.waitForPulse()
+        self.backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+        self.assertFalse(self.adapter.pulse)
+        self.assertEqual(self.backend.touchByte(0xFF), 0x5A)
+        self.assertDrained()
+
+    def testNormalWithoutPullup(self):
+        # Nothing to stop, the adapter would not answer
+        self.backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_BYTE)
+        self.backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+        self.backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+        self.assertEqual(self.adapter.pulses, 0)
+        self.assertEqual(self.backend.touchReset(), RESET_PRESENCE)
+        self.assertEqual(self.backend.touchBit(1), 1)
+        self.assertDrained()
+
+    def testTimeout(self):
+        self.assertRaises(TMEXException, self.backend._read, 1)
+
+if __name__ == '__main__':
+    unittest.main()
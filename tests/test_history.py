@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS1990A
+from tmex.session import Session
+from tmex.history import HistoryStore, toNanoseconds, fromNanoseconds
+
+DEVICE = '2801000000000029'
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, store, start, count, step):
+        """
+        Appends count readings of the device, step apart from start, with the index as the temperature.
+        """
+        for index in range(count):
+            store.append(DEVICE, start + step * index, {'temperature': float(index)})
+
+    def testNanoseconds(self):
+        moment = datetime(2020, 3, 1, 23, 59, 59, 250000)
+        self.assertEqual(fromNanoseconds(toNanoseconds(moment)), moment)
+        self.assertEqual(toNanoseconds(1.5), 1500000000)
+
+    def testDayRollover(self):
+        store = HistoryStore(self.directory)
+        start = datetime(2020, 3, 1, 22, 0)
+        # Every 30 minutes from 22:00 to 03:30 the next day
+        self.fill(store, start, 12, timedelta(minutes=30))
+        store.flush()
+        self.assertEqual(store.devices(), [DEVICE])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, DEVICE))), ['20200301.bin', '20200302.bin'])
+        timestamps, values = store.query(DEVICE)
+        self.assertEqual(len(timestamps), 12)
+        self.assertEqual(list(values['temperature']), [float(index) for index in range(12)])
+        self.assertEqual(fromNanoseconds(timestamps[4]), datetime(2020, 3, 2, 0, 0))
+
+    def testRange(self):
+        store = HistoryStore(self.directory)
+        start = datetime(2020, 3, 1, 22, 0)
+        self.fill(store, start, 12, timedelta(minutes=30))
+        # The start is inclusive and the stop exclusive, across the two segments
+        timestamps, values = store.query(DEVICE, datetime(2020, 3, 1, 23, 0), datetime(2020, 3, 2, 1, 0))
+        self.assertEqual(list(values['temperature']), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([fromNanoseconds(timestamp) for timestamp in timestamps],
+            [start + timedelta(minutes=30) * index for index in range(2, 6)])
+        # Between two readings
+        timestamps, values = store.query(DEVICE, datetime(2020, 3, 2, 0, 10), datetime(2020, 3, 2, 0, 20))
+        self.assertEqual(len(timestamps), 0)
+        # Open ended ranges, and ranges outside of the segments
+        self.assertEqual(list(store.query(DEVICE, start=datetime(2020, 3, 2, 3, 0))[1]['temperature']), [10.0, 11.0])
+        self.assertEqual(list(store.query(DEVICE, stop=datetime(2020, 3, 1, 23, 0))[1]['temperature']), [0.0, 1.0])
+        self.assertEqual(len(store.query(DEVICE, start=datetime(2020, 3, 5))[0]), 0)
+        self.assertEqual(len(store.query('2800000000000000')[0]), 0)
+
+    def testBuffered(self):
+        store = HistoryStore(self.directory, flushSize=5)
+        self.fill(store, datetime(2020, 3, 1, 12, 0), 4, timedelta(seconds=1))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, DEVICE)))
+        self.fill(store, datetime(2020, 3, 1, 12, 1), 1, timedelta(seconds=1))
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, DEVICE, '20200301.bin')), 5 * 24)
+        # A query writes the buffered readings of the device first
+        self.fill(store, datetime(2020, 3, 1, 12, 2), 2, timedelta(seconds=1))
+        self.assertEqual(len(store.query(DEVICE)[0]), 7)
+
+    def testColumns(self):
+        store = HistoryStore(self.directory, columns=['temperature', 'humidity', 'supply'])
+        store.append(DEVICE, datetime(2020, 3, 1, 12, 0), {'temperature': 21.5, 'supply': 5})
+        store.flush()
+        # An existing store keeps its columns
+        store = HistoryStore(self.directory)
+        self.assertEqual(store.columns, ('temperature', 'humidity', 'supply'))
+        self.assertRaises(ValueError, HistoryStore, self.directory, ['temperature'])
+        timestamps, values = store.query(DEVICE)
+        self.assertEqual(values['temperature'][0], 21.5)
+        self.assertTrue(values['humidity'][0] != values['humidity'][0])
+        self.assertEqual(values['supply'][0], 5.0)
+
+    def testAppendBatch(self):
+        device = SimulatedDS18B20(1, 21.0, resolution=9)
+        session = Session(backend=SimulatedBackend([device, SimulatedDS1990A(2)]))
+        devices = sorted(session.enumrate())
+        store = HistoryStore(self.directory)
+        self.assertRaises(ValueError, store.appendBatch, session.readBatch(devices, timeStamp=False))
+        batch = session.readBatch(devices)
+        store.appendBatch(batch)
+        store.flush()
+        # The iButton has no values in the columns and is skipped
+        self.assertEqual(store.devices(), [device.deviceId])
+        timestamps, values = store.query(device.deviceId)
+        self.assertEqual(list(values['temperature']), [21.0])
+        self.assertEqual(fromNanoseconds(timestamps[0]), batch.reading(devices.index(device.deviceId))['timestamp'])
+
+    def testExportCsv(self):
+        store = HistoryStore(self.directory)
+        store.append(DEVICE, datetime(2020, 3, 1, 12, 0, 0, 500000), {'temperature': 21.125, 'humidity': None})
+        output = io.BytesIO() if str is bytes else io.StringIO()
+        store.exportCsv(DEVICE, output)
+        self.assertEqual(output.getvalue().splitlines(), ['2801000000000029,2020-03-01 12:00:00,21.12,'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import re
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tmex.metrics import Metrics
+
+# A sample line of the Prometheus text exposition format
+SAMPLE = re.compile(r'^[a-z_]+\{([a-z]+="[^"]*",?)+\} [0-9.]+$')
+
+class MetricsTest(unittest.TestCase):
+    def testPrometheus(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.count('resets')
+        metrics.count('bytes', 10, '2801000000000029')
+        metrics.count('bytes', 2)
+        metrics.observe('read', 0.05, '2801000000000029')
+        metrics.observe('read', 0.5, '2801000000000029')
+        metrics.observe('read', 2.0, '2801000000000029')
+        self.assertEqual(metrics.prometheus().splitlines(), [
+            '# TYPE tmex_bytes_total counter',
+            'tmex_bytes_total{device=""} 2',
+            'tmex_bytes_total{device="2801000000000029"} 10',
+            '# TYPE tmex_resets_total counter',
+            'tmex_resets_total{device=""} 1',
+            '# TYPE tmex_operation_seconds histogram',
+            'tmex_operation_seconds_bucket{operation="read",device="2801000000000029",le="0.1"} 1',
+            'tmex_operation_seconds_bucket{operation="read",device="2801000000000029",le="1"} 2',
+            'tmex_operation_seconds_bucket{operation="read",device="2801000000000029",le="+Inf"} 3',
+            'tmex_operation_seconds_sum{operation="read",device="2801000000000029"} 2.550000000',
+            'tmex_operation_seconds_count{operation="read",device="2801000000000029"} 3',
+        ])
+
+    def testEmpty(self):
+        metrics = Metrics()
+        self.assertEqual(metrics.prometheus(), '\n')
+        metrics.count('resets')
+        metrics.reset()
+        self.assertEqual(metrics.snapshot().counters, {})
+
+    def testPrefix(self):
+        metrics = Metrics()
+        metrics.count('searches')
+        self.assertEqual(metrics.prometheus('bus').splitlines()[1], 'bus_searches_total{device=""} 1')
+
+    def testSession(self):
+        device = SimulatedDS18B20(1, 21.0, resolution=9)
+        session = Session(backend=SimulatedBackend([device]))
+        session.enumrate()
+        traced = []
+        session.metrics.addTraceCallback(lambda operation, deviceId, seconds, details: traced.append(operation))
+        session.readBatch([device.deviceId])
+        text = session.metrics.prometheus()
+        self.assertTrue(text.endswith('\n'))
+        for line in text.splitlines():
+            if not line.startswith('# TYPE '):
+                self.assertTrue(SAMPLE.match(line), line)
+        lines = text.splitlines()
+        self.assertTrue('tmex_searches_total{device=""} 1' in lines)
+        self.assertTrue(any(line.startswith('tmex_bytes_total{device="%s"} ' % (device.deviceId)) for line in lines))
+        self.assertTrue('tmex_operation_seconds_count{operation="cycle",device=""} 1' in lines)
+        self.assertTrue('cycle' in traced)
+        # The buckets are cumulative
+        buckets = [int(line.split(' ')[-1]) for line in lines
+            if line.startswith('tmex_operation_seconds_bucket{operation="cycle"')]
+        self.assertEqual(len(buckets), len(session.metrics.buckets) + 1)
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 1)
+
+if __name__ == '__main__':
+    unittest.main()
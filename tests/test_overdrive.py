@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2438
+from tmex.backend import Backend, SPEED_STANDARD, SPEED_OVERDRIVE
+from tmex.session import Session
+
+class OverdriveDS18B20(SimulatedDS18B20):
+    overdriveCapable = True
+
+class StandardBackend(SimulatedBackend):
+    """
+    Simulated bus of a backend that only supports standard speed.
+    """
+
+    def setSpeed(self, speed):
+        return Backend.setSpeed(self, speed)
+
+class OverdriveTest(unittest.TestCase):
+    def session(self, devices, backend=SimulatedBackend):
+        """
+        Returns a session of a simulated bus with the devices, where the DS18B20s are addressed at overdrive speed.
+        """
+        self.bus = backend(devices)
+        session = Session(backend=self.bus)
+        session.overdriveFamilies.add(SimulatedDS18B20.family)
+        self.ids = sorted(session.enumrate())
+        return session
+
+    def cycle(self, session):
+        """
+        Reads all devices, returns the temperatures by device id and the time on the wire of the read.
+        """
+        start = self.bus.wireTime
+        readings = session.readDevices(self.ids, timeStamp=False)
+        return dict((deviceId, readings[deviceId].get('temperature')) for deviceId in self.ids), \
+            self.bus.wireTime - start
+
+    def testWholeBus(self):
+        session = self.session([OverdriveDS18B20(serial, 20.0 + serial, resolution=9) for serial in range(1, 4)])
+        expected, standard = self.cycle(session)
+        self.assertTrue(session.setOverdrive(True))
+        self.assertEqual(sorted(session.overdriveDevices()), self.ids)
+        self.assertEqual(self.bus.speed, SPEED_OVERDRIVE)
+        temperatures, overdrive = self.cycle(session)
+        self.assertEqual(temperatures, expected)
+        self.assertTrue(overdrive < standard / 2, (overdrive, standard))
+        # Searches are done at standard speed, and the bus is back in overdrive after them
+        self.assertEqual(sorted(session.enumrate()), self.ids)
+        self.assertEqual(sorted(session.verifyDevices()), self.ids)
+        self.assertEqual(self.bus.speed, SPEED_OVERDRIVE)
+        self.assertEqual(self.cycle(session)[0], expected)
+        self.assertFalse(session.setOverdrive(False))
+        self.assertEqual(self.bus.speed, SPEED_STANDARD)
+        self.assertEqual([device.overdrive for device in self.bus.devices], [False, False, False])
+        self.assertEqual(session.overdriveDevices(), [])
+
+    def testMixedBus(self):
+        thermometers = [OverdriveDS18B20(serial, 20.0 + serial, resolution=9) for serial in range(1, 3)]
+        session = self.session(thermometers + [SimulatedDS2438(9, 18.0, 40.0)])
+        expected, standard = self.cycle(session)
+        # The bus stays at standard speed, only the DS18B20s are addressed at overdrive speed
+        self.assertFalse(session.setOverdrive(True))
+        self.assertEqual(sorted(session.overdriveDevices()), sorted(device.deviceId for device in thermometers))
+        temperatures, mixed = self.cycle(session)
+        self.assertEqual(temperatures, expected)
+        self.assertEqual(temperatures[SimulatedDS2438(9).deviceId], 18.0)
+        self.assertEqual(self.bus.speed, SPEED_STANDARD)
+        self.assertTrue(mixed < standard, (mixed, standard))
+
+    def testNoPresence(self):
+        # The family is addressed at overdrive speed, but the devices do not support it
+        session = self.session([SimulatedDS18B20(serial, 20.0 + serial, resolution=9) for serial in range(1, 3)])
+        expected = self.cycle(session)[0]
+        self.assertFalse(session.setOverdrive(True))
+        self.assertEqual(session.overdriveDevices(), [])
+        self.assertEqual(self.bus.speed, SPEED_STANDARD)
+        self.assertEqual(self.cycle(session)[0], expected)
+
+    def testUnsupportedBackend(self):
+        session = self.session([OverdriveDS18B20(1, 21.0, resolution=9)], StandardBackend)
+        self.assertFalse(session.setOverdrive(True))
+        self.assertEqual(session.overdriveDevices(), [])
+        self.assertEqual(self.cycle(session)[0], {self.ids[0]: 21.0})
+
+if __name__ == '__main__':
+    unittest.main()
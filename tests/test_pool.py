@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tmex.pool import SessionPool
+from tmex.tmex import TMEXException
+
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        self.buses = {}
+
+    def pool(self, devices):
+        """
+        Returns a pool of simulated buses, with the devices by port.
+        """
+        for port, portDevices in devices.items():
+            self.buses[port] = SimulatedBackend(portDevices)
+        return SessionPool(sorted(devices), lambda port: Session(backend=self.buses[port]))
+
+    def testEnumerate(self):
+        first = SimulatedDS18B20(1, 21.0, resolution=9)
+        second = SimulatedDS18B20(2, 22.0, resolution=9)
+        pool = self.pool({0: [first], 1: [second]})
+        try:
+            devices = pool.enumrate()
+            self.assertEqual(sorted(devices), [first.deviceId, second.deviceId])
+            self.assertEqual(devices[first.deviceId]['port'], 0)
+            self.assertEqual(devices[second.deviceId]['port'], 1)
+            readings = pool.readDevices()
+            self.assertEqual(readings[first.deviceId]['temperature'], 21.0)
+            self.assertEqual(readings[second.deviceId]['temperature'], 22.0)
+            self.assertTrue(readings['time'][0] <= readings['time'][1])
+            self.assertRaises(ValueError, pool.readDevice, '2800000000000000')
+        finally:
+            pool.close()
+
+    def testDuplicateDevice(self):
+        pool = self.pool({0: [SimulatedDS18B20(1)], 1: [SimulatedDS18B20(1), SimulatedDS18B20(2)]})
+        try:
+            self.assertRaises(TMEXException, pool.enumrate)
+            self.assertRaises(TMEXException, pool.enumrate, [0x28])
+        finally:
+            pool.close()
+
+    def testClose(self):
+        pool = self.pool({0: [SimulatedDS18B20(1)], 1: [SimulatedDS18B20(2)]})
+        pool.enumrate()
+        workers = list(pool._workers.values())
+        pool.close()
+        # The workers have ended and closed their backends when close returns
+        self.assertEqual([worker.is_alive() for worker in workers], [False, False])
+        self.assertEqual([bus.valid() for bus in self.buses.values()], [False, False])
+        self.assertEqual(pool.ports(), [])
+
+if __name__ == '__main__':
+    unittest.main()
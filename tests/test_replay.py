@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import io
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.replay import RecordingBackend, ReplayBackend, ReplayMismatch, readLog
+from tmex.session import Session
+from tmex.system import monotonic
+from tmex.tmex import TMEXException
+from tests.simulated import StuckDS18B20
+
+def readings(batches):
+    return [[temperature for temperature in batch.temperatures if temperature == temperature] for batch in batches]
+
+class ShortedBackend(SimulatedBackend):
+    """
+    A simulated bus failing every byte, like a shorted bus.
+    """
+
+    def touchByte(self, byte):
+        raise TMEXException('Bus shorted')
+
+class ReplayTest(unittest.TestCase):
+    def record(self, cycles):
+        """
+        Records cycles of a bus with a stuck DS18B20, whose conversions time out and are retried.
+        """
+        bus = SimulatedBackend([SimulatedDS18B20(1, 20.0, resolution=9), StuckDS18B20(2, 21.0, resolution=9)])
+        log = io.BytesIO()
+        session = Session(backend=RecordingBackend(bus, log))
+        self.devices = sorted(session.enumrate())
+        session.readConfigurations()
+        session.retryBudget = 0.2
+        batches = [session.readBatch(self.devices) for i in range(cycles)]
+        session.backend.close()
+        self.counters = session.metrics.snapshot().counters
+        return log.getvalue(), batches
+
+    def testReplayTimeouts(self):
+        log, recorded = self.record(3)
+        self.assertTrue(any(key[0] == 'timeouts' for key in self.counters))
+        backend = ReplayBackend(io.BytesIO(log))
+        session = Session(backend=backend)
+        session.retryBudget = 0.2
+        self.assertEqual(sorted(session.enumrate()), self.devices)
+        session.readConfigurations()
+        start = monotonic()
+        replayed = [session.readBatch(self.devices) for i in range(3)]
+        # The timeouts and retries follow the recorded clock, not the time of the replay
+        self.assertLess(monotonic() - start, 0.1)
+        self.assertEqual(readings(replayed), readings(recorded))
+        self.assertEqual(backend.calls, len(list(readLog(io.BytesIO(log)))) - 1)
+
+    def testPorts(self):
+        log = io.BytesIO()
+        backend = RecordingBackend(SimulatedBackend(), log)
+        backend.open('/dev/ttyUSB0')
+        backend.open(3)
+        backend.close()
+        records = list(readLog(io.BytesIO(log.getvalue())))
+        self.assertEqual([record.arguments for record in records[:2]], [('/dev/ttyUSB0',), (3,)])
+        replay = ReplayBackend(io.BytesIO(log.getvalue()))
+        replay.open('/dev/ttyUSB0')
+        self.assertRaises(ReplayMismatch, replay.open, '3')
+
+    def testErrors(self):
+        log = io.BytesIO()
+        backend = RecordingBackend(ShortedBackend(), log)
+        self.assertRaises(TMEXException, backend.touchByte, 0xCC)
+        backend.close()
+        records = list(readLog(io.BytesIO(log.getvalue())))
+        self.assertEqual((records[0].operation, records[0].result, records[0].error),
+            ('touchByte', 'Bus shorted', True))
+        replay = ReplayBackend(io.BytesIO(log.getvalue()))
+        try:
+            replay.touchByte(0xCC)
+            self.fail('The recorded error was not raised')
+        except TMEXException as e:
+            self.assertNotIsInstance(e, ReplayMismatch)
+            self.assertEqual(str(e), 'Bus shorted')
+
+    def testRealTime(self):
+        bus = SimulatedBackend([SimulatedDS18B20(1, 20.0, resolution=9)])
+        log = io.BytesIO()
+        session = Session(backend=RecordingBackend(bus, log))
+        devices = session.enumrate()
+        session.readConfigurations()
+        session.readBatch(devices)
+        session.backend.close()
+        replay = Session(backend=ReplayBackend(io.BytesIO(log.getvalue()), realTime=True))
+        replay.enumrate()
+        replay.readConfigurations()
+        start = monotonic()
+        replay.readBatch(devices)
+        # The calls are replayed no faster than they were recorded, with the wait for the conversion
+        self.assertTrue(monotonic() - start >= SimulatedDS18B20.conversionTimes[9])
+
+    def testMismatch(self):
+        log, recorded = self.record(1)
+        session = Session(backend=ReplayBackend(io.BytesIO(log)))
+        session.enumrate()
+        session.readConfigurations()
+        self.assertRaises(ReplayMismatch, session.readDevice, self.devices[0], True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.decode import decodeDS18B20Temperature, decodeDS18B20Resolution
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tests.simulated import scratchpad
+
+class ResolutionTest(unittest.TestCase):
+    def setUp(self):
+        self.thermometers = [SimulatedDS18B20(serial, 20.0 + serial / 16.0) for serial in (1, 2)]
+        self.session = Session(backend=SimulatedBackend(self.thermometers))
+        self.devices = sorted(self.session.enumrate())
+        self.conversions = []
+        def trace(operation, deviceId, seconds, details):
+            if operation == 'conversion':
+                self.conversions.append(details['expected'])
+        self.session.metrics.addTraceCallback(trace)
+
+    def testDecode(self):
+        for resolution in range(9, 13):
+            self.assertEqual(decodeDS18B20Resolution(scratchpad(0, resolution)), resolution)
+
+    def testUndefinedBitsMasked(self):
+        # The bits below the resolution are undefined, a 9 bit reading is in steps of 0.5 degrees
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0197, 9)), 25.0)
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0197, 10)), 25.25)
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0197, 11)), 25.375)
+        self.assertEqual(decodeDS18B20Temperature(scratchpad(0x0197, 12)), 25.4375)
+
+    def testWriteConfigurations(self):
+        configurations = self.session.writeConfigurations(resolution=10, th=30, tl=-5, copyToEeprom=True)
+        self.assertEqual(sorted(configurations), self.devices)
+        for thermometer in self.thermometers:
+            self.assertEqual(configurations[thermometer.deviceId], {'resolution': 10, 'th': 30, 'tl': -5})
+            self.assertEqual(thermometer.resolution, 10)
+            self.assertEqual(thermometer.eeprom, (30, -5, 10))
+        self.assertEqual(self.session.readConfiguration(self.devices[0])['resolution'], 10)
+        self.assertRaises(ValueError, self.session.writeConfiguration, self.devices[0], 8)
+
+    def testConversionTime(self):
+        # Devices of unknown resolution are waited for as 12 bit devices
+        self.session.readBatch(self.devices)
+        self.assertEqual(self.conversions, [0.75])
+        self.session.writeConfiguration(self.devices[0], resolution=9)
+        self.session.readBatch(self.devices)
+        self.assertEqual(self.conversions[-1], 0.75)
+        self.session.writeConfiguration(self.devices[1], resolution=9)
+        readings = self.session.readBatch(self.devices)
+        self.assertEqual(self.conversions[-1], 0.09375)
+        # Read at 9 bits, in steps of 0.5 degrees
+        self.assertEqual(list(readings.temperatures), [20.0, 20.0])
+
+    def testResolutionLearnedFromReads(self):
+        self.thermometers[0].resolution = 11
+        self.thermometers[1].resolution = 11
+        self.session.readBatch(self.devices)
+        self.session.readBatch(self.devices)
+        self.assertEqual(self.conversions, [0.75, 0.375])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tmex.health import FAILURE_CRC
+from tmex.system import monotonic
+from tmex.wait import TIMEOUT_FACTOR, TIMEOUT_MARGIN
+from tests.simulated import StuckDS18B20
+
+# Conversion time in seconds of the 9 bit DS18B20s of the tests
+CONVERSION_TIME = SimulatedDS18B20.conversionTimes[9]
+
+class RetryTest(unittest.TestCase):
+    def testRetryBudget(self):
+        good = SimulatedDS18B20(1, 20.0, resolution=9)
+        stuck = StuckDS18B20(2, 21.0, resolution=9)
+        session = Session(backend=SimulatedBackend([good, stuck]))
+        devices = [good.deviceId, stuck.deviceId]
+        session.enumrate()
+        session.readConfigurations()
+        session.retries = 5
+        session.retryBudget = 0.2
+        start = monotonic()
+        batch = session.readBatch(devices)
+        elapsed = monotonic() - start
+        self.assertEqual(batch.temperatures[0], 20.0)
+        self.assertNotEqual(batch.temperatures[1], batch.temperatures[1]) # NaN
+        # The broadcast conversion times out, the retries of the stuck device end with the budget
+        timeout = CONVERSION_TIME * TIMEOUT_FACTOR + TIMEOUT_MARGIN
+        self.assertLess(elapsed, timeout + session.retryBudget + 0.1)
+        counters = session.metrics.snapshot().counters
+        self.assertTrue(any(key[0] == 'retries' for key in counters))
+        # The stuck device has no reading and no time of a reading
+        self.assertIsNone(batch[stuck.deviceId].timestamp)
+
+    def testQuarantine(self):
+        good = SimulatedDS18B20(1, 20.0, resolution=9)
+        bad = SimulatedDS18B20(2, 21.0, resolution=9)
+        session = Session(backend=SimulatedBackend([good, bad]))
+        devices = [good.deviceId, bad.deviceId]
+        session.enumrate()
+        session.health.backoff = 60.0
+        for i in range(session.health.failureThreshold):
+            session.health.failure(bad.deviceId, FAILURE_CRC)
+        self.assertFalse(session.health.available(bad.deviceId))
+        batch = session.readBatch(devices)
+        self.assertEqual(batch[bad.deviceId].temperature, None)
+        self.assertEqual(batch[bad.deviceId].timestamp, None)
+        self.assertEqual(batch.epochTimestamps()[1], None)
+        self.assertTrue(batch.start + batch.epochOffset <= batch[good.deviceId].timestamp)
+        self.assertTrue(batch.epochTimestamps()[0] <= batch.stop + batch.epochOffset)
+        readings = batch.asDict()
+        self.assertEqual(readings[bad.deviceId], {})
+        self.assertEqual(readings[good.deviceId]['temperature'], 20.0)
+        self.assertTrue(readings['time'][0] <= readings[good.deviceId]['timestamp'] <= readings['time'][1])
+        self.assertEqual(session.readDevices(devices)[bad.deviceId], {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20, SimulatedDS2409
+from tmex.session import Session
+from tmex.romcache import RomCache
+
+class RomCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'roms.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testMissingFile(self):
+        cache = RomCache(self.path)
+        self.assertEqual(cache.load(), [])
+        self.assertEqual(cache.branches(), {})
+
+    def testUnreadableFile(self):
+        with open(self.path, 'w') as f:
+            f.write('{"devices": [')
+        self.assertEqual(RomCache(self.path).load(), [])
+
+    def testSaveLoad(self):
+        branch = (('1F00000000090000', 'main'),)
+        cache = RomCache(self.path)
+        cache.save(['2800000000000200', '2800000000000100'], {'2800000000000200': branch})
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        cache = RomCache(self.path)
+        self.assertEqual(sorted(cache.load()), ['2800000000000100', '2800000000000200'])
+        self.assertEqual(cache.branches(), {'2800000000000200': branch})
+
+    def testUnchangedNotSaved(self):
+        cache = RomCache(self.path)
+        cache.save(['2800000000000100'])
+        os.remove(self.path)
+        # The same ids in another order are not written again
+        cache.save(['2800000000000100'])
+        self.assertFalse(os.path.exists(self.path))
+        cache.save(['2800000000000100', '2800000000000200'])
+        with open(self.path, 'r') as f:
+            self.assertEqual(json.load(f)['devices'], ['2800000000000100', '2800000000000200'])
+
+    def testSession(self):
+        first = SimulatedDS18B20(1, 21.0, resolution=9)
+        second = SimulatedDS18B20(2, 22.0, resolution=9)
+        session = Session(backend=SimulatedBackend([first, second]), cacheFile=self.path)
+        self.assertEqual(sorted(session.enumrate()), sorted([first.deviceId, second.deviceId]))
+        # A new session knows the devices from the cache without a search of the bus
+        bus = SimulatedBackend([first, second])
+        session = Session(backend=bus, cacheFile=self.path)
+        self.assertEqual(sorted(session.devices()), sorted([first.deviceId, second.deviceId]))
+        self.assertEqual(session.readDevice(first.deviceId, True)['temperature'], 21.0)
+        self.assertEqual(session.metrics.snapshot().counters.get(('searches', ''), 0), 0)
+
+    def testStaleEntry(self):
+        first = SimulatedDS18B20(1, 21.0, resolution=9)
+        second = SimulatedDS18B20(2, 22.0, resolution=9)
+        Session(backend=SimulatedBackend([first, second]), cacheFile=self.path).enumrate()
+        # The second device is gone when the next session starts
+        session = Session(backend=SimulatedBackend([first]), cacheFile=self.path)
+        self.assertEqual(sorted(session.devices()), sorted([first.deviceId, second.deviceId]))
+        self.assertEqual(list(session.verifyDevices()), [first.deviceId])
+        self.assertEqual(list(session.devices()), [first.deviceId])
+        self.assertEqual(RomCache(self.path).load(), [first.deviceId])
+
+    def testInvalidEntry(self):
+        device = SimulatedDS18B20(1, 21.0, resolution=9)
+        with open(self.path, 'w') as f:
+            json.dump({'devices': [device.deviceId, '2800000000000199', 'XYZ']}, f)
+        session = Session(backend=SimulatedBackend([device]), cacheFile=self.path)
+        # Ids that are not a ROM with a valid CRC are left out
+        self.assertEqual(list(session.devices()), [device.deviceId])
+
+    def testBranches(self):
+        device = SimulatedDS18B20(2, 22.0, resolution=9)
+        coupler = SimulatedDS2409(0x900, aux=[device])
+        session = Session(backend=SimulatedBackend([coupler]), cacheFile=self.path)
+        session.enumrate()
+        branch = session.devices()[device.deviceId].branch
+        self.assertEqual(branch, ((coupler.deviceId, 'aux'),))
+        session = Session(backend=SimulatedBackend([SimulatedDS2409(0x900, aux=[device])]), cacheFile=self.path)
+        self.assertEqual(session.devices()[device.deviceId].branch, branch)
+        self.assertEqual(session.readDevice(device.deviceId, True)['temperature'], 22.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import json
+import socket
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+from tmex.server import ReadingServer, ReadingClient
+from tmex.tmex import TMEXException
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.thermometers = [SimulatedDS18B20(serial, 20.0 + serial, resolution=9) for serial in (1, 2)]
+        self.session = Session(backend=SimulatedBackend(self.thermometers))
+        self.devices = sorted(self.session.enumrate())
+        self.server = ReadingServer(self.session, ('localhost', 0), ttl=60.0)
+        self.server.start()
+        self.client = ReadingClient(self.server.address, timeout=10.0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def counter(self, name):
+        return self.session.metrics.snapshot().counters.get((name, ''), 0)
+
+    def testCache(self):
+        first = self.client.read()
+        self.assertEqual(sorted(first), self.devices)
+        self.thermometers[0].temperature = 30.0
+        # Served from the cache within the TTL
+        cached = self.client.read([self.thermometers[0].deviceId])
+        self.assertEqual(cached[self.thermometers[0].deviceId].temperature, 21.0)
+        self.assertEqual(cached[self.thermometers[0].deviceId].timestamp,
+            first[self.thermometers[0].deviceId].timestamp)
+        fresh = self.client.read([self.thermometers[0].deviceId], maxAge=0)
+        self.assertEqual(fresh[self.thermometers[0].deviceId].temperature, 30.0)
+        # One bus read per request that misses the cache, whatever the number of devices read
+        self.assertEqual(self.counter('server_bus_reads'), 2)
+        self.assertEqual(self.counter('server_cache_hits'), 1)
+
+    def testUnknownDevice(self):
+        self.assertRaises(TMEXException, self.client.read, ['2800000000000000'])
+
+    def testInvalidRequests(self):
+        connection = socket.create_connection(self.server.address, 10.0)
+        stream = connection.makefile('rb')
+        try:
+            for request in (b'not json', b'[1, 2]', b'{"id": 1, "method": "nothing"}',
+                    b'{"id": 2, "method": "read", "params": [1]}',
+                    b'{"id": 3, "method": "read", "params": {"devices": "2801000000000029"}}',
+                    b'{"id": 4, "method": "read", "params": {"devices": [["28"]]}}',
+                    b'{"id": 5, "method": "read", "params": {"maxAge": "x"}}',
+                    b'{"id": 6, "method": "read", "params": {"maxAge": -1}}',
+                    b'{"id": 7, "method": "read", "params": {"maxAge": true}}'):
+                connection.sendall(request + b'\n')
+                response = json.loads(stream.readline().decode('utf-8'))
+                self.assertIn('error', response)
+                self.assertNotIn('result', response)
+                if request.startswith(b'{'):
+                    self.assertEqual(response['id'], json.loads(request.decode('utf-8'))['id'])
+            # The connection is still served
+            connection.sendall(b'{"id": 8, "method": "read", "params": {"maxAge": 1.5}}\n')
+            response = json.loads(stream.readline().decode('utf-8'))
+            self.assertEqual(response['id'], 8)
+            self.assertEqual(sorted(response['result']), self.devices)
+        finally:
+            stream.close()
+            connection.close()
+
+    def testInternalError(self):
+        def fail(devices):
+            raise RuntimeError('broken')
+        self.session.readBatch = fail
+        self.assertRaises(TMEXException, self.client.read)
+        self.assertEqual(sorted(self.client.devices()), self.devices)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import time
+import unittest
+from tmex.simulator import SimulatedBackend, SimulatedDS18B20
+from tmex.session import Session
+
+# Conversion time in seconds of the 9 bit DS18B20 of the tests
+CONVERSION_TIME = SimulatedDS18B20.conversionTimes[9]
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.device = SimulatedDS18B20(1, 21.0, resolution=9)
+        self.bus = SimulatedBackend([self.device])
+        self.session = Session(backend=self.bus)
+        self.session.enumrate()
+        # Learns the resolution, so a read waits for the 9 bit conversion time
+        self.session.readConfigurations()
+
+    def take(self, stream, count):
+        return [next(stream) for index in range(count)]
+
+    def testInvalid(self):
+        self.assertRaises(ValueError, self.session.stream, 0)
+        self.assertRaises(ValueError, self.session.stream, 1.0, bufferSize=0)
+
+    def testSchedule(self):
+        interval = CONVERSION_TIME * 3
+        with self.session.stream(interval, bufferSize=4) as stream:
+            batches = self.take(stream, 3)
+        self.assertEqual([batch.sequence for batch in batches], [0, 1, 2])
+        for previous, batch in zip(batches, batches[1:]):
+            self.assertAlmostEqual(batch.scheduled - previous.scheduled, interval, places=6)
+        self.assertEqual([batch.overruns for batch in batches], [0, 0, 0])
+        self.assertEqual([batch.dropped for batch in batches], [0, 0, 0])
+        self.assertEqual(batches[0].readout[self.device.deviceId]['temperature'], 21.0)
+
+    def testOverrun(self):
+        # Every read takes longer than the interval, and skips the ticks it overlapped
+        with self.session.stream(CONVERSION_TIME / 4.0, bufferSize=4) as stream:
+            batches = self.take(stream, 3)
+        sequences = [batch.sequence for batch in batches]
+        self.assertEqual(sequences[0], 0)
+        self.assertTrue(all(later - earlier >= 4 for earlier, later in zip(sequences, sequences[1:])), sequences)
+        self.assertEqual(batches[0].overruns, 0)
+        self.assertTrue(batches[1].overruns >= 3, batches[1].overruns)
+        # The skipped ticks are counted and not read later
+        self.assertEqual(batches[2].overruns, sequences[2] - 2)
+
+    def testDropped(self):
+        with self.session.stream(CONVERSION_TIME * 1.5, bufferSize=2) as stream:
+            # The consumer falls behind for several intervals
+            time.sleep(CONVERSION_TIME * 1.5 * 6)
+            batches = self.take(stream, 2)
+            dropped = stream.dropped
+        self.assertTrue(dropped >= 2, dropped)
+        # The oldest batches were dropped, the buffer holds the latest
+        self.assertTrue(batches[0].sequence >= dropped, (batches[0].sequence, dropped))
+        self.assertEqual(batches[1].sequence, batches[0].sequence + 1 + batches[1].overruns - batches[0].overruns)
+        self.assertTrue(batches[1].dropped >= batches[0].dropped >= 1)
+
+    def testChangesOnly(self):
+        self.session.changes.deadband = 0.5
+        with self.session.stream(CONVERSION_TIME * 2, bufferSize=4, changesOnly=True) as stream:
+            first = next(stream)
+            # A change within the deadband is not handed out
+            self.device.temperature = 21.25
+            time.sleep(CONVERSION_TIME * 2 * 3)
+            self.device.temperature = 23.0
+            changed = next(stream)
+        self.assertEqual(first.readout[self.device.deviceId]['temperature'], 21.0)
+        self.assertEqual(changed.readout[self.device.deviceId]['temperature'], 23.0)
+        self.assertTrue(changed.sequence >= 3, changed.sequence)
+
+    def testError(self):
+        # The error of a read ends the stream, and is raised to the consumer once
+        with self.session.stream(CONVERSION_TIME, devices=['2800000000000000']) as stream:
+            self.assertRaises(ValueError, next, stream)
+            self.assertRaises(StopIteration, next, stream)
+
+if __name__ == '__main__':
+    unittest.main()
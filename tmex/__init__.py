@@ -2,13 +2,38 @@
 # Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
 # Licensed under the MIT license.
 
-from .system import iteritems
+from .system import ISPYTHON3, iteritems
 
 from .tmex import PortTypes, TMSetupMessages
 from .tmex import TMFamilySpec
 from .tmex import TMReadDefaultPort, TMExtendedStartSession, TMValidSession, TMEndSession
-from .tmex import TMSetup, TMFirst, TMNext, TMRom, TMCRC, TMGetFamilySpec
-from .tmex import TMTouchReset, TMAccess, TMTouchByte, TMOneWireLevel
+from .tmex import TMSetup, TMFirst, TMNext, TMFirstAlarm, TMNextAlarm, TMFamilySearchSetup, TMRom, TMCRC
+from .tmex import TMGetFamilySpec
+from .tmex import TMTouchReset, TMAccess, TMStrongAccess, TMTouchBit, TMTouchByte, TMOneWireLevel, TMOneWireCom
+from .tmex import TMBlockIO, TMBlockStream
 from .tmex import TMEXException
 
-from .session import Session
+from .backend import Backend, TMEXBackend
+from .backend import LEVEL_NORMAL, LEVEL_STRONG_PULLUP, PRIME_NONE, PRIME_BIT, PRIME_BYTE
+from .backend import SPEED_STANDARD, SPEED_OVERDRIVE
+from .crc import CRCError, crc8, crc16, checkCrc8, checkCrc16, checkCrc8Blocks, checkCrc8Buffer
+from .wait import ConversionTimeout, pollSchedule, waitForConversion
+from .metrics import Metrics, MetricsSnapshot, HistogramSnapshot, MeteredBackend
+from .decode import decodeScratchpads
+from .drivers import Driver, ReadPlan, registerDriver, BRANCH_MAIN, BRANCH_AUX
+from .records import Device, Reading, ReadingBatch
+from .changes import ChangeFilter
+from .health import HealthMonitor, DeviceHealth
+from .romcache import RomCache
+from .stream import ReadingStream, StreamBatch
+from .history import HistoryStore
+from .ds2480 import DS2480Backend
+from .simulator import SimulatedBackend, SimulatedDevice, SimulatedDS1990A, SimulatedDS18B20, SimulatedDS18S20
+from .simulator import SimulatedDS2438, SimulatedDS2409
+
+from .session import Session, Scratchpads
+from .pool import SessionPool
+from .server import ReadingServer, ReadingClient
+from .replay import RecordingBackend, ReplayBackend, ReplayMismatch, readLog
+if ISPYTHON3:
+    from .asyncsession import AsyncSession
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .session import Session
+from .records import ReadingBatch
+
+class AsyncSession(object):
+    """
+    AsyncSession is an asyncio interface to a 1-Wire session.
+
+    The bus I/O runs on a dedicated executor thread that owns the session, and conversion waits are asyncio sleeps, so
+    a single event loop can serve many buses. Bus transactions of concurrent calls are serialized. The reads are the
+    ones of Session, the conversion waits of the retries of failed reads are done on the executor thread.
+    """
+
+    def __init__(self, port=0, backend=None, cacheFile=None):
+        """
+        Initializes a 1-Wire session on the executor thread, see Session.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._session = self._executor.submit(Session, port, backend, cacheFile)
+        self._lock = None
+
+    async def _call(self, func, *args, **kwargs):
+        """
+        Runs a function with the session as first argument on the executor thread.
+        """
+        session = await asyncio.wrap_future(self._session)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, session, *args, **kwargs))
+
+    def _busLock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def close(self):
+        """
+        Ends the session and stops the executor thread.
+        """
+        session = await asyncio.wrap_future(self._session)
+        await asyncio.get_running_loop().run_in_executor(self._executor, session.backend.close)
+        self._executor.shutdown(wait=False)
+
+    async def enumerate(self, familyFilter=None):
+        """
+        Enumerates the devices on the 1-Wire bus, see Session.enumrate.
+        """
+        async with self._busLock():
+            return await self._call(Session.enumrate, familyFilter)
+
+    async def verifyDevices(self, devices=None):
+        """
+        Check that known devices are still on the 1-Wire bus, see Session.verifyDevices.
+        """
+        async with self._busLock():
+            return await self._call(Session.verifyDevices, devices)
+
+    async def readDevice(self, deviceId, enableWireLeveling=False):
+        """
+        Reads the value from a device on the 1-Wire bus, see Session.readDevice. A conversion started by the device
+        reader blocks the executor thread, use readDevices to wait for conversions in the event loop.
+        """
+        async with self._busLock():
+            return await self._call(Session.readDevice, deviceId, enableWireLeveling)
+
+    async def readConfiguration(self, deviceId):
+        """
+        Reads the configuration of a DS18x20 thermometer, see Session.readConfiguration.
+        """
+        async with self._busLock():
+            return await self._call(Session.readConfiguration, deviceId)
+
+    async def writeConfiguration(self, deviceId, resolution=None, th=None, tl=None, copyToEeprom=False):
+        """
+        Writes the configuration of a DS18x20 thermometer, see Session.writeConfiguration.
+        """
+        async with self._busLock():
+            return await self._call(Session.writeConfiguration, deviceId, resolution, th, tl, copyToEeprom)
+
+    async def readDevices(self, devices, familyFilter=None, timeStamp=True):
+        """
+        Reads the value from a list of devices from the 1-Wire bus, see Session.readDevices. The conversion wait is
+        done in the event loop.
+        """
+        if len(devices) == 0:
+            return {}
+        batch = await self.readBatch(devices, familyFilter, timeStamp)
+        if len(batch) == 0:
+            return {}
+        return batch.asDict()
+
+    async def readBatch(self, devices, familyFilter=None, timeStamp=True):
+        """
+        Same as readDevices but returns the readings as a tmex.records.ReadingBatch, see Session.readBatch.
+        """
+        async with self._busLock():
+            if familyFilter:
+                devices = await self._call(Session._deviceFilter, devices, familyFilter)
+            batch = ReadingBatch(devices, timeStamp)
+            if len(devices) > 0:
+                # The steps of Session.readBatch, with the waits in the event loop
+                steps = await self._call(Session._readSteps, batch, devices)
+                try:
+                    until = None
+                    while True:
+                        wait = await self._call(Session._nextWait, steps, until)
+                        if wait is None:
+                            break
+                        delay, until = wait
+                        await asyncio.sleep(delay)
+                finally:
+                    await self._call(lambda session: steps.close())
+            batch.finish()
+            return batch
+
+    async def readChanges(self, devices, familyFilter=None, timeStamp=True):
+        """
+        Same as readBatch but only returns the readings that changed, see Session.readChanges.
+        """
+        batch = await self.readBatch(devices, familyFilter, timeStamp)
+        return await self._call(lambda session: session.changes.filter(batch))
+
+    async def readings(self, interval, devices=None, familyFilter=None, timeStamp=True):
+        """
+        Asynchronous iterator reading devices repeatedly.
+
+        interval:
+            The time in seconds from the start of one read to the start of the next.
+
+        devices:
+            A optional list of device ids to read, all known devices if omitted.
+
+        yields the result of readDevices for each read.
+        """
+        loop = asyncio.get_running_loop()
+        nextTime = loop.time()
+        while True:
+            if devices is None:
+                selected = list((await self._call(Session.devices)).keys())
+            else:
+                selected = devices
+            yield await self.readDevices(selected, familyFilter, timeStamp)
+            nextTime += interval
+            await asyncio.sleep(max(0, nextTime - loop.time()))
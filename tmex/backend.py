@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import time
+import ctypes
+from .tmex import TMEXException
+from .tmex import TMSetupMessages, TMOneWireComMessages
+from . import tmex
+from .system import monotonic
+
+# 1-Wire levels, see TMOneWireLevel
+LEVEL_NORMAL = 0
+LEVEL_STRONG_PULLUP = 1
+
+# When a level change takes effect, see TMOneWireLevel
+PRIME_NONE = 0
+PRIME_BIT = 1
+PRIME_BYTE = 2
+
+# 1-Wire speeds, same as the time modes of TMOneWireCom
+SPEED_STANDARD = 0
+SPEED_OVERDRIVE = 1
+
+# Results from touchReset, same as the result from TMTouchReset
+RESET_NO_PRESENCE = 0
+RESET_PRESENCE = 1
+RESET_ALARMING_PRESENCE = 2
+RESET_SHORTED = 3
+
+class Backend(object):
+    """
+    Backend is the base class for the 1-Wire bus backends used by Session.
+
+    A backend implements the bus primitives, reset, bit and byte touch, level control and the ROM search. The base
+    class implements the byte touch and the ROM search on top of touchReset and touchBit, so a minimal backend only
+    has to implement open, close, valid, touchReset, touchBit and oneWireLevel.
+    """
+
+    def __init__(self):
+        self._resetSearch()
+
+    def open(self, port=0):
+        """
+        Opens the bus.
+
+        port:
+            A optional port number or name, the meaning depends on the backend.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Closes the bus.
+        """
+        raise NotImplementedError()
+
+    def valid(self):
+        """
+        Check if the bus is open and valid.
+        """
+        raise NotImplementedError()
+
+    def touchReset(self):
+        """
+        Sends a reset pulse on the bus.
+
+        returns one of the RESET_* values.
+        """
+        raise NotImplementedError()
+
+    def touchBit(self, bit):
+        """
+        Sends a bit on the bus and returns the bit read back. Sending a 1 is a read time slot.
+        """
+        raise NotImplementedError()
+
+    def touchByte(self, byte):
+        """
+        Sends a byte on the bus and returns the byte read back. Sending 0xFF is eight read time slots.
+        """
+        result = 0
+        for i in range(8):
+            if self.touchBit((byte >> i) & 0x01):
+                result |= 1 << i
+        return result
+
+    def touchBlock(self, data, reset=False):
+        """
+        Sends a block of bytes on the bus and returns the bytes read back as a bytearray. Backends that can transfer a
+        block in a single adapter round trip override this.
+
+        data:
+            The bytes to send, 0xFF for every byte to read.
+
+        reset:
+            Sends a reset pulse before the block when True.
+        """
+        if reset:
+            self.touchReset()
+        return bytearray([self.touchByte(byte) for byte in bytearray(data)])
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        """
+        Changes the level of the bus.
+
+        level:
+            LEVEL_NORMAL or LEVEL_STRONG_PULLUP.
+
+        prime:
+            PRIME_NONE to change the level immediately, PRIME_BIT or PRIME_BYTE to change the level after the next bit
+            or byte.
+        """
+        raise NotImplementedError()
+
+    def setSpeed(self, speed):
+        """
+        Changes the speed of the bus. The change takes effect immediately, devices are switched to overdrive with the
+        overdrive ROM commands and back to standard speed by a reset at standard speed.
+
+        speed:
+            SPEED_STANDARD or SPEED_OVERDRIVE.
+
+        Raises TMEXException if the backend does not support the speed.
+        """
+        if speed != SPEED_STANDARD:
+            raise TMEXException('Overdrive not supported by the backend')
+        return speed
+
+    def first(self):
+        """
+        Finds the first device on the bus.
+
+        returns True if a device was found. The ROM of the device is available through rom.
+        """
+        self._resetSearch()
+        return self._search()
+
+    def next(self):
+        """
+        Finds the next device on the bus.
+
+        returns True if a device was found. The ROM of the device is available through rom.
+        """
+        return self._search()
+
+    def firstAlarm(self):
+        """
+        Finds the first device on the bus with an alarm condition, with ALARM SEARCH.
+
+        returns True if a device was found. The ROM of the device is available through rom.
+        """
+        self._resetSearch()
+        return self._search(0xEC)
+
+    def nextAlarm(self):
+        """
+        Finds the next device on the bus with an alarm condition.
+
+        returns True if a device was found. The ROM of the device is available through rom.
+        """
+        return self._search(0xEC)
+
+    def familySearchSetup(self, family):
+        """
+        Sets up the search so the following call to next finds the first device of a family. The search continues with
+        the devices of the following families, so the caller stops when the family of the ROM changes.
+        """
+        self._searchRom = [family] + [0] * 7
+        self._lastDiscrepancy = 64
+        self._lastDevice = False
+
+    def rom(self):
+        """
+        Returns the ROM of the device found by the last search as a list of 8 integers, family code first.
+        """
+        return list(self._searchRom)
+
+    def verify(self, rom):
+        """
+        Check if a device is on the bus with a search for its ROM, without affecting an ongoing search.
+
+        rom:
+            The ROM of the device as a sequence of 8 integers.
+        """
+        state = (self._searchRom, self._lastDiscrepancy, self._lastDevice)
+        rom = list(rom)
+        self._searchRom = list(rom)
+        self._lastDiscrepancy = 64
+        self._lastDevice = False
+        try:
+            return self._search() and self._searchRom == rom
+        finally:
+            (self._searchRom, self._lastDiscrepancy, self._lastDevice) = state
+
+    def sleep(self, seconds):
+        """
+        Waits while the bus is idle, for a conversion or an EEPROM write. Backends without a real bus, like
+        tmex.replay.ReplayBackend, may return at once.
+        """
+        time.sleep(seconds)
+
+    def clock(self):
+        """
+        Returns the time of the bus in seconds, a monotonic clock the session times its waits, retries and quarantines
+        with. Backends without a real bus, like tmex.replay.ReplayBackend, may keep a clock of their own.
+        """
+        return monotonic()
+
+    def _resetSearch(self):
+        self._searchRom = [0] * 8
+        self._lastDiscrepancy = 0
+        self._lastDevice = False
+
+    def _search(self, command=0xF0):
+        """
+        The 1-Wire search algorithm, see Maxim application note 187.
+
+        command:
+            The search command, SEARCH ROM or ALARM SEARCH.
+        """
+        if self._lastDevice:
+            self._resetSearch()
+            return False
+        if self.touchReset() not in (RESET_PRESENCE, RESET_ALARMING_PRESENCE):
+            self._resetSearch()
+            return False
+        self.touchByte(command) # SEARCH ROM or ALARM SEARCH
+        rom = self._searchRom
+        lastZero = 0
+        for bitNumber in range(1, 65):
+            index = (bitNumber - 1) >> 3
+            mask = 1 << ((bitNumber - 1) & 0x07)
+            idBit = self.touchBit(1)
+            complementBit = self.touchBit(1)
+            if idBit and complementBit:
+                # No device is participating in the search
+                self._resetSearch()
+                return False
+            if idBit != complementBit:
+                direction = idBit
+            else:
+                if bitNumber < self._lastDiscrepancy:
+                    direction = 1 if rom[index] & mask else 0
+                else:
+                    direction = 1 if bitNumber == self._lastDiscrepancy else 0
+                if direction == 0:
+                    lastZero = bitNumber
+            if direction:
+                rom[index] |= mask
+            else:
+                rom[index] &= ~mask & 0xFF
+            self.touchBit(direction)
+        self._lastDiscrepancy = lastZero
+        if lastZero == 0:
+            self._lastDevice = True
+        return True
+
+class TMEXBackend(Backend):
+    """
+    Backend using the TMEX library, IBFS32.DLL or IBFS64.DLL, on Windows.
+    """
+
+    def __init__(self, library=None):
+        """
+        Initializes the backend.
+
+        library:
+            A optional object with the TMEX functions of tmex.tmex as attributes, the TMEX library if omitted. Used to
+            run the backend against a fake of the library.
+        """
+        Backend.__init__(self)
+        self._library = library if library is not None else tmex
+        self._handle = 0
+        self._context = ctypes.create_string_buffer(15360)
+
+    def open(self, port=0):
+        """
+        Starts a TMEX session.
+
+        port:
+            A optional port number that will be used to start the session.
+        """
+        portNumber = ctypes.c_short(port)
+        portType = ctypes.c_short(0)
+        self._library.TMReadDefaultPort(portNumber, portType)
+
+        self._handle = self._library.TMExtendedStartSession(portNumber, portType, None)
+
+        result = self._library.TMSetup(self._handle)
+        if (result != 1):
+            self.close()
+            if result in TMSetupMessages:
+                raise TMEXException(TMSetupMessages[result])
+            else:
+                raise TMEXException('Unknown setup error, %d' % (result))
+
+    def close(self):
+        if self._handle != 0:
+            self._library.TMEndSession(self._handle)
+            self._handle = 0
+
+    def valid(self):
+        if self._handle == 0:
+            return False
+        return self._library.TMValidSession(self._handle) == 1
+
+    def touchReset(self):
+        return self._library.TMTouchReset(self._handle)
+
+    def touchBit(self, bit):
+        return self._library.TMTouchBit(self._handle, bit)
+
+    def touchByte(self, byte):
+        return self._library.TMTouchByte(self._handle, byte)
+
+    def touchBlock(self, data, reset=False):
+        data = bytearray(data)
+        block = (ctypes.c_ubyte * len(data))(*data)
+        if reset:
+            result = self._library.TMBlockIO(self._handle, block, len(data))
+        else:
+            result = self._library.TMBlockStream(self._handle, block, len(data))
+        if result != len(data):
+            raise TMEXException('Block transfer failed, %d' % (result))
+        return bytearray(block)
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        return self._library.TMOneWireLevel(self._handle, 0, level, prime)
+
+    def setSpeed(self, speed):
+        result = self._library.TMOneWireCom(self._handle, 0, speed)
+        if result < 0:
+            raise TMEXException(TMOneWireComMessages.get(result, 'Unknown error, %d' % (result)))
+        return speed
+
+    def first(self):
+        return self._library.TMFirst(self._handle, self._context) > 0
+
+    def next(self):
+        return self._library.TMNext(self._handle, self._context) > 0
+
+    def firstAlarm(self):
+        return self._library.TMFirstAlarm(self._handle, self._context) > 0
+
+    def nextAlarm(self):
+        return self._library.TMNextAlarm(self._handle, self._context) > 0
+
+    def familySearchSetup(self, family):
+        self._library.TMFamilySearchSetup(self._handle, self._context, family)
+
+    def rom(self):
+        rom = (ctypes.c_short * 8)()
+        if self._library.TMRom(self._handle, self._context, rom) != 1:
+            raise TMEXException('Failed to read ROM')
+        return [int(x) for x in rom]
+
+    def verify(self, rom):
+        # TMRom sets the current ROM when the first element is not zero
+        current = (ctypes.c_short * 8)(*rom)
+        if self._library.TMRom(self._handle, self._context, current) != 1:
+            raise TMEXException('Failed to set ROM')
+        return self._library.TMStrongAccess(self._handle, self._context) == 1
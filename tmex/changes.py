@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from .system import monotonicNs
+from .records import Reading
+
+# Default maximum time in seconds between two reported readings of a device, see ChangeFilter
+MAX_SILENCE = 600.0
+
+class ChangeFilter(object):
+    """
+    ChangeFilter is a last-value cache that passes on the readings that changed, see Session.readChanges.
+
+    A reading is a change when one of its values has moved more than the deadband from the value last reported for
+    the device, when a value appears or disappears, or when the device has not been reported for maxSilence seconds,
+    as a heartbeat. Readings without any value, failed reads, are never reported and leave the cache as it is. The
+    deadband and maxSilence can be set for each family, see setFamily.
+    """
+
+    def __init__(self, deadband=0.0, maxSilence=MAX_SILENCE):
+        """
+        Initializes a filter.
+
+        deadband:
+            The default deadband, a number for all values or a dict of numbers by value name, 'temperature' and
+            'humidity'. Values without a deadband in the dict have a deadband of 0, any change is reported.
+
+        maxSilence:
+            The default maximum time in seconds between two reported readings of a device, None for no heartbeat.
+        """
+        self.deadband = deadband
+        self.maxSilence = maxSilence
+        self._families = {}
+        # The last reported values by device id, a tuple of the temperature, the humidity, the other values, and the
+        # monotonic and the wall clock time of the report in nanoseconds
+        self._last = {}
+
+    def setFamily(self, family, deadband=None, maxSilence=None):
+        """
+        Sets the deadband and maxSilence of a family, see __init__. The defaults are used for the ones omitted.
+        """
+        self._families[family] = (deadband, maxSilence)
+
+    def _settings(self, deviceId):
+        """
+        Returns the deadband and maxSilence in nanoseconds of a device.
+        """
+        deadband, maxSilence = self._families.get(int(deviceId[:2], 16), (None, None))
+        if deadband is None:
+            deadband = self.deadband
+        if maxSilence is None:
+            maxSilence = self.maxSilence
+        return deadband, None if maxSilence is None else int(maxSilence * 1000000000)
+
+    def filter(self, batch):
+        """
+        Returns the readings of a tmex.records.ReadingBatch that are changes as a new batch, and remembers them as the
+        last reported values.
+        """
+        now = batch.stop if batch.stop is not None else monotonicNs()
+        temperatures = batch.temperatures
+        humidities = batch.humidities
+        timestamps = batch.timestamps
+        extras = batch.extras
+        changed = []
+        for index, deviceId in enumerate(batch.devices):
+            temperature = temperatures[index]
+            humidity = humidities[index]
+            extra = extras.get(index) if extras is not None else None
+            if temperature != temperature and humidity != humidity and not extra:
+                continue
+            reported = now if timestamps is None else timestamps[index]
+            last = self._last.get(deviceId)
+            if last is None or self._changed(deviceId, last, temperature, humidity, extra, reported):
+                self._last[deviceId] = (temperature, humidity, extra, reported, reported + batch.epochOffset)
+                changed.append(index)
+        return batch.select(changed)
+
+    def _changed(self, deviceId, last, temperature, humidity, extra, reported):
+        deadband, maxSilence = self._settings(deviceId)
+        if maxSilence is not None and reported - last[3] >= maxSilence:
+            return True
+        for name, value, previous in (('temperature', temperature, last[0]), ('humidity', humidity, last[1])):
+            if _moved(value, previous, _deadband(deadband, name)):
+                return True
+        previous = last[2] or {}
+        extra = extra or {}
+        if set(previous) != set(extra):
+            return True
+        for name, value in extra.items():
+            if isinstance(value, (int, float)) and isinstance(previous[name], (int, float)):
+                if _moved(value, previous[name], _deadband(deadband, name)):
+                    return True
+            elif value != previous[name]:
+                return True
+        return False
+
+    def last(self, deviceId):
+        """
+        Returns the last reported reading of a device as a tmex.records.Reading, None if it has not been reported.
+        """
+        last = self._last.get(deviceId)
+        if last is None:
+            return None
+        temperature, humidity, extra, reported, timestamp = last
+        return Reading(None if temperature != temperature else temperature, None if humidity != humidity else humidity,
+            timestamp, extra)
+
+    def forget(self, deviceId=None):
+        """
+        Forgets the last reported reading of a device, or of all devices if omitted, so the next reading is reported.
+        """
+        if deviceId is None:
+            self._last = {}
+        else:
+            self._last.pop(deviceId, None)
+
+def _deadband(deadband, name):
+    if isinstance(deadband, dict):
+        return deadband.get(name, 0.0)
+    return deadband
+
+def _moved(value, previous, deadband):
+    """
+    Returns True if a value has moved more than the deadband, or appeared or disappeared. Missing values are NaN.
+    """
+    if value != value or previous != previous:
+        return (value != value) != (previous != previous)
+    return abs(value - previous) > deadband
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from .tmex import TMEXException
+
+class CRCError(TMEXException):
+    pass
+
+def _table(polynomial, bits):
+    """
+    Builds a lookup table for a reflected CRC.
+    """
+    table = []
+    for value in range(256):
+        crc = value
+        for i in range(8):
+            if crc & 0x01:
+                crc = (crc >> 1) ^ polynomial
+            else:
+                crc >>= 1
+        table.append(crc & ((1 << bits) - 1))
+    return table
+
+# Dallas/Maxim CRC8, x^8 + x^5 + x^4 + 1
+CRC8_TABLE = _table(0x8C, 8)
+# Dallas/Maxim CRC16, x^16 + x^15 + x^2 + 1
+CRC16_TABLE = _table(0xA001, 16)
+
+def crc8(data, crc=0):
+    """
+    Calculates the 1-Wire CRC8 of a sequence of byte values, such as a bytearray or a list of integers.
+
+    crc:
+        A optional start value, allows the CRC to be calculated in parts.
+    """
+    table = CRC8_TABLE
+    for byte in bytearray(data):
+        crc = table[crc ^ byte]
+    return crc
+
+def crc16(data, crc=0):
+    """
+    Calculates the 1-Wire CRC16 of a sequence of byte values. Note that the devices send the inverted CRC16.
+
+    crc:
+        A optional start value, allows the CRC to be calculated in parts.
+    """
+    table = CRC16_TABLE
+    for byte in bytearray(data):
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+def checkCrc8(data):
+    """
+    Check a block of data ending with its CRC8, such as a ROM or a scratchpad.
+    """
+    return crc8(data) == 0
+
+def checkCrc16(data):
+    """
+    Check a block of data ending with its inverted CRC16, least significant byte first, as sent by the devices.
+    """
+    return crc16(data) == 0xB001
+
+def checkCrc8Blocks(blocks):
+    """
+    Check many blocks of data ending with their CRC8 in one call.
+
+    blocks:
+        A sequence of blocks.
+
+    returns a list of booleans, one for each block.
+    """
+    table = CRC8_TABLE
+    result = []
+    for block in blocks:
+        crc = 0
+        for byte in bytearray(block):
+            crc = table[crc ^ byte]
+        result.append(crc == 0)
+    return result
+
+def checkCrc8Buffer(buffer, size):
+    """
+    Check a contiguous buffer of equally sized blocks, each ending with its CRC8, in one call.
+
+    buffer:
+        A bytes, bytearray or memoryview with the blocks back to back.
+
+    size:
+        The size of each block including the CRC.
+
+    returns a list of booleans, one for each block.
+    """
+    table = CRC8_TABLE
+    data = bytearray(buffer)
+    result = []
+    for offset in range(0, len(data) - size + 1, size):
+        crc = 0
+        for index in range(offset, offset + size):
+            crc = table[crc ^ data[index]]
+        result.append(crc == 0)
+    return result
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import struct
+from array import array
+from .crc import CRC8_TABLE, checkCrc8Buffer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Size of a scratchpad including the CRC, DS18B20, DS18S20 and DS2438 page 0
+SCRATCHPAD_SIZE = 9
+
+# Supply voltage of the HIH-4021 humidity sensors on the DS2438s
+HUMIDITY_SUPPLY = 5.0
+
+_INT16 = struct.Struct('<h')
+_UINT16 = struct.Struct('<H')
+
+def decodeDS18B20Temperature(data, offset=0):
+    """
+    Decodes the temperature in degrees Celsius from a DS18B20 scratchpad, a two's complement number of 1/16 degrees.
+    The bits below the resolution in the configuration register are undefined and cleared.
+    """
+    raw = _INT16.unpack_from(data, offset)[0]
+    undefined = 3 - ((data[offset + 4] >> 5) & 0x03)
+    return (raw & ~((1 << undefined) - 1)) / 16.0
+
+def decodeDS18B20Resolution(data, offset=0):
+    """
+    Decodes the resolution in bits, 9 to 12, from the configuration register of a DS18B20 scratchpad.
+    """
+    return ((data[offset + 4] >> 5) & 0x03) + 9
+
+def decodeDS18S20Temperature(data, offset=0):
+    """
+    Decodes the temperature in degrees Celsius from a DS18S20 scratchpad, extended to 1/16 degrees with COUNT REMAIN
+    and COUNT PER C, see the DS18S20 datasheet.
+    """
+    raw = _INT16.unpack_from(data, offset)[0]
+    countRemain = data[offset + 6]
+    countPerC = data[offset + 7]
+    if countPerC == 0:
+        return raw / 2.0
+    return (raw >> 1) - 0.25 + (countPerC - countRemain) / float(countPerC)
+
+def decodeDS2438Temperature(data, offset=0):
+    """
+    Decodes the temperature in degrees Celsius from DS2438 page 0, a two's complement number of 1/32 degrees in the
+    upper 13 bits.
+    """
+    return (_INT16.unpack_from(data, offset + 1)[0] >> 3) * 0.03125
+
+def decodeDS2438Voltage(data, offset=0):
+    """
+    Decodes the voltage in volts from DS2438 page 0, 10 bits of 10 mV.
+    """
+    return (_UINT16.unpack_from(data, offset + 3)[0] & 0x03FF) * 0.01
+
+def humidity(voltage, temperature, supply=HUMIDITY_SUPPLY):
+    """
+    Converts the output voltage of a HIH-4021 to temperature compensated relative humidity, see the HIH-4021 datasheet.
+    """
+    sensor = ((voltage / supply) - 0.16) / 0.0062
+    return sensor / (1.0546 - (0.00216 * temperature))
+
+def _decodeDS18B20(data, offset):
+    return decodeDS18B20Temperature(data, offset), None
+
+def _decodeDS18S20(data, offset):
+    return decodeDS18S20Temperature(data, offset), None
+
+def _decodeDS2438(data, offset):
+    temperature = decodeDS2438Temperature(data, offset)
+    return temperature, humidity(decodeDS2438Voltage(data, offset), temperature)
+
+# Scratchpad decoders by family code, returning the temperature and the humidity or None
+DECODERS = {
+    0x10: _decodeDS18S20,
+    0x26: _decodeDS2438,
+    0x28: _decodeDS18B20,
+}
+
+def decodeScratchpads(families, data, useNumPy=None):
+    """
+    Decodes a block of scratchpads, see Session.readScratchpads, in one call.
+
+    families:
+        A sequence with the family code of each scratchpad.
+
+    data:
+        A bytes, bytearray or memoryview with the scratchpads back to back, SCRATCHPAD_SIZE bytes each.
+
+    useNumPy:
+        Decodes with NumPy when True, without when False, and with NumPy when it is installed if omitted.
+
+    returns a dict with arrays of 'temperature' and 'humidity', NaN where the device has no such value or the
+    scratchpad is corrupt, and an array of 'valid' flags. The arrays are NumPy arrays when decoded with NumPy.
+    """
+    if useNumPy is None:
+        useNumPy = numpy is not None
+    if useNumPy:
+        if numpy is None:
+            raise ImportError('NumPy is not installed')
+        return _decodeNumPy(families, data)
+    return _decodeTable(families, data)
+
+def _decodeTable(families, data):
+    families = bytearray(families)
+    data = bytearray(data)
+    nan = float('nan')
+    count = len(data) // SCRATCHPAD_SIZE
+    temperatures = array('d', [nan]) * count
+    humidities = array('d', [nan]) * count
+    valid = checkCrc8Buffer(data, SCRATCHPAD_SIZE)
+    for index in range(count):
+        offset = index * SCRATCHPAD_SIZE
+        decoder = DECODERS.get(families[index])
+        if decoder is None or not valid[index] or not any(data[offset:offset + SCRATCHPAD_SIZE]):
+            valid[index] = False
+            continue
+        temperature, rh = decoder(data, offset)
+        temperatures[index] = temperature
+        if rh is not None:
+            humidities[index] = rh
+    return {'temperature': temperatures, 'humidity': humidities, 'valid': valid}
+
+def _decodeNumPy(families, data):
+    pads = numpy.frombuffer(bytes(data), dtype=numpy.uint8).reshape(-1, SCRATCHPAD_SIZE)
+    families = numpy.asarray(bytearray(families), dtype=numpy.uint8)[:len(pads)]
+    count = len(pads)
+    # CRC8 of every scratchpad at once, a table lookup per byte column
+    table = numpy.asarray(CRC8_TABLE, dtype=numpy.uint8)
+    crc = numpy.zeros(count, dtype=numpy.uint8)
+    for column in range(SCRATCHPAD_SIZE):
+        crc = table[crc ^ pads[:, column]]
+    valid = (crc == 0) & pads.any(axis=1) & numpy.isin(families, list(DECODERS.keys()))
+
+    temperatures = numpy.full(count, numpy.nan)
+    humidities = numpy.full(count, numpy.nan)
+    # Little-endian 16-bit words of the scratchpads, the temperature word of DS18x20s at 0, of DS2438s at 1
+    words = numpy.ascontiguousarray(pads[:, 0:5]).astype(numpy.int32)
+    low = words[:, 0] | (words[:, 1] << 8)
+    high = words[:, 1] | (words[:, 2] << 8)
+    low = numpy.where(low & 0x8000, low - 0x10000, low)
+    high = numpy.where(high & 0x8000, high - 0x10000, high)
+
+    mask = valid & (families == 0x28)
+    undefined = 3 - ((pads[:, 4].astype(numpy.int32) >> 5) & 0x03)
+    temperatures[mask] = (low & ~((1 << undefined) - 1))[mask] / 16.0
+
+    mask = valid & (families == 0x10)
+    countRemain = pads[:, 6].astype(numpy.float64)
+    countPerC = pads[:, 7].astype(numpy.float64)
+    extended = (low >> 1) - 0.25 + (countPerC - countRemain) / numpy.where(countPerC == 0, 1, countPerC)
+    temperatures[mask] = numpy.where(countPerC == 0, low / 2.0, extended)[mask]
+
+    mask = valid & (families == 0x26)
+    temperature = (high >> 3) * 0.03125
+    voltage = ((words[:, 3] | (words[:, 4] << 8)) & 0x03FF) * 0.01
+    temperatures[mask] = temperature[mask]
+    humidities[mask] = humidity(voltage, temperature)[mask]
+    return {'temperature': temperatures, 'humidity': humidities, 'valid': valid}
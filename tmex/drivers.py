@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from .tmex import TMEXException
+from .backend import LEVEL_NORMAL, LEVEL_STRONG_PULLUP, PRIME_NONE, PRIME_BYTE
+from .decode import decodeDS18B20Temperature, decodeDS18B20Resolution, decodeDS18S20Temperature
+from .decode import decodeDS2438Temperature
+from .decode import decodeDS2438Voltage, humidity
+
+# Maximum DS2438 conversion time in seconds, temperature or voltage
+DS2438_CONVERSION_TIME = 0.010
+
+# Maximum DS18B20 temperature conversion time in seconds by resolution in bits
+DS18B20_CONVERSION_TIMES = {9: 0.09375, 10: 0.1875, 11: 0.375, 12: 0.750}
+
+# Maximum DS18S20 temperature conversion time in seconds
+DS18S20_CONVERSION_TIME = 0.750
+
+# Maximum EEPROM write time in seconds of COPY SCRATCHPAD on the DS18x20s
+EEPROM_WRITE_TIME = 0.010
+
+# Temperature in the scratchpad of a DS18x20 after power-on, until its first conversion
+POWER_ON_TEMPERATURE = 85.0
+
+# Lines of a DS2409 coupler, see DS2409Driver
+BRANCH_MAIN = 'main'
+BRANCH_AUX = 'aux'
+
+# Device driver classes by family code, see registerDriver
+DRIVERS = {}
+
+def registerDriver(driver):
+    """
+    Registers a device driver class for its family code, replacing any driver of the family. Can be used as a class
+    decorator.
+    """
+    DRIVERS[driver.family] = driver
+    return driver
+
+class ReadPlan(object):
+    """
+    A read of a list of devices compiled ahead of time, see Session.readDevices.
+
+    devices:         The device ids in the plan.
+    conversionTime:  The expected time in seconds of the broadcast temperature conversion, 0 if no device converts.
+    polled:          True if the end of the conversion can be polled, False if other devices on the bus may convert
+                     for longer than the devices in the plan and the conversion time is waited out instead.
+    broadcasts:      A list of the broadcast frames to send after the temperature conversion, with the time in seconds
+                     to wait after them.
+    steps:           A list of the reads of the devices, a tuple of the device id, the driver and a list of the
+                     transactions. A transaction is a tuple of the complete frame, the command and the read count.
+    """
+
+    __slots__ = ('devices', 'conversionTime', 'polled', 'broadcasts', 'steps')
+
+    def __init__(self, devices, conversionTime, polled, broadcasts, steps):
+        self.devices = devices
+        self.conversionTime = conversionTime
+        self.polled = polled
+        self.broadcasts = broadcasts
+        self.steps = steps
+
+class Driver(object):
+    """
+    Driver is the base class for the device drivers of a session. A driver describes how the devices of a family are
+    converted and read, and decodes what is read. A session has one driver instance for each family it reads.
+    """
+
+    family = None
+    name = None
+    description = None
+    # Expected time in seconds of the broadcast temperature conversion, 0 if the family does not convert
+    conversionTime = 0
+    # Broadcast frames sent after the temperature conversion, with the time in seconds to wait after them
+    broadcasts = ()
+    # True if the devices have a configuration, see readConfiguration, and the resolutions in bits they support
+    configurable = False
+    resolutions = ()
+    # True if the devices take part in ALARM SEARCH when their values are outside their alarm thresholds
+    alarms = False
+
+    def __init__(self, session):
+        self.session = session
+
+    def expectedConversionTime(self, deviceId):
+        """
+        Returns the expected temperature conversion time of a device in seconds.
+        """
+        return self.conversionTime
+
+    def transactions(self, deviceId):
+        """
+        Returns the transactions reading the converted values of a device, a list of tuples of the command and the
+        number of bytes to read. The bytes read by the last transaction are passed to decode.
+        """
+        return []
+
+    def decode(self, data, deviceId=None):
+        """
+        Decodes the bytes read by the last transaction, after the CRC check.
+
+        deviceId:
+            The device id of the device the bytes were read from, if known.
+
+        returns a dict of values.
+        """
+        return {}
+
+    def isPowerOnValue(self, values):
+        """
+        Returns True if decoded values are the power-on values of the device, a conversion that did not happen.
+        """
+        return False
+
+    def readConfiguration(self, deviceId):
+        """
+        Reads the configuration of a device.
+
+        returns a dict of the configuration values.
+        """
+        raise TMEXException('{} has no configuration'.format(deviceId))
+
+    def writeConfiguration(self, deviceId, resolution=None, th=None, tl=None, copyToEeprom=False):
+        """
+        Writes the configuration of a device, see Session.writeConfiguration.
+
+        returns the configuration read back from the device.
+        """
+        raise TMEXException('{} has no configuration'.format(deviceId))
+
+    def convert(self, deviceId, enableWireLeveling):
+        """
+        Converts the values of a single device, see Session.readDevice.
+        """
+        pass
+
+    def read(self, deviceId, enableWireLeveling=False, convert=True):
+        """
+        Reads a single device.
+
+        returns a dict of values.
+        """
+        if convert:
+            self.convert(deviceId, enableWireLeveling)
+        session = self.session
+        data = None
+        for command, readCount in self.transactions(deviceId):
+            data = session._transaction(deviceId, command, readCount)
+        if data is None:
+            return {}
+        session._checkScratchpad(deviceId, data)
+        return self.decode(data, deviceId)
+
+class _ThermometerDriver(Driver):
+    """
+    Base class for the DS18x20 thermometers, which convert with CONVERT T on strong pullup. The alarm thresholds TH
+    and TL, and the resolution of the DS18B20, are written to the scratchpad and copied to EEPROM.
+    """
+
+    configurable = True
+    alarms = True
+
+    def transactions(self, deviceId):
+        return [(0xBE, 9)] # READ SCRATCHPAD
+
+    def convert(self, deviceId, enableWireLeveling):
+        # Without wire leveling the last broadcast conversion is read
+        if not enableWireLeveling:
+            return
+        session = self.session
+        backend = session._backend
+        session._addressDevice(deviceId)
+        backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_BYTE)
+        backend.touchByte(0x44) # CONVERT T
+        try:
+            session._waitConversion(self.expectedConversionTime(deviceId), deviceId)
+        finally:
+            backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+
+    def isPowerOnValue(self, values):
+        return values.get('temperature') == POWER_ON_TEMPERATURE
+
+    def readConfiguration(self, deviceId):
+        data = self.session._transaction(deviceId, 0xBE, 9) # READ SCRATCHPAD
+        self.session._checkScratchpad(deviceId, data)
+        return self._configuration(deviceId, data)
+
+    def _configuration(self, deviceId, data):
+        """
+        Returns the configuration in a scratchpad.
+        """
+        return {'th': _signed(data[2]), 'tl': _signed(data[3])}
+
+    def _writeCommand(self, configuration):
+        """
+        Returns the WRITE SCRATCHPAD command of a configuration.
+        """
+        return [0x4E, configuration['th'] & 0xFF, configuration['tl'] & 0xFF]
+
+    def writeConfiguration(self, deviceId, resolution=None, th=None, tl=None, copyToEeprom=False):
+        if resolution is not None and resolution not in self.resolutions:
+            raise ValueError('Unsupported resolution {} of {}'.format(resolution, deviceId))
+        for threshold in (th, tl):
+            if threshold is not None and not -128 <= threshold <= 127:
+                raise ValueError('Alarm threshold {} out of range'.format(threshold))
+        session = self.session
+        # WRITE SCRATCHPAD writes all of the configuration, the values not given are kept
+        configuration = self.readConfiguration(deviceId)
+        for key, value in (('resolution', resolution), ('th', th), ('tl', tl)):
+            if value is not None:
+                configuration[key] = value
+        session._transaction(deviceId, self._writeCommand(configuration))
+        written = self.readConfiguration(deviceId)
+        if written != configuration:
+            raise TMEXException('Failed to write the configuration of {}'.format(deviceId))
+        if copyToEeprom:
+            self._copyScratchpad(deviceId)
+        return written
+
+    def _copyScratchpad(self, deviceId):
+        """
+        Copies the configuration in the scratchpad of a device to EEPROM, on strong pullup for parasite power.
+        """
+        session = self.session
+        backend = session._backend
+        session._addressDevice(deviceId)
+        backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_BYTE)
+        backend.touchByte(0x48) # COPY SCRATCHPAD
+        try:
+            backend.sleep(EEPROM_WRITE_TIME)
+        finally:
+            backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+
+@registerDriver
+class DS18B20Driver(_ThermometerDriver):
+    family = 0x28
+    name = "DS18B2"
+    description = "Programmable Resolution 1-Wire Digital Thermometer"
+    conversionTime = DS18B20_CONVERSION_TIMES[12]
+    resolutions = (9, 10, 11, 12)
+
+    def __init__(self, session):
+        _ThermometerDriver.__init__(self, session)
+        # Resolutions in bits by device id, as last read from the devices
+        self._resolutions = {}
+
+    def resolution(self, deviceId):
+        """
+        Returns the resolution of a device in bits as last read from it, None if it is not known yet.
+        """
+        return self._resolutions.get(deviceId)
+
+    def _setResolution(self, deviceId, resolution):
+        """
+        Remembers the resolution of a device. The read plans are compiled again if it changed, as their conversion
+        time depends on it.
+        """
+        if self._resolutions.get(deviceId) != resolution:
+            self._resolutions[deviceId] = resolution
+            self.session._invalidatePlans()
+
+    def expectedConversionTime(self, deviceId):
+        # Devices of unknown resolution are expected to run at 12 bits, the power-on default
+        return DS18B20_CONVERSION_TIMES.get(self._resolutions.get(deviceId), self.conversionTime)
+
+    def decode(self, data, deviceId=None):
+        if deviceId is not None:
+            self._setResolution(deviceId, decodeDS18B20Resolution(data))
+        return {'temperature': decodeDS18B20Temperature(data)}
+
+    def _configuration(self, deviceId, data):
+        resolution = decodeDS18B20Resolution(data)
+        self._setResolution(deviceId, resolution)
+        configuration = _ThermometerDriver._configuration(self, deviceId, data)
+        configuration['resolution'] = resolution
+        return configuration
+
+    def _writeCommand(self, configuration):
+        command = _ThermometerDriver._writeCommand(self, configuration)
+        command.append(((configuration['resolution'] - 9) << 5) | 0x1F)
+        return command
+
+@registerDriver
+class DS18S20Driver(_ThermometerDriver):
+    family = 0x10
+    name = "DS18S2"
+    description = "High-Precision 1-Wire Digital Thermometer"
+    conversionTime = DS18S20_CONVERSION_TIME
+
+    def decode(self, data, deviceId=None):
+        return {'temperature': decodeDS18S20Temperature(data)}
+
+@registerDriver
+class DS2438Driver(Driver):
+    """
+    DS2438 connected to a HIH-4021 humidity sensor.
+    """
+
+    family = 0x26
+    name = "DS2438"
+    description = "Smart Battery Monitor"
+    conversionTime = DS2438_CONVERSION_TIME
+    # The DS2438s convert their temperature with the others, their voltage with a CONVERT V broadcast. Other families
+    # may take CONVERT V for another command, so the conversion time is waited out instead of polled.
+    broadcasts = ((bytearray([0xCC, 0xB4]), DS2438_CONVERSION_TIME),)
+
+    def transactions(self, deviceId):
+        return [([0xB8, 0x00], 0), ([0xBE, 0x00], 9)] # RECALL MEMORY page 0, READ SCRATCHPAD page 0
+
+    def decode(self, data, deviceId=None):
+        temperature = decodeDS2438Temperature(data)
+        return {'temperature': temperature, 'humidity': humidity(decodeDS2438Voltage(data), temperature)}
+
+    def convert(self, deviceId, enableWireLeveling):
+        session = self.session
+        for command in (0x44, 0xB4): # CONVERT T, CONVERT V
+            session._transaction(deviceId, command)
+            session._waitConversion(DS2438_CONVERSION_TIME, deviceId)
+
+@registerDriver
+class DS1990ADriver(Driver):
+    """
+    DS1990A serial number iButton, which has nothing to read but its ROM.
+    """
+
+    family = 0x01
+    name = "DS1990A"
+    description = "Serial Number iButton"
+
+# DS2409 commands connecting a line with a reset of the line, SMART-ON MAIN and SMART-ON AUXILIARY, by line
+_SMART_ON = {BRANCH_MAIN: 0xCC, BRANCH_AUX: 0x33}
+
+@registerDriver
+class DS2409Driver(Driver):
+    """
+    DS2409 MicroLAN coupler, which connects the bus it is on to its main or auxiliary line, the branches of the network.
+    The coupler has nothing to read, the session switches the branches, see Session.topology.
+    """
+
+    family = 0x1F
+    name = "DS2409"
+    description = "MicroLAN Coupler"
+    lines = (BRANCH_MAIN, BRANCH_AUX)
+
+    def switchOn(self, deviceId, line):
+        """
+        Connects a line of a coupler with SMART-ON, the coupler resets the line before it is connected. The coupler must
+        be on the bus or on a connected branch.
+
+        line:
+            BRANCH_MAIN or BRANCH_AUX.
+
+        Raises TMEXException if the coupler does not confirm the command.
+        """
+        command = _SMART_ON[line]
+        session = self.session
+        # The command is followed by the reset stimulus and the confirmation byte, the command echoed by the coupler
+        frame = session._frame(deviceId, [command, 0xFF], 1)
+        data = session._backend.touchBlock(frame, reset=True)
+        if data[-1] != command:
+            raise TMEXException('{} did not switch on its {} line'.format(deviceId, line))
+
+    def allLinesOff(self):
+        """
+        Disconnects the lines of all couplers on the bus and on the connected branches with a broadcast of ALL LINES
+        OFF.
+        """
+        self.session._backend.touchBlock(bytearray([0xCC, 0x66, 0xFF]), reset=True)
+
+def _signed(byte):
+    """
+    Returns a byte as a two's complement number.
+    """
+    return byte - 256 if byte > 127 else byte
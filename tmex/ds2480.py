@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import os
+import select
+import time
+from .tmex import TMEXException
+from .backend import Backend
+from .backend import LEVEL_STRONG_PULLUP, PRIME_NONE, SPEED_STANDARD, SPEED_OVERDRIVE
+from .backend import RESET_NO_PRESENCE, RESET_PRESENCE, RESET_ALARMING_PRESENCE, RESET_SHORTED
+from .system import monotonic
+
+try:
+    import termios
+except ImportError:
+    termios = None
+
+# DS2480B modes
+MODE_DATA = 0xE1
+MODE_COMMAND = 0xE3
+MODE_STOP_PULSE = 0xF1
+
+# DS2480B commands, regular speed
+COMMAND_RESET = 0xC1
+COMMAND_BIT = 0x81
+COMMAND_SEARCH_OFF = 0xA1
+COMMAND_PULSE = 0xED
+COMMAND_PULSE_ARMED = 0xEF
+
+# DS2480B configuration, see the DS2480B data sheet
+CONFIG_PULLDOWN_SLEW_RATE = 0x17   # 1.37 V/us
+CONFIG_WRITE1_LOW_TIME = 0x45      # 10 us
+CONFIG_SAMPLE_OFFSET = 0x5B        # 8 us
+CONFIG_READ_BAUD_RATE = 0x0F
+CONFIG_PULLUP_INFINITE = 0x3F
+
+# Speed bits of the DS2480B communication commands
+_SPEED_BITS = {
+    SPEED_STANDARD: 0x00,
+    SPEED_OVERDRIVE: 0x08,
+}
+
+_RESET_RESULTS = {
+    0: RESET_SHORTED,
+    1: RESET_PRESENCE,
+    2: RESET_ALARMING_PRESENCE,
+    3: RESET_NO_PRESENCE,
+}
+
+class DS2480Backend(Backend):
+    """
+    Backend for DS9097U-type serial port adapters built around the DS2480B line driver. Talks to the adapter directly
+    through a serial port device, so no TMEX library is needed. Requires a POSIX system.
+    """
+
+    def __init__(self, device='/dev/ttyUSB%d', timeout=1.0):
+        """
+        Initializes the backend.
+
+        device:
+            The serial port device. A '%d' in the name is replaced by the port number given to open.
+
+        timeout:
+            The time in seconds to wait for an answer from the adapter.
+        """
+        Backend.__init__(self)
+        self.device = device
+        self.timeout = timeout
+        self._fd = None
+        self._mode = MODE_COMMAND
+        self._primed = False
+        # True while a strong pullup is armed or on, the adapter answers the pulse command when the pulse stops
+        self._pulse = False
+        self._speed = _SPEED_BITS[SPEED_STANDARD]
+
+    def open(self, port=0):
+        """
+        Opens the serial port and initializes the adapter.
+
+        port:
+            A optional port number inserted in the device name, or a device path.
+        """
+        if termios is None:
+            raise TMEXException('Serial ports are not supported on this platform')
+        if isinstance(port, str):
+            device = port
+        elif '%d' in self.device:
+            device = self.device % (port)
+        else:
+            device = self.device
+        try:
+            self._fd = os.open(device, os.O_RDWR | os.O_NOCTTY)
+        except OSError as e:
+            raise TMEXException('Failed to open {}: {}'.format(device, e))
+        attributes = termios.tcgetattr(self._fd)
+        attributes[0] = 0 # iflag
+        attributes[1] = 0 # oflag
+        attributes[2] = termios.CS8 | termios.CREAD | termios.CLOCAL # cflag
+        attributes[3] = 0 # lflag
+        attributes[4] = termios.B9600 # ispeed
+        attributes[5] = termios.B9600 # ospeed
+        attributes[6][termios.VMIN] = 0
+        attributes[6][termios.VTIME] = 0
+        termios.tcsetattr(self._fd, termios.TCSANOW, attributes)
+        try:
+            self._masterReset()
+        except TMEXException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def valid(self):
+        return self._fd is not None
+
+    def touchReset(self):
+        self._setMode(MODE_COMMAND)
+        self._write([COMMAND_RESET | self._speed])
+        response = self._read(1)[0]
+        return _RESET_RESULTS[response & 0x03]
+
+    def touchBit(self, bit):
+        self._setMode(MODE_COMMAND)
+        self._write([COMMAND_BIT | self._speed | ((bit & 0x01) << 4)])
+        return self._read(1)[0] & 0x01
+
+    def touchByte(self, byte):
+        if self._primed:
+            # Arm the strong pullup so it is enabled directly after the byte
+            self._setMode(MODE_COMMAND)
+            self._write([CONFIG_PULLUP_INFINITE, COMMAND_PULSE_ARMED])
+            self._read(1)
+            self._primed = False
+            self._pulse = True
+        self._setMode(MODE_DATA)
+        self._write(self._escape([byte & 0xFF]))
+        return self._read(1)[0]
+
+    def touchBlock(self, data, reset=False):
+        if self._primed:
+            # The strong pullup has to be armed before the next byte
+            return Backend.touchBlock(self, data, reset)
+        if reset:
+            self.touchReset()
+        data = bytearray(data)
+        if not data:
+            return data
+        self._setMode(MODE_DATA)
+        self._write(self._escape(data))
+        return self._read(len(data))
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        if level == LEVEL_STRONG_PULLUP:
+            if prime != PRIME_NONE:
+                self._primed = True
+            else:
+                self._setMode(MODE_COMMAND)
+                self._write([CONFIG_PULLUP_INFINITE, COMMAND_PULSE])
+                self._read(1)
+                self._pulse = True
+        else:
+            self._primed = False
+            if self._pulse:
+                # Stops the pulse, and disarms the strong pullup with a pulse command without the arm bit that is
+                # stopped at once. Both pulse commands are answered.
+                self._setMode(MODE_COMMAND)
+                self._write([MODE_STOP_PULSE, COMMAND_PULSE, MODE_STOP_PULSE])
+                self._pulse = False
+                self._read(2)
+        return level
+
+    def setSpeed(self, speed):
+        if speed not in _SPEED_BITS:
+            raise TMEXException('Speed not supported, %d' % (speed))
+        self._speed = _SPEED_BITS[speed]
+        # Data mode runs at the speed of the last communication command, the search accelerator command without a
+        # response selects the speed without any bus activity
+        self._setMode(MODE_COMMAND)
+        self._write([COMMAND_SEARCH_OFF | self._speed])
+        return speed
+
+    def _masterReset(self):
+        """
+        Resets the adapter with a break and configures the 1-Wire timing, see the DS2480B data sheet.
+        """
+        termios.tcsendbreak(self._fd, 0)
+        time.sleep(0.002)
+        termios.tcflush(self._fd, termios.TCIOFLUSH)
+        self._mode = MODE_COMMAND
+        self._primed = False
+        self._pulse = False
+        self._speed = _SPEED_BITS[SPEED_STANDARD]
+        # The first reset command calibrates the adapter timing, it has no response
+        self._write([COMMAND_RESET])
+        time.sleep(0.002)
+        termios.tcflush(self._fd, termios.TCIFLUSH)
+        self._write([CONFIG_PULLDOWN_SLEW_RATE, CONFIG_WRITE1_LOW_TIME, CONFIG_SAMPLE_OFFSET, CONFIG_READ_BAUD_RATE,
+            COMMAND_BIT | 0x10])
+        response = self._read(5)
+        if ((response[0] & 0xF1) != 0x10 or (response[1] & 0xF1) != 0x40 or (response[2] & 0xF1) != 0x50
+                or (response[3] & 0xF1) != 0x00 or (response[4] & 0xF0) != 0x90):
+            raise TMEXException('DS2480B adapter not detected')
+
+    def _setMode(self, mode):
+        if self._mode != mode:
+            self._write([mode])
+            self._mode = mode
+
+    def _escape(self, data):
+        """
+        Doubles any MODE_COMMAND byte, since a single one switches the adapter to command mode.
+        """
+        result = []
+        for byte in data:
+            result.append(byte)
+            if byte == MODE_COMMAND:
+                result.append(byte)
+        return result
+
+    def _write(self, data):
+        if self._fd is None:
+            raise TMEXException('Bus not initialized')
+        data = bytearray(data)
+        while data:
+            count = os.write(self._fd, bytes(data))
+            data = data[count:]
+
+    def _read(self, count):
+        result = bytearray()
+        deadline = monotonic() + self.timeout
+        while len(result) < count:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise TMEXException('Timeout waiting for the DS2480B adapter')
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if readable:
+                result.extend(os.read(self._fd, count - len(result)))
+        return result
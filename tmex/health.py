@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from .system import iteritems, monotonic
+from .records import _Record
+
+# Kinds of read failures
+FAILURE_CRC = 'crc'
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_POWER_ON = 'power_on'
+FAILURE_ERROR = 'error'
+
+# Number of failed reads in a row that quarantine a device
+FAILURE_THRESHOLD = 3
+# Time in seconds of the first quarantine of a device, doubled for every failed probe up to MAX_BACKOFF
+BACKOFF = 1.0
+MAX_BACKOFF = 300.0
+
+class DeviceHealth(_Record):
+    """
+    The read statistics of a device, see HealthMonitor.
+
+    reads:                The number of successful reads.
+    failures:             The number of failed reads.
+    crcFailures:          The number of reads that failed the CRC check.
+    timeouts:             The number of conversions that timed out.
+    powerOnValues:        The number of reads of the power-on value, a conversion that never happened.
+    errors:               The number of reads that failed in the backend.
+    consecutiveFailures:  The number of failed reads since the last successful read.
+    lastFailure:          The kind of the last failure, None if the device has not failed.
+    quarantinedUntil:     The monotonic time the quarantine ends, None if the device is not quarantined.
+    backoff:              The time in seconds of the current quarantine, None if the device is not quarantined.
+    """
+
+    __slots__ = ('reads', 'failures', 'crcFailures', 'timeouts', 'powerOnValues', 'errors', 'consecutiveFailures',
+        'lastFailure', 'quarantinedUntil', 'backoff')
+
+    def __init__(self):
+        self.reads = 0
+        self.failures = 0
+        self.crcFailures = 0
+        self.timeouts = 0
+        self.powerOnValues = 0
+        self.errors = 0
+        self.consecutiveFailures = 0
+        self.lastFailure = None
+        self.quarantinedUntil = None
+        self.backoff = None
+
+_COUNTERS = {
+    FAILURE_CRC: 'crcFailures',
+    FAILURE_TIMEOUT: 'timeouts',
+    FAILURE_POWER_ON: 'powerOnValues',
+    FAILURE_ERROR: 'errors',
+}
+
+class HealthMonitor(object):
+    """
+    HealthMonitor keeps the read statistics of the devices of a session and is a circuit breaker for failing devices.
+
+    A device that fails failureThreshold reads in a row is quarantined, and is not read until the quarantine is over.
+    The first read after the quarantine is a probe: a success ends the quarantine, a failure quarantines the device
+    again for twice as long, up to maxBackoff seconds.
+    """
+
+    def __init__(self, failureThreshold=FAILURE_THRESHOLD, backoff=BACKOFF, maxBackoff=MAX_BACKOFF, clock=monotonic):
+        """
+        Initializes a monitor.
+
+        failureThreshold:
+            The number of failed reads in a row that quarantine a device.
+
+        backoff:
+            The time in seconds of the first quarantine of a device.
+
+        maxBackoff:
+            The longest time in seconds of a quarantine.
+
+        clock:
+            A optional function returning the monotonic time in seconds.
+        """
+        self.failureThreshold = failureThreshold
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.clock = clock
+        self._devices = {}
+
+    def available(self, deviceId):
+        """
+        Returns True if a device may be read, False while it is quarantined.
+        """
+        health = self._devices.get(deviceId)
+        return health is None or health.quarantinedUntil is None or self.clock() >= health.quarantinedUntil
+
+    def success(self, deviceId):
+        """
+        Records a successful read of a device, which ends its quarantine.
+        """
+        health = self._health(deviceId)
+        health.reads += 1
+        health.consecutiveFailures = 0
+        health.quarantinedUntil = None
+        health.backoff = None
+
+    def failure(self, deviceId, kind):
+        """
+        Records a failed read of a device.
+
+        kind:
+            The kind of failure, FAILURE_CRC, FAILURE_TIMEOUT, FAILURE_POWER_ON or FAILURE_ERROR.
+
+        returns True if the device was quarantined.
+        """
+        health = self._health(deviceId)
+        health.failures += 1
+        counter = _COUNTERS[kind]
+        setattr(health, counter, getattr(health, counter) + 1)
+        health.consecutiveFailures += 1
+        health.lastFailure = kind
+        if health.consecutiveFailures < self.failureThreshold:
+            return False
+        if health.backoff is None:
+            health.backoff = self.backoff
+        else:
+            health.backoff = min(health.backoff * 2, self.maxBackoff)
+        health.quarantinedUntil = self.clock() + health.backoff
+        return True
+
+    def _health(self, deviceId):
+        health = self._devices.get(deviceId)
+        if health is None:
+            health = DeviceHealth()
+            self._devices[deviceId] = health
+        return health
+
+    def health(self, deviceId):
+        """
+        Returns the DeviceHealth of a device, None if it has not been read.
+        """
+        return self._devices.get(deviceId)
+
+    def quarantined(self):
+        """
+        Returns the device ids of the quarantined devices, including the ones due for a probe.
+        """
+        return [deviceId for deviceId, health in iteritems(self._devices) if health.quarantinedUntil is not None]
+
+    def forget(self, deviceId=None):
+        """
+        Forgets the statistics and the quarantine of a device, or of all devices if omitted.
+        """
+        if deviceId is None:
+            self._devices = {}
+        else:
+            self._devices.pop(deviceId, None)
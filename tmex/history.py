@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import os
+import sys
+import csv
+import json
+import mmap
+import time
+import struct
+from array import array
+from datetime import datetime, timedelta
+
+DEFAULT_COLUMNS = ('temperature', 'humidity')
+
+def _timestampArray():
+    """
+    Returns an empty array of 64-bit integers, or a list on Python 2 which has no such arrays.
+    """
+    try:
+        return array('q')
+    except ValueError:
+        return []
+
+def toNanoseconds(timestamp):
+    """
+    Converts a datetime in local time, or a number of seconds since the epoch, to nanoseconds since the epoch.
+    """
+    if isinstance(timestamp, datetime):
+        return int(time.mktime(timestamp.timetuple())) * 1000000000 + timestamp.microsecond * 1000
+    return int(timestamp * 1000000000)
+
+def fromNanoseconds(timestamp):
+    """
+    Converts nanoseconds since the epoch to a datetime in local time.
+    """
+    return datetime.fromtimestamp(timestamp // 1000000000) + timedelta(microseconds=(timestamp % 1000000000) // 1000)
+
+class HistoryStore(object):
+    """
+    HistoryStore is an append-only store of readings on disk.
+
+    Each device has a directory with one segment file per day. A segment is an array of fixed-width records, a 64-bit
+    timestamp in nanoseconds followed by one 64-bit float per column, NaN for a missing value. Appends are buffered in
+    memory and written in batches, and range queries memory-map the segments and find the range with a binary search
+    on the timestamps.
+    """
+
+    def __init__(self, directory, columns=None, flushSize=1024):
+        """
+        Opens a store, creating it if needed.
+
+        directory:
+            The directory of the store.
+
+        columns:
+            A optional list of the names of the value columns. Must match the columns of an existing store. The
+            columns of an existing store, or DEFAULT_COLUMNS for a new store, are used if omitted.
+
+        flushSize:
+            The number of buffered records that triggers a flush.
+        """
+        self.directory = directory
+        self.flushSize = flushSize
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, 'columns.json')
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                stored = tuple(json.load(f))
+            if columns is None:
+                columns = stored
+            elif stored != tuple(columns):
+                raise ValueError('Store has the columns {}'.format(', '.join(stored)))
+        else:
+            if columns is None:
+                columns = DEFAULT_COLUMNS
+            with open(path, 'w') as f:
+                json.dump(list(columns), f)
+        self.columns = tuple(columns)
+        self._record = struct.Struct('<q' + 'd' * len(self.columns))
+        self._pending = {}
+        self._pendingCount = 0
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def append(self, deviceId, timestamp, values):
+        """
+        Appends a reading. Readings of a device must be appended in time order.
+
+        deviceId:
+            The device id of the device.
+
+        timestamp:
+            A datetime in local time or a number of seconds since the epoch.
+
+        values:
+            A dict with a value for some or all of the columns.
+        """
+        nan = float('nan')
+        record = self._record.pack(toNanoseconds(timestamp),
+            *[float(values[column]) if values.get(column) is not None else nan for column in self.columns])
+        self._pending.setdefault(deviceId, []).append(record)
+        self._pendingCount += 1
+        if self._pendingCount >= self.flushSize:
+            self.flush()
+
+    def appendBatch(self, batch):
+        """
+        Appends the readings of a time stamped tmex.records.ReadingBatch straight from its arrays. Devices without
+        any value in the columns are skipped.
+        """
+        if batch.timestamps is None:
+            raise ValueError('The batch is not time stamped')
+        nan = float('nan')
+        arrays = {'temperature': batch.temperatures, 'humidity': batch.humidities}
+        offset = batch.epochOffset
+        for index, deviceId in enumerate(batch.devices):
+            extra = batch.extras.get(index) if batch.extras is not None else None
+            row = []
+            for column in self.columns:
+                values = arrays.get(column)
+                if values is not None:
+                    row.append(values[index])
+                elif extra is not None and extra.get(column) is not None:
+                    row.append(float(extra[column]))
+                else:
+                    row.append(nan)
+            if all(value != value for value in row):
+                continue
+            self._pending.setdefault(deviceId, []).append(self._record.pack(batch.timestamps[index] + offset, *row))
+            self._pendingCount += 1
+        if self._pendingCount >= self.flushSize:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered readings to the segments.
+        """
+        for deviceId, records in self._pending.items():
+            segments = {}
+            for record in records:
+                timestamp = self._record.unpack_from(record)[0]
+                segments.setdefault(self._segmentName(timestamp), []).append(record)
+            directory = os.path.join(self.directory, deviceId)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            for name, data in segments.items():
+                with open(os.path.join(directory, name), 'ab') as f:
+                    f.write(b''.join(data))
+        self._pending = {}
+        self._pendingCount = 0
+
+    def devices(self):
+        """
+        Returns the device ids in the store.
+        """
+        return sorted(name for name in os.listdir(self.directory)
+            if os.path.isdir(os.path.join(self.directory, name)))
+
+    def query(self, deviceId, start=None, stop=None):
+        """
+        Reads the readings of a device in a time range.
+
+        start:
+            A optional start of the range, inclusive, as a datetime or seconds since the epoch.
+
+        stop:
+            A optional end of the range, exclusive, as a datetime or seconds since the epoch.
+
+        returns a tuple of an array of timestamps in nanoseconds since the epoch and a dict of value arrays by column.
+        """
+        if self._pending.get(deviceId):
+            self.flush()
+        startNs = toNanoseconds(start) if start is not None else None
+        stopNs = toNanoseconds(stop) if stop is not None else None
+        timestamps = _timestampArray()
+        values = dict((column, array('d')) for column in self.columns)
+        directory = os.path.join(self.directory, deviceId)
+        if not os.path.isdir(directory):
+            return timestamps, values
+        first = self._segmentName(startNs) if startNs is not None else None
+        last = self._segmentName(stopNs) if stopNs is not None else None
+        for name in sorted(os.listdir(directory)):
+            if (first is not None and name < first) or (last is not None and name > last):
+                continue
+            path = os.path.join(directory, name)
+            size = os.path.getsize(path)
+            count = size // self._record.size
+            if count == 0:
+                continue
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), count * self._record.size, access=mmap.ACCESS_READ)
+                try:
+                    low = self._search(data, count, startNs) if startNs is not None else 0
+                    high = self._search(data, count, stopNs) if stopNs is not None else count
+                    for index in range(low, high):
+                        record = self._record.unpack_from(data, index * self._record.size)
+                        timestamps.append(record[0])
+                        for column, value in zip(self.columns, record[1:]):
+                            values[column].append(value)
+                finally:
+                    data.close()
+        return timestamps, values
+
+    def exportCsv(self, deviceId, f, start=None, stop=None):
+        """
+        Writes the readings of a device in a time range as CSV rows of device id, time and the values.
+        """
+        timestamps, values = self.query(deviceId, start, stop)
+        writer = csv.writer(f)
+        for index, timestamp in enumerate(timestamps):
+            row = [deviceId, fromNanoseconds(timestamp).replace(microsecond=0).isoformat(' ')]
+            for column in self.columns:
+                value = values[column][index]
+                row.append('' if value != value else '%.2f' % (value))
+            writer.writerow(row)
+
+    def _segmentName(self, timestamp):
+        return time.strftime('%Y%m%d', time.localtime(timestamp // 1000000000)) + '.bin'
+
+    def _search(self, data, count, timestamp):
+        """
+        Returns the index of the first record at or after a timestamp.
+        """
+        low = 0
+        high = count
+        size = self._record.size
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<q', data, middle * size)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+def main():
+    """
+    Exports the readings of a device from a store as CSV, an offline tool for the binary history.
+
+    usage: python -m tmex.history <store directory> <device id> [<csv file>]
+    """
+    if len(sys.argv) < 3:
+        print('usage: python -m tmex.history <store directory> <device id> [<csv file>]')
+        return 1
+    store = HistoryStore(sys.argv[1])
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'w') as f:
+            store.exportCsv(sys.argv[2], f)
+    else:
+        store.exportCsv(sys.argv[2], sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
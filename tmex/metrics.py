@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from bisect import bisect_left
+from collections import namedtuple
+from .system import monotonic, iteritems
+from .backend import Backend, PRIME_NONE
+
+# Default histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# A histogram in a snapshot. counts has one count per bucket followed by the count above the last bucket, the counts
+# are not cumulative.
+HistogramSnapshot = namedtuple('HistogramSnapshot', ['buckets', 'counts', 'sum', 'count'])
+
+# A snapshot of the metrics of a session.
+#   counters:   Counter values by (name, device id), the device id is '' for bus-wide counters.
+#   histograms: HistogramSnapshot by (operation, device id).
+MetricsSnapshot = namedtuple('MetricsSnapshot', ['counters', 'histograms'])
+
+class _Histogram(object):
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class _Timer(object):
+    """
+    Context manager timing an operation, see Metrics.time.
+    """
+
+    def __init__(self, metrics, operation, deviceId, details):
+        self._metrics = metrics
+        self._operation = operation
+        self._deviceId = deviceId
+        self.details = details
+
+    def __enter__(self):
+        self._start = monotonic()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        seconds = monotonic() - self._start
+        if excType is not None:
+            self.details['error'] = excType.__name__
+        self._metrics.observe(self._operation, seconds, self._deviceId)
+        self._metrics.trace(self._operation, self._deviceId, seconds, self.details)
+
+class Metrics(object):
+    """
+    Metrics collects counters and latency histograms of the bus operations of a session, by device and operation, and
+    passes every timed operation to the trace callbacks.
+
+    Counters: resets, bits, bytes, searches, verifies, conversions, crc_failures and timeouts.
+    Operations: transaction, read, search, conversion and cycle.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes the metrics.
+
+        buckets:
+            A optional sorted list of histogram bucket upper bounds in seconds.
+        """
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._traceCallbacks = []
+
+    def reset(self):
+        """
+        Clears all counters and histograms.
+        """
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, name, amount=1, deviceId=None):
+        """
+        Increments a counter.
+        """
+        key = (name, deviceId or '')
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, operation, seconds, deviceId=None):
+        """
+        Adds the latency of an operation to its histogram.
+        """
+        key = (operation, deviceId or '')
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = _Histogram(self.buckets)
+            self._histograms[key] = histogram
+        histogram.observe(seconds)
+
+    def time(self, operation, deviceId=None, **details):
+        """
+        Returns a context manager that times an operation, adds it to the histograms and traces it.
+
+        details:
+            Optional details passed to the trace callbacks. More details can be added to the details dict of the
+            context manager.
+        """
+        return _Timer(self, operation, deviceId, details)
+
+    def addTraceCallback(self, callback):
+        """
+        Adds a function called after each timed operation with the operation, the device id or None, the duration in
+        seconds and a dict of details.
+        """
+        self._traceCallbacks.append(callback)
+
+    def removeTraceCallback(self, callback):
+        """
+        Removes a trace callback.
+        """
+        self._traceCallbacks.remove(callback)
+
+    def trace(self, operation, deviceId, seconds, details):
+        for callback in self._traceCallbacks:
+            callback(operation, deviceId, seconds, details)
+
+    def snapshot(self):
+        """
+        Returns a MetricsSnapshot of the current values.
+        """
+        histograms = {}
+        for key, histogram in list(self._histograms.items()):
+            histograms[key] = HistogramSnapshot(histogram.buckets, list(histogram.counts), histogram.sum,
+                histogram.count)
+        return MetricsSnapshot(dict(self._counters), histograms)
+
+    def prometheus(self, prefix='tmex'):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        counters = {}
+        for (name, deviceId), value in iteritems(snapshot.counters):
+            counters.setdefault(name, []).append((deviceId, value))
+        for name in sorted(counters):
+            metric = '%s_%s_total' % (prefix, name)
+            lines.append('# TYPE %s counter' % (metric))
+            for deviceId, value in sorted(counters[name]):
+                lines.append('%s{device="%s"} %d' % (metric, deviceId, value))
+        if snapshot.histograms:
+            metric = '%s_operation_seconds' % (prefix)
+            lines.append('# TYPE %s histogram' % (metric))
+            for (operation, deviceId) in sorted(snapshot.histograms):
+                histogram = snapshot.histograms[(operation, deviceId)]
+                labels = 'operation="%s",device="%s"' % (operation, deviceId)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append('%s_bucket{%s,le="%g"} %d' % (metric, labels, bound, cumulative))
+                lines.append('%s_bucket{%s,le="+Inf"} %d' % (metric, labels, histogram.count))
+                lines.append('%s_sum{%s} %.9f' % (metric, labels, histogram.sum))
+                lines.append('%s_count{%s} %d' % (metric, labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+class MeteredBackend(Backend):
+    """
+    Backend wrapper counting the resets, bits, bytes and searches of another backend. The counts are attributed to
+    the device in deviceId, which the session sets while it talks to a device.
+    """
+
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+        self.deviceId = None
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def open(self, port=0):
+        return self.backend.open(port)
+
+    def close(self):
+        return self.backend.close()
+
+    def valid(self):
+        return self.backend.valid()
+
+    def touchReset(self):
+        self.metrics.count('resets', 1, self.deviceId)
+        return self.backend.touchReset()
+
+    def touchBit(self, bit):
+        self.metrics.count('bits', 1, self.deviceId)
+        return self.backend.touchBit(bit)
+
+    def touchByte(self, byte):
+        self.metrics.count('bytes', 1, self.deviceId)
+        return self.backend.touchByte(byte)
+
+    def touchBlock(self, data, reset=False):
+        data = bytearray(data)
+        if reset:
+            self.metrics.count('resets', 1, self.deviceId)
+        self.metrics.count('bytes', len(data), self.deviceId)
+        return self.backend.touchBlock(data, reset)
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        return self.backend.oneWireLevel(level, prime)
+
+    def setSpeed(self, speed):
+        return self.backend.setSpeed(speed)
+
+    def first(self):
+        self.metrics.count('searches')
+        return self.backend.first()
+
+    def next(self):
+        return self.backend.next()
+
+    def firstAlarm(self):
+        self.metrics.count('alarm_searches')
+        return self.backend.firstAlarm()
+
+    def nextAlarm(self):
+        return self.backend.nextAlarm()
+
+    def familySearchSetup(self, family):
+        self.metrics.count('searches')
+        return self.backend.familySearchSetup(family)
+
+    def rom(self):
+        return self.backend.rom()
+
+    def verify(self, rom):
+        self.metrics.count('verifies')
+        return self.backend.verify(rom)
+
+    def sleep(self, seconds):
+        return self.backend.sleep(seconds)
+
+    def clock(self):
+        return self.backend.clock()
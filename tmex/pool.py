@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import threading
+from datetime import datetime
+from .tmex import TMEXException
+from .session import Session
+from .system import iteritems
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Default time in seconds close waits for each worker to end its session
+CLOSE_TIMEOUT = 5.0
+
+class _Call(object):
+    """
+    A call waiting to be run by a port worker.
+    """
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def run(self, session):
+        try:
+            self.result = self.func(session, *self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        self._done.set()
+
+    def wait(self):
+        """
+        Waits for the call to be run and returns the result, or raises the exception raised by the call.
+        """
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class _PortWorker(threading.Thread):
+    """
+    Thread owning the session of one port. All calls to the session are run by the thread.
+    """
+
+    def __init__(self, port, sessionFactory):
+        threading.Thread.__init__(self, name='tmex-port-{}'.format(port))
+        self.daemon = True
+        self.port = port
+        self.error = None
+        self._sessionFactory = sessionFactory
+        self._calls = queue.Queue()
+        self._ready = threading.Event()
+
+    def run(self):
+        try:
+            session = self._sessionFactory(self.port)
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        while True:
+            call = self._calls.get()
+            if call is None:
+                break
+            call.run(session)
+        session.backend.close()
+
+    def waitReady(self):
+        self._ready.wait()
+        return self.error is None
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues a call of func with the session as first argument.
+        """
+        call = _Call(func, args, kwargs)
+        self._calls.put(call)
+        return call
+
+    def stop(self):
+        self._calls.put(None)
+
+class SessionPool(object):
+    """
+    SessionPool drives the 1-Wire buses of several ports at once. Each port has its own session owned by a worker
+    thread, enumeration and reads run on all buses concurrently and the devices of all buses share one namespace.
+    """
+
+    def __init__(self, ports, sessionFactory=None):
+        """
+        Initializes sessions on all ports.
+
+        ports:
+            A list of port numbers.
+
+        sessionFactory:
+            A optional function taking a port number and returning a Session. Sessions using the TMEX library are
+            created if omitted.
+        """
+        if sessionFactory is None:
+            sessionFactory = lambda port: Session(port=port)
+        self._workers = {}
+        self._owners = {}
+        for port in ports:
+            worker = _PortWorker(port, sessionFactory)
+            worker.start()
+            self._workers[port] = worker
+        for port, worker in iteritems(self._workers):
+            if not worker.waitReady():
+                self.close()
+                raise TMEXException('Failed to start session on port {}: {}'.format(port, worker.error))
+
+    def __del__(self):
+        self.close()
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """
+        Ends the sessions on all ports, and waits for the workers to finish the calls queued and close the backends.
+
+        timeout:
+            The time in seconds to wait for each worker.
+        """
+        workers = list(self._workers.values())
+        self._workers = {}
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout)
+
+    def ports(self):
+        """
+        Returns the ports of the pool.
+        """
+        return list(self._workers.keys())
+
+    def _all(self, func, *args, **kwargs):
+        """
+        Runs a function with each session concurrently and returns the results by port.
+        """
+        calls = [(port, worker.submit(func, *args, **kwargs)) for port, worker in iteritems(self._workers)]
+        return [(port, call.wait()) for port, call in calls]
+
+    def enumrate(self, familyFilter=None):
+        """
+        Enumerates the devices on all 1-Wire buses concurrently.
+
+        familyFilter:
+            A optional list of family codes for devices to enumerate, see Session.enumrate.
+
+        returns the devices of all buses, each device has the port of its bus in 'port'.
+
+        Raises TMEXException if a device is found on more than one bus, such as buses wired together.
+        """
+        devices = {}
+        owners = {}
+        for port, found in self._all(Session.enumrate, familyFilter):
+            for deviceId, info in iteritems(found):
+                owner = owners.get(deviceId)
+                if owner is None and familyFilter:
+                    owner = self._owners.get(deviceId)
+                if owner is not None and owner != port:
+                    raise TMEXException('Device {} found on port {} and port {}'.format(deviceId, owner, port))
+                info = dict(info)
+                info['port'] = port
+                devices[deviceId] = info
+                owners[deviceId] = port
+        if familyFilter:
+            self._owners.update(owners)
+        else:
+            self._owners = owners
+        return devices
+
+    def readDevice(self, deviceId, enableWireLeveling=False):
+        """
+        Reads the value from a device on any of the 1-Wire buses, see Session.readDevice.
+        """
+        if deviceId not in self._owners:
+            raise ValueError()
+        worker = self._workers[self._owners[deviceId]]
+        return worker.submit(Session.readDevice, deviceId, enableWireLeveling).wait()
+
+    def readDevices(self, devices=None, familyFilter=None, timeStamp=True):
+        """
+        Reads the value from a list of devices, the buses are read concurrently. See Session.readDevices.
+
+        devices:
+            A optional list of device ids of the devices to read, all enumerated devices if omitted.
+        """
+        if devices is None:
+            devices = list(self._owners.keys())
+        byPort = {}
+        for deviceId in devices:
+            if deviceId not in self._owners:
+                raise ValueError()
+            byPort.setdefault(self._owners[deviceId], []).append(deviceId)
+        if not byPort:
+            return {}
+        if timeStamp:
+            startTime = datetime.now()
+        calls = []
+        for port, portDevices in iteritems(byPort):
+            calls.append(self._workers[port].submit(Session.readDevices, portDevices, familyFilter, timeStamp))
+        result = {}
+        for call in calls:
+            for key, value in iteritems(call.wait()):
+                if key not in ('time', 'delta'):
+                    result[key] = value
+        if timeStamp:
+            stopTime = datetime.now()
+            result['time'] = (startTime, stopTime)
+            result['delta'] = stopTime - startTime
+        return result
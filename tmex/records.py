@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from array import array
+from datetime import timedelta
+from .system import monotonicNs, timeNs
+from .history import fromNanoseconds, _timestampArray
+
+_NAN = float('nan')
+
+class _Record(object):
+    """
+    Base class of the slotted records that can also be used as the dicts they replace. The fields that are None are
+    left out of the mapping.
+    """
+
+    __slots__ = ()
+
+    def keys(self):
+        return [key for key in self.__slots__ if getattr(self, key) is not None]
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def asDict(self):
+        """
+        Returns the record as a dict.
+        """
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (_Record, dict)):
+            return self.asDict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__,
+            ', '.join('{}={!r}'.format(key, getattr(self, key)) for key in self.__slots__))
+
+class Device(_Record):
+    """
+    Information about a device on the bus, see Session.enumrate.
+
+    kind:         The family code.
+    name:         The device name, None for an unknown family.
+    description:  The device description, None for an unknown family.
+    overdrive:    True if the device is addressed at overdrive speed when overdrive is enabled.
+    branch:       The branch of the device behind DS2409 couplers, a tuple of tuples of the device id of a coupler and
+                  its line, 'main' or 'aux', from the bus outwards. None for a device on the bus itself.
+    """
+
+    __slots__ = ('kind', 'name', 'description', 'overdrive', 'branch')
+
+    def __init__(self, kind, name=None, description=None, overdrive=False, branch=None):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.overdrive = overdrive
+        self.branch = branch
+
+class Reading(_Record):
+    """
+    A reading of a device.
+
+    temperature:  The temperature in degrees Celsius, None if the device has none.
+    humidity:     The relative humidity in percent, None if the device has none.
+    timestamp:    The time of the reading in nanoseconds since the epoch, None if not time stamped. Is a datetime in
+                  local time when used as a mapping, like the readings of Session.readDevices.
+    extra:        A dict of any other values decoded by the driver, None if there are none.
+    """
+
+    __slots__ = ('temperature', 'humidity', 'timestamp', 'extra')
+
+    def __init__(self, temperature=None, humidity=None, timestamp=None, extra=None):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.timestamp = timestamp
+        self.extra = extra
+
+    def keys(self):
+        keys = [key for key in ('temperature', 'humidity') if getattr(self, key) is not None]
+        if self.extra:
+            keys.extend(self.extra.keys())
+        if self.timestamp is not None:
+            keys.append('timestamp')
+        return keys
+
+    def __getitem__(self, key):
+        if key == 'timestamp':
+            if self.timestamp is None:
+                raise KeyError(key)
+            return fromNanoseconds(self.timestamp)
+        if key in ('temperature', 'humidity'):
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+class ReadingBatch(object):
+    """
+    The readings of a list of devices from one read, see Session.readBatch.
+
+    The values are kept in arrays indexed like the devices, NaN where a device has no such value or could not be
+    read, so a batch costs a few bytes per device. The readings are time stamped with a monotonic clock in
+    nanoseconds, and converted to wall clock time with the offset between the clocks at the start of the batch.
+
+    devices:       A tuple of the device ids.
+    temperatures:  An array of the temperatures in degrees Celsius.
+    humidities:    An array of the relative humidities in percent.
+    timestamps:    An array of the monotonic times of the readings in nanoseconds, 0 where the device was not read,
+                   None if not time stamped.
+    extras:        A dict of the other values decoded by the drivers by device index, None if there are none.
+    start:         The monotonic time in nanoseconds of the start of the read.
+    stop:          The monotonic time in nanoseconds of the end of the read, None until it is done.
+    epochOffset:   The wall clock time minus the monotonic time in nanoseconds at the start of the read.
+    """
+
+    __slots__ = ('devices', 'temperatures', 'humidities', 'timestamps', 'extras', 'start', 'stop', 'epochOffset',
+        '_index')
+
+    def __init__(self, devices, timeStamp=True):
+        """
+        Starts a batch of readings, all missing.
+
+        devices:
+            A list of the device ids of the devices read.
+
+        timeStamp:
+            Time stamps the readings when True.
+        """
+        self.devices = tuple(devices)
+        count = len(self.devices)
+        self.temperatures = array('d', [_NAN]) * count
+        self.humidities = array('d', [_NAN]) * count
+        self.timestamps = None
+        if timeStamp:
+            self.timestamps = _timestampArray()
+            self.timestamps.extend([0] * count)
+        self.extras = None
+        self.start = monotonicNs()
+        self.epochOffset = timeNs() - self.start
+        self.stop = None
+        self._index = None
+
+    def set(self, index, values, timestamp=None):
+        """
+        Sets the reading of a device.
+
+        index:
+            The index of the device in devices.
+
+        values:
+            A dict of values decoded by a driver.
+
+        timestamp:
+            The monotonic time of the reading in nanoseconds, the current time if omitted.
+        """
+        for key, value in values.items():
+            if key == 'temperature':
+                self.temperatures[index] = value
+            elif key == 'humidity':
+                self.humidities[index] = value
+            else:
+                if self.extras is None:
+                    self.extras = {}
+                self.extras.setdefault(index, {})[key] = value
+        if self.timestamps is not None:
+            self.timestamps[index] = monotonicNs() if timestamp is None else timestamp
+
+    def finish(self):
+        """
+        Marks the end of the read.
+        """
+        self.stop = monotonicNs()
+
+    def select(self, indexes):
+        """
+        Returns a new batch with the readings at a list of indexes, with the same start and stop.
+        """
+        batch = ReadingBatch.__new__(ReadingBatch)
+        batch.devices = tuple([self.devices[index] for index in indexes])
+        batch.temperatures = array('d', [self.temperatures[index] for index in indexes])
+        batch.humidities = array('d', [self.humidities[index] for index in indexes])
+        batch.timestamps = None
+        if self.timestamps is not None:
+            batch.timestamps = _timestampArray()
+            batch.timestamps.extend([self.timestamps[index] for index in indexes])
+        batch.extras = None
+        if self.extras is not None:
+            extras = dict((position, self.extras[index]) for position, index in enumerate(indexes)
+                if index in self.extras)
+            batch.extras = extras or None
+        batch.start = self.start
+        batch.stop = self.stop
+        batch.epochOffset = self.epochOffset
+        batch._index = None
+        return batch
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __contains__(self, deviceId):
+        return deviceId in self._lookup()
+
+    def _lookup(self):
+        if self._index is None:
+            self._index = dict((deviceId, index) for index, deviceId in enumerate(self.devices))
+        return self._index
+
+    def __getitem__(self, deviceId):
+        return self.reading(self._lookup()[deviceId])
+
+    def reading(self, index):
+        """
+        Returns the reading of the device at an index as a Reading.
+        """
+        temperature = self.temperatures[index]
+        humidity = self.humidities[index]
+        timestamp = None
+        if self.timestamps is not None and self.timestamps[index]:
+            timestamp = self.timestamps[index] + self.epochOffset
+        extra = self.extras.get(index) if self.extras is not None else None
+        return Reading(None if temperature != temperature else temperature,
+            None if humidity != humidity else humidity, timestamp, extra)
+
+    def items(self):
+        """
+        Returns a list of tuples of the device id and the Reading of each device.
+        """
+        return [(deviceId, self.reading(index)) for index, deviceId in enumerate(self.devices)]
+
+    def epochTimestamps(self):
+        """
+        Returns a list of the times of the readings in nanoseconds since the epoch, None for the devices that were
+        not read. Returns None if not time stamped.
+        """
+        if self.timestamps is None:
+            return None
+        offset = self.epochOffset
+        return [timestamp + offset if timestamp else None for timestamp in self.timestamps]
+
+    def duration(self):
+        """
+        Returns the duration of the read in seconds, None if it is not done.
+        """
+        if self.stop is None:
+            return None
+        return (self.stop - self.start) / 1e9
+
+    def asDict(self):
+        """
+        Returns the batch in the shape of Session.readDevices, a dict of reading dicts by device id with a datetime
+        'timestamp' in each reading, and the 'time' and 'delta' of the read if time stamped.
+        """
+        result = {}
+        offset = self.epochOffset
+        temperatures = self.temperatures
+        humidities = self.humidities
+        timestamps = self.timestamps
+        extras = self.extras
+        for index, deviceId in enumerate(self.devices):
+            values = {}
+            temperature = temperatures[index]
+            if temperature == temperature:
+                values['temperature'] = temperature
+            humidity = humidities[index]
+            if humidity == humidity:
+                values['humidity'] = humidity
+            if extras is not None and index in extras:
+                values.update(extras[index])
+            if timestamps is not None and timestamps[index]:
+                values['timestamp'] = fromNanoseconds(timestamps[index] + offset)
+            result[deviceId] = values
+        if timestamps is not None and self.stop is not None:
+            startTime = fromNanoseconds(self.start + offset)
+            result['time'] = (startTime, startTime + timedelta(microseconds=(self.stop - self.start) // 1000))
+            result['delta'] = result['time'][1] - startTime
+        return result
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.__slots__[:-1])
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__[:-1], state):
+            setattr(self, key, value)
+        self._index = None
+
+    def __repr__(self):
+        return 'ReadingBatch({} devices)'.format(len(self.devices))
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+"""
+Recording of the bus operations of a session to a binary log, and replay of the log without hardware.
+
+The log starts with MAGIC, followed by a record for every backend call. A record is a header of the operation, a
+status, the start time of the call in nanoseconds since the start of the recording and the duration of the call in
+nanoseconds, followed by the arguments and the return value of the call. A call that raised TMEXException has the
+message instead of the return value.
+"""
+
+import time
+import struct
+from collections import namedtuple
+from .tmex import TMEXException
+from .backend import Backend, PRIME_NONE
+from .system import monotonicNs
+
+MAGIC = b'TMEXLOG2'
+
+_HEADER = struct.Struct('<BBqq')
+_LENGTH = struct.Struct('<H')
+
+_STATUS_OK = 0
+_STATUS_ERROR = 1
+
+# Types of the port of open, a number or a name such as a device path
+_PORT_NUMBER = 0
+_PORT_NAME = 1
+
+# Operations by code, the name and the struct formats of the arguments and the return value. The port of open and the
+# touchBlock data are encoded separately, see _encodeArguments.
+_OPERATIONS = {
+    1: ('open', '<B', ''),
+    2: ('close', '', ''),
+    3: ('valid', '', '<B'),
+    4: ('touchReset', '', '<h'),
+    5: ('touchBit', '<B', '<B'),
+    6: ('touchByte', '<B', '<B'),
+    7: ('touchBlock', '<B', ''),
+    8: ('oneWireLevel', '<hh', '<h'),
+    9: ('setSpeed', '<B', '<B'),
+    10: ('first', '', '<B'),
+    11: ('next', '', '<B'),
+    12: ('firstAlarm', '', '<B'),
+    13: ('nextAlarm', '', '<B'),
+    14: ('familySearchSetup', '<B', ''),
+    15: ('rom', '', '<8B'),
+    16: ('verify', '<8B', '<B'),
+}
+_CODES = dict((name, code) for code, (name, arguments, result) in _OPERATIONS.items())
+_STRUCTS = dict((code, (struct.Struct(arguments), struct.Struct(result)))
+    for code, (name, arguments, result) in _OPERATIONS.items())
+
+# A record of a log, see readLog.
+#   operation: The name of the backend method.
+#   start:     The start of the call in nanoseconds since the start of the recording.
+#   duration:  The duration of the call in nanoseconds.
+#   arguments: A tuple of the arguments.
+#   result:    The return value, or the message of the exception if error is True.
+#   error:     True if the call raised TMEXException.
+LogRecord = namedtuple('LogRecord', ['operation', 'start', 'duration', 'arguments', 'result', 'error'])
+
+class ReplayMismatch(TMEXException):
+    pass
+
+def _encodeArguments(code, arguments):
+    if code == 1: # open, the type and the text of the port
+        port = arguments[0]
+        kind = _PORT_NUMBER if isinstance(port, int) else _PORT_NAME
+        return _STRUCTS[code][0].pack(kind) + _encodeMessage(u'%s' % (port,))
+    if code == 7: # touchBlock, the reset flag and the data
+        data = bytes(arguments[0])
+        return _STRUCTS[code][0].pack(1 if arguments[1] else 0) + _LENGTH.pack(len(data)) + data
+    if code in (15, 16): # rom, verify
+        return _STRUCTS[code][0].pack(*arguments[0]) if arguments else b''
+    return _STRUCTS[code][0].pack(*arguments)
+
+def _encodeResult(code, result):
+    if code == 7:
+        return bytes(result)
+    if code == 15:
+        return _STRUCTS[code][1].pack(*result)
+    if _STRUCTS[code][1].size == 0:
+        return b''
+    return _STRUCTS[code][1].pack(int(result))
+
+def _encodeMessage(message):
+    message = message.encode('utf-8')
+    return _LENGTH.pack(len(message)) + message
+
+class RecordingBackend(Backend):
+    """
+    Backend wrapper writing every call to another backend to a log, see ReplayBackend.
+    """
+
+    def __init__(self, backend, log):
+        """
+        Initializes a recording.
+
+        backend:
+            The backend to record.
+
+        log:
+            A path of the log file, or a binary file object open for writing.
+        """
+        self.backend = backend
+        if hasattr(log, 'write'):
+            self._file = log
+            self._ownsFile = False
+        else:
+            self._file = open(log, 'wb')
+            self._ownsFile = True
+        self._file.write(MAGIC)
+        self._start = monotonicNs()
+
+    def _call(self, name, arguments, func, *args):
+        code = _CODES[name]
+        start = monotonicNs()
+        try:
+            result = func(*args)
+        except TMEXException as e:
+            self._file.write(_HEADER.pack(code, _STATUS_ERROR, start - self._start, monotonicNs() - start)
+                + _encodeArguments(code, arguments) + _encodeMessage(str(e)))
+            raise
+        self._file.write(_HEADER.pack(code, _STATUS_OK, start - self._start, monotonicNs() - start)
+            + _encodeArguments(code, arguments) + _encodeResult(code, result))
+        return result
+
+    def open(self, port=0):
+        return self._call('open', (port,), self.backend.open, port)
+
+    def close(self):
+        if self._file.closed:
+            # Closed again when the session is deleted
+            return self.backend.close()
+        try:
+            return self._call('close', (), self.backend.close)
+        finally:
+            self._file.flush()
+            if self._ownsFile:
+                self._file.close()
+
+    def valid(self):
+        return self._call('valid', (), self.backend.valid)
+
+    def touchReset(self):
+        return self._call('touchReset', (), self.backend.touchReset)
+
+    def touchBit(self, bit):
+        return self._call('touchBit', (bit,), self.backend.touchBit, bit)
+
+    def touchByte(self, byte):
+        return self._call('touchByte', (byte,), self.backend.touchByte, byte)
+
+    def touchBlock(self, data, reset=False):
+        data = bytearray(data)
+        return self._call('touchBlock', (data, reset), self.backend.touchBlock, data, reset)
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        return self._call('oneWireLevel', (level, prime), self.backend.oneWireLevel, level, prime)
+
+    def setSpeed(self, speed):
+        return self._call('setSpeed', (speed,), self.backend.setSpeed, speed)
+
+    def first(self):
+        return self._call('first', (), self.backend.first)
+
+    def next(self):
+        return self._call('next', (), self.backend.next)
+
+    def firstAlarm(self):
+        return self._call('firstAlarm', (), self.backend.firstAlarm)
+
+    def nextAlarm(self):
+        return self._call('nextAlarm', (), self.backend.nextAlarm)
+
+    def familySearchSetup(self, family):
+        return self._call('familySearchSetup', (family,), self.backend.familySearchSetup, family)
+
+    def rom(self):
+        return self._call('rom', (), self.backend.rom)
+
+    def verify(self, rom):
+        return self._call('verify', (list(rom),), self.backend.verify, rom)
+
+    def sleep(self, seconds):
+        return self.backend.sleep(seconds)
+
+    def clock(self):
+        return self.backend.clock()
+
+def readLog(log):
+    """
+    Generator of the records of a log, see RecordingBackend.
+
+    log:
+        A path of the log file, or a binary file object open for reading.
+
+    yields a LogRecord for every call.
+    """
+    if hasattr(log, 'read'):
+        data = log.read()
+    else:
+        with open(log, 'rb') as f:
+            data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise TMEXException('Not a bus log')
+    offset = len(MAGIC)
+    while offset < len(data):
+        code, status, start, duration = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        if code not in _OPERATIONS:
+            raise TMEXException('Corrupt bus log at offset %d' % (offset - _HEADER.size))
+        name = _OPERATIONS[code][0]
+        argumentStruct, resultStruct = _STRUCTS[code]
+        arguments = argumentStruct.unpack_from(data, offset)
+        offset += argumentStruct.size
+        if code == 1:
+            length = _LENGTH.unpack_from(data, offset)[0]
+            offset += _LENGTH.size
+            port = data[offset:offset + length].decode('utf-8')
+            offset += length
+            arguments = (int(port) if arguments[0] == _PORT_NUMBER else port,)
+        elif code == 7:
+            length = _LENGTH.unpack_from(data, offset)[0]
+            offset += _LENGTH.size
+            arguments = (bytearray(data[offset:offset + length]), bool(arguments[0]))
+            offset += length
+        elif code == 16:
+            arguments = (list(arguments),)
+        if status == _STATUS_ERROR:
+            length = _LENGTH.unpack_from(data, offset)[0]
+            offset += _LENGTH.size
+            result = data[offset:offset + length].decode('utf-8')
+            offset += length
+        elif code == 7:
+            result = bytearray(data[offset:offset + length])
+            offset += length
+        elif code == 15:
+            result = list(resultStruct.unpack_from(data, offset))
+            offset += resultStruct.size
+        elif resultStruct.size:
+            result = resultStruct.unpack_from(data, offset)[0]
+            offset += resultStruct.size
+        else:
+            result = None
+        yield LogRecord(name, start, duration, arguments, result, status == _STATUS_ERROR)
+
+class ReplayBackend(Backend):
+    """
+    Backend replaying a log of RecordingBackend. Every call returns the recorded return value, after a check that it is
+    the call that was recorded with the same arguments. A session running the same code on the same log does the same
+    calls, so a recorded cycle can be profiled without hardware.
+
+    The clock of the backend is virtual: it is set to the recorded end of every call replayed and advanced by sleep,
+    so the waits, retries and timeouts of the session take the same course as in the recording.
+    """
+
+    def __init__(self, log, realTime=False, sleep=time.sleep):
+        """
+        Initializes a replay.
+
+        log:
+            A path of the log file, or a binary file object open for reading.
+
+        realTime:
+            Replays the calls no earlier and no faster than they were recorded when True, as fast as possible when
+            False.
+        """
+        self._records = readLog(log)
+        self.realTime = realTime
+        self._sleep = sleep
+        self._start = None
+        # The virtual time in seconds since the start of the recording, see clock
+        self._now = 0.0
+        # Number of calls replayed so far
+        self.calls = 0
+
+    def _replay(self, name, arguments=()):
+        record = next(self._records, None)
+        if record is None:
+            raise ReplayMismatch('End of the bus log at %s' % (name))
+        if record.operation != name or tuple(record.arguments) != tuple(arguments):
+            raise ReplayMismatch('Call %d is %s%r, the log has %s%r' % (self.calls, name, tuple(arguments),
+                record.operation, tuple(record.arguments)))
+        self.calls += 1
+        self._now = (record.start + record.duration) / 1e9
+        if self.realTime:
+            if self._start is None:
+                self._start = monotonicNs() - record.start
+            delay = self._start + record.start + record.duration - monotonicNs()
+            if delay > 0:
+                self._sleep(delay / 1e9)
+        if record.error:
+            raise TMEXException(record.result)
+        return record.result
+
+    def open(self, port=0):
+        return self._replay('open', (port,))
+
+    def close(self):
+        # Sessions close their backend when they are deleted, so a log that ends early is not an error here
+        try:
+            return self._replay('close')
+        except ReplayMismatch:
+            pass
+
+    def valid(self):
+        return bool(self._replay('valid'))
+
+    def touchReset(self):
+        return self._replay('touchReset')
+
+    def touchBit(self, bit):
+        return self._replay('touchBit', (bit,))
+
+    def touchByte(self, byte):
+        return self._replay('touchByte', (byte & 0xFF,))
+
+    def touchBlock(self, data, reset=False):
+        return bytearray(self._replay('touchBlock', (bytearray(data), bool(reset))))
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        return self._replay('oneWireLevel', (level, prime))
+
+    def setSpeed(self, speed):
+        return self._replay('setSpeed', (speed,))
+
+    def first(self):
+        return bool(self._replay('first'))
+
+    def next(self):
+        return bool(self._replay('next'))
+
+    def firstAlarm(self):
+        return bool(self._replay('firstAlarm'))
+
+    def nextAlarm(self):
+        return bool(self._replay('nextAlarm'))
+
+    def familySearchSetup(self, family):
+        return self._replay('familySearchSetup', (family,))
+
+    def rom(self):
+        return list(self._replay('rom'))
+
+    def verify(self, rom):
+        return bool(self._replay('verify', (list(rom),)))
+
+    def sleep(self, seconds):
+        # The waits are in the recorded start times, which a real time replay keeps
+        self._now += seconds
+
+    def clock(self):
+        return self._now
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import os
+import json
+
+class RomCache(object):
+    """
+    RomCache keeps the device ids found on a 1-Wire bus in a file, so a session can start with the devices known from
+    the last run instead of searching the whole bus.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the cache.
+
+        path:
+            The path of the cache file.
+        """
+        self.path = path
+        self._saved = None
+        self._branches = {}
+
+    def load(self):
+        """
+        Loads the device ids from the cache file.
+
+        returns a list of device identifiers, empty if the file does not exist or is unreadable.
+        """
+        try:
+            with open(self.path, 'r') as f:
+                content = json.load(f)
+            devices = [str(deviceId) for deviceId in content['devices']]
+            branches = dict((str(deviceId), tuple((str(coupler), str(line)) for coupler, line in branch))
+                for deviceId, branch in content.get('branches', {}).items())
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            devices = []
+            branches = {}
+        self._saved = (sorted(devices), branches)
+        self._branches = branches
+        return devices
+
+    def branches(self):
+        """
+        Returns the branches of the devices behind couplers loaded from the cache file, a dict of branches by device id,
+        see tmex.records.Device.
+        """
+        return dict(self._branches)
+
+    def save(self, devices, branches=None):
+        """
+        Saves device ids to the cache file. The file is only written when the ids have changed.
+
+        devices:
+            A list of device identifiers.
+
+        branches:
+            A optional dict of the branches of the devices behind couplers by device id.
+        """
+        devices = sorted(devices)
+        branches = dict(branches or {})
+        if (devices, branches) == self._saved:
+            return
+        content = {'devices': devices}
+        if branches:
+            content['branches'] = branches
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(content, f, indent=1)
+        if hasattr(os, 'replace'):
+            os.replace(temporary, self.path)
+        else:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(temporary, self.path)
+        self._saved = (devices, branches)
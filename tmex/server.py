@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+"""
+A server sharing the readings of one session with many local clients.
+
+The protocol is JSON lines. A request is a JSON object on a line, with the 'method', an optional 'params' object and an
+optional 'id' that is returned in the response. A response is a JSON object on a line with the 'id' and either the
+'result' or an 'error' message.
+
+    devices:  The known devices, an object of device information by device id, see tmex.records.Device.
+    read:     The readings of a list of 'devices', all known devices if omitted, no older than 'maxAge' seconds, the TTL
+              of the server if omitted. An object of readings by device id, see tmex.records.Reading, with the
+              'timestamp' in nanoseconds since the epoch. Devices that could not be read have an empty reading.
+    health:   The read statistics of the devices, see tmex.health.DeviceHealth.
+    metrics:  The metrics of the session in the Prometheus text format.
+
+usage: python -m tmex.server [--port 0] [--tcp localhost:8428 | --unix /tmp/tmex.sock] [--ttl 2.0]
+"""
+
+import os
+import sys
+import json
+import socket
+import argparse
+import threading
+from .tmex import TMEXException
+from .records import Device, Reading
+from .system import ISPYTHON3, iteritems, monotonic
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver # Python 2
+
+# Default time in seconds a reading is served from the cache
+DEFAULT_TTL = 2.0
+
+if ISPYTHON3:
+    _STRING_TYPES = (str,)
+else:
+    _STRING_TYPES = (basestring,) # Python 2, JSON strings are unicode
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            if not line.strip():
+                continue
+            self.wfile.write(self.server.readingServer._dispatch(line))
+            self.wfile.flush()
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None # Windows
+
+class ReadingServer(object):
+    """
+    ReadingServer owns a session and serves its readings to clients over a Unix or TCP socket, see ReadingClient.
+
+    The readings are kept in a cache for ttl seconds. The bus is only read for the requested devices that have no
+    reading in the cache young enough for the request, with one readBatch for all of them, and requests are served
+    one at a time on the bus, so a request waiting for another finds the readings it needs in the cache.
+    """
+
+    def __init__(self, session, address, ttl=DEFAULT_TTL):
+        """
+        Initializes a server and binds its socket.
+
+        session:
+            The session to serve. Must not be used by others while it is served.
+
+        address:
+            A path of a Unix socket, or a tuple of the host and port of a TCP socket.
+
+        ttl:
+            The default maximum age in seconds of the readings served from the cache.
+        """
+        self.session = session
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._thread = None
+        self._path = None
+        if isinstance(address, tuple):
+            self._server = _TCPServer(address, _Handler)
+        else:
+            if _UnixServer is None:
+                raise TMEXException('Unix sockets are not supported on this platform')
+            if os.path.exists(address):
+                os.remove(address)
+            self._server = _UnixServer(address, _Handler)
+            self._path = address
+        self._server.readingServer = self
+        self.address = self._server.server_address
+
+    def serveForever(self):
+        """
+        Serves requests until close is called.
+        """
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        Serves requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serveForever, name='tmex-server')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops serving and closes the socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+        if self._path is not None and os.path.exists(self._path):
+            os.remove(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def devices(self):
+        """
+        Returns the known devices of the session.
+        """
+        with self._lock:
+            return self.session.devices()
+
+    def read(self, devices=None, maxAge=None):
+        """
+        Returns the readings of devices, from the cache or from the bus.
+
+        devices:
+            A optional list of device ids, all known devices if omitted.
+
+        maxAge:
+            A optional maximum age in seconds of the readings, ttl if omitted.
+
+        returns a dict of tmex.records.Reading by device id.
+        """
+        if maxAge is None:
+            maxAge = self.ttl
+        with self._lock:
+            known = self.session.devices()
+            if devices is None:
+                devices = list(known.keys())
+            for deviceId in devices:
+                if deviceId not in known:
+                    raise ValueError('Unknown device {}'.format(deviceId))
+            now = monotonic()
+            stale = []
+            for deviceId in devices:
+                cached = self._cache.get(deviceId)
+                if cached is None or now - cached[1] > maxAge:
+                    stale.append(deviceId)
+            if stale:
+                batch = self.session.readBatch(stale)
+                readTime = monotonic()
+                for index, deviceId in enumerate(batch.devices):
+                    self._cache[deviceId] = (batch.reading(index), readTime)
+                self.session.metrics.count('server_bus_reads', 1)
+            self.session.metrics.count('server_cache_hits', len(devices) - len(stale))
+            return dict((deviceId, self._cache[deviceId][0]) for deviceId in devices)
+
+    def _dispatch(self, line):
+        """
+        Handles a request line and returns the response line.
+        """
+        requestId = None
+        try:
+            request = json.loads(line.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('The request is not an object')
+            requestId = request.get('id')
+            params = request.get('params')
+            if params is None:
+                params = {}
+            elif not isinstance(params, dict):
+                raise ValueError('The params are not an object')
+            method = request.get('method')
+            if method == 'devices':
+                result = dict((deviceId, device.asDict()) for deviceId, device in iteritems(self.devices()))
+            elif method == 'read':
+                devices = params.get('devices')
+                if devices is not None and (not isinstance(devices, list)
+                        or not all(isinstance(deviceId, _STRING_TYPES) for deviceId in devices)):
+                    raise ValueError('The devices are not a list of device ids')
+                maxAge = params.get('maxAge')
+                if maxAge is not None and (isinstance(maxAge, bool) or not isinstance(maxAge, (int, float))
+                        or maxAge < 0):
+                    raise ValueError('The maxAge is not a number of seconds')
+                readings = self.read(devices, maxAge)
+                result = dict((deviceId, _readingToJson(reading)) for deviceId, reading in iteritems(readings))
+            elif method == 'health':
+                with self._lock:
+                    health = self.session.health
+                    result = dict((deviceId, health.health(deviceId).asDict())
+                        for deviceId in self.session.devices() if health.health(deviceId) is not None)
+            elif method == 'metrics':
+                with self._lock:
+                    result = self.session.metrics.prometheus()
+            else:
+                raise ValueError('Unknown method {}'.format(method))
+            response = {'id': requestId, 'result': result}
+        except (ValueError, TMEXException) as e:
+            response = {'id': requestId, 'error': str(e)}
+        except Exception as e:
+            # Keeps the connection, the client gets an error instead of the end of the stream
+            response = {'id': requestId, 'error': 'Internal error: {}'.format(e)}
+        return (json.dumps(response) + '\n').encode('utf-8')
+
+class ReadingClient(object):
+    """
+    Client of a ReadingServer.
+    """
+
+    def __init__(self, address, timeout=None):
+        """
+        Connects to a server.
+
+        address:
+            A path of a Unix socket, or a tuple of the host and port of a TCP socket.
+
+        timeout:
+            A optional timeout in seconds of the requests.
+        """
+        if isinstance(address, tuple):
+            self._socket = socket.create_connection(address, timeout)
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(address)
+        self._file = self._socket.makefile('rb')
+        self._nextId = 0
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _request(self, method, **params):
+        self._nextId += 1
+        request = {'id': self._nextId, 'method': method, 'params': params}
+        self._socket.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        line = self._file.readline()
+        if not line:
+            raise TMEXException('Connection closed by the server')
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise TMEXException(response['error'])
+        return response['result']
+
+    def devices(self):
+        """
+        Returns the known devices of the server, a dict of tmex.records.Device by device id.
+        """
+        return dict((deviceId, Device(info['kind'], info.get('name'), info.get('description'),
+            info.get('overdrive', False), _branchFromJson(info.get('branch'))))
+            for deviceId, info in iteritems(self._request('devices')))
+
+    def read(self, devices=None, maxAge=None):
+        """
+        Reads devices through the server, see ReadingServer.read.
+
+        returns a dict of tmex.records.Reading by device id.
+        """
+        params = {}
+        if devices is not None:
+            params['devices'] = list(devices)
+        if maxAge is not None:
+            params['maxAge'] = maxAge
+        return dict((deviceId, _readingFromJson(reading))
+            for deviceId, reading in iteritems(self._request('read', **params)))
+
+    def health(self):
+        """
+        Returns the read statistics of the devices of the server, a dict of dicts by device id.
+        """
+        return self._request('health')
+
+    def metrics(self):
+        """
+        Returns the metrics of the session of the server in the Prometheus text format.
+        """
+        return self._request('metrics')
+
+def _readingToJson(reading):
+    result = {}
+    if reading.temperature is not None:
+        result['temperature'] = reading.temperature
+    if reading.humidity is not None:
+        result['humidity'] = reading.humidity
+    if reading.extra:
+        result['extra'] = reading.extra
+    if reading.timestamp is not None:
+        result['timestamp'] = reading.timestamp
+    return result
+
+def _readingFromJson(reading):
+    return Reading(reading.get('temperature'), reading.get('humidity'), reading.get('timestamp'),
+        reading.get('extra'))
+
+def _branchFromJson(branch):
+    if branch is None:
+        return None
+    return tuple((str(coupler), str(line)) for coupler, line in branch)
+
+def main():
+    from .session import Session
+    parser = argparse.ArgumentParser(description='Serves the readings of a 1-Wire bus to local clients.')
+    parser.add_argument('--port', type=int, default=0, help='TMEX port number of the bus')
+    parser.add_argument('--tcp', help='host:port to listen on')
+    parser.add_argument('--unix', help='path of a Unix socket to listen on')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help='time in seconds a reading is cached')
+    args = parser.parse_args()
+    if args.unix:
+        address = args.unix
+    else:
+        host, port = (args.tcp or 'localhost:8428').rsplit(':', 1)
+        address = (host, int(port))
+
+    session = Session(port=args.port)
+    session.enumrate()
+    server = ReadingServer(session, address, args.ttl)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
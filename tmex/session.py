@@ -2,14 +2,22 @@
 # Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
 # Licensed under the MIT license.
 
-import ctypes
-import time
-from .tmex import *
-from .system import ISPYTHON3, iteritems
-from datetime import datetime
-
-if not ISPYTHON3:
-    import binascii
+from .tmex import TMEXException
+from .crc import CRCError, checkCrc8, checkCrc8Blocks
+from .backend import TMEXBackend, LEVEL_NORMAL, LEVEL_STRONG_PULLUP, PRIME_NONE, PRIME_BYTE
+from .backend import SPEED_STANDARD, SPEED_OVERDRIVE, RESET_PRESENCE, RESET_ALARMING_PRESENCE
+from .romcache import RomCache
+from .stream import ReadingStream
+from .wait import ConversionTimeout, pollSchedule, TIMEOUT_FACTOR, TIMEOUT_MARGIN
+from .metrics import Metrics, MeteredBackend
+from .decode import DECODERS
+from .drivers import DRIVERS, ReadPlan, DS2409Driver
+from .records import Device, ReadingBatch
+from .changes import ChangeFilter
+from .health import HealthMonitor, FAILURE_CRC, FAILURE_TIMEOUT, FAILURE_POWER_ON, FAILURE_ERROR
+from collections import namedtuple, deque
+from .system import iteritems
+import binascii
 
 DEVICEINFO = {
     0x01: ("DS1990A", "Serial Number iButton"),
@@ -19,29 +27,98 @@ DEVICEINFO = {
     0x81: ("DS1420", "Serial ID Button")
 }
 
+# Family codes of the devices that support overdrive speed, memory iButtons, EEPROMs and switches. The DS18x20
+# thermometers, the DS2438 and the DS1990A only run at standard speed.
+OVERDRIVE_FAMILIES = frozenset([0x06, 0x08, 0x0A, 0x0C, 0x14, 0x18, 0x23, 0x29, 0x2D, 0x3A, 0x43])
+
+# Raw scratchpads of a list of devices, see Session.readScratchpads.
+#   devices:  The device ids of the scratchpads.
+#   families: A bytearray with the family code of each scratchpad.
+#   data:     The scratchpads back to back as bytes, tmex.decode.SCRATCHPAD_SIZE bytes each.
+Scratchpads = namedtuple('Scratchpads', ['devices', 'families', 'data'])
+
+# Number of compiled read plans kept by a session
+PLAN_CACHE_SIZE = 64
+
+# Default time in seconds between the full reads of pollAlarms
+ALARM_SWEEP_INTERVAL = 300.0
+
+# Default number of retries of a failed read in a read cycle, and the time in seconds a cycle may spend on retries
+RETRIES = 2
+RETRY_BUDGET = 1.0
+
 class Session(object):
     """
     Session is a class that encapsulates a 1-Wire session.
     """
 
-    def __init__(self, port=0):
+    def __init__(self, port=0, backend=None, cacheFile=None):
         """
         Initializes a 1-Wire session.
         
         port:
             A optional port number that will be used to start the session.
+        
+        backend:
+            A optional bus backend, see tmex.backend. The TMEX library is used if omitted.
+        
+        cacheFile:
+            A optional path of a file where the ROMs of the enumerated devices are kept between sessions. The devices
+            in the file are known to the session from the start, use verifyDevices to check that they are still
+            present.
         """
-        self._handle = 0
-        if ISPYTHON3:
-            self._context = ctypes.create_string_buffer(b'\000' * 15360)
-        else:
-            self._context = ctypes.create_string_buffer('\000' * 15360)
+        if backend is None:
+            backend = TMEXBackend()
+        # Counters, latency histograms and tracing of the bus operations, see tmex.metrics
+        self.metrics = Metrics()
+        self._bus = backend
+        self._backend = MeteredBackend(backend, self.metrics)
         self._devices = {}
+        self._roms = {}
+        self._cache = None
+        # Driver instances by family code and compiled read plans by device list, see tmex.drivers
+        self._drivers = {}
+        self._plans = {}
+        # Family codes of the devices addressed at overdrive speed when overdrive is enabled, see setOverdrive
+        self.overdriveFamilies = set(OVERDRIVE_FAMILIES)
+        self._overdrive = False
+        self._overdriveBus = False
+        # Timeout in seconds for conversions, None for a timeout based on the expected conversion time
+        self.conversionTimeout = None
+        # Monotonic time of the last full read of pollAlarms
+        self._lastSweep = None
+        # Last reported values and the deadbands of readChanges, see tmex.changes.ChangeFilter
+        self.changes = ChangeFilter()
+        # Read statistics and quarantine of failing devices, see tmex.health.HealthMonitor
+        self.health = HealthMonitor(clock=self._backend.clock)
+        # Retries of a failed read in a read cycle, and the time in seconds a cycle may spend on them
+        self.retries = RETRIES
+        self.retryBudget = RETRY_BUDGET
+        # Monotonic time the conversion waits of a retry must end by, None outside of retries
+        self._waitDeadline = None
+        # The branch connected by the DS2409 couplers, () when all lines are off and None when not known, see topology
+        self._activeBranch = None
+        # Starts the conversions of all branches before reading the first when True. Only for branches of externally
+        # powered devices, a branch is disconnected from the strong pullup while it converts, see topology. Converts
+        # and reads one branch at a time when False.
+        self.pipelineBranches = False
+        if cacheFile:
+            self._cache = RomCache(cacheFile)
+            devices = self._cache.load()
+            branches = self._cache.branches()
+            for deviceId in devices:
+                try:
+                    rom = bytearray(binascii.unhexlify(deviceId))
+                except (TypeError, ValueError, binascii.Error):
+                    continue
+                if len(rom) == 8 and checkCrc8(rom):
+                    self._devices[deviceId] = self._deviceInfo(rom, branches.get(deviceId))
         self.initialize(port)
 
     def __del__(self):
-        if self._handle != 0:
-            TMEndSession(self._handle)
+        backend = getattr(self, '_backend', None)
+        if backend is not None:
+            backend.close()
 
     def initialize(self, port=0):
         """
@@ -50,27 +127,20 @@ class Session(object):
         port:
             A optional port number that will be used to start the session.
         """
-        portNumber = ctypes.c_short(port)
-        portType = ctypes.c_short(0)
-        TMReadDefaultPort(portNumber, portType)
+        self._backend.open(port)
 
-        self._handle = TMExtendedStartSession(portNumber, portType, None)
-
-        result = TMSetup(self._handle)
-        if (result != 1):
-            TMEndSession(self._handle)
-            if result in TMSetupMessages:
-                raise TMEXException(TMSetupMessages[result])
-            else:
-                raise TMEXException('Unknown setup error, %d' % (result))
+    @property
+    def backend(self):
+        """
+        The bus backend of the session.
+        """
+        return self._bus
 
     def valid(self):
         """
         Check if the 1-Wire session is valid.
         """
-        if self._handle == 0:
-            return False
-        return TMValidSession(self._handle) == 1
+        return self._backend.valid()
     
     def _deviceFilter(self, devices, familyFilter):
         """
@@ -86,19 +156,7 @@ class Session(object):
         returns a list of device identifiers.
         """
         result = []
-        filterNumbers = []
-        for family in familyFilter:
-            if isinstance(family, (int)):
-                filterNumbers.append(family)
-            elif isinstance(family, (str)):
-                found = False
-                for num, info in iteritems(DEVICEINFO):
-                    if family == info[0]:
-                        filterNumbers.append(num)
-                        found = True
-                        break
-                if not found:
-                    raise TMEXException('Unknown device {}'.format(family))
+        filterNumbers = self._familyCodes(familyFilter)
         if not filterNumbers:
             return devices
         for deviceId in devices:
@@ -107,46 +165,355 @@ class Session(object):
                 result.append(deviceId)
         return result
 
+    def _familyCodes(self, familyFilter):
+        """
+        Converts a family filter to a list of family codes.
+        
+        familyFilter:
+            A list of integers or strings where integers are the device family code and strings is the device family
+            name.
+        """
+        names = dict((info[0], num) for num, info in iteritems(DEVICEINFO))
+        names.update((driver.name, num) for num, driver in iteritems(DRIVERS) if driver.name)
+        filterNumbers = []
+        for family in familyFilter:
+            if isinstance(family, (int)):
+                filterNumbers.append(family)
+            elif isinstance(family, (str)):
+                if family not in names:
+                    raise TMEXException('Unknown device {}'.format(family))
+                filterNumbers.append(names[family])
+        return filterNumbers
+
+    def _deviceInfo(self, rom, branch=None):
+        """
+        Returns the device information for a ROM as a Device.
+        
+        branch:
+            The branch of the device behind couplers, None for a device on the bus itself.
+        """
+        kind = rom[0]
+        driver = DRIVERS.get(kind)
+        if driver is not None and driver.name:
+            return Device(kind, driver.name, driver.description, kind in self.overdriveFamilies, branch)
+        if kind in DEVICEINFO:
+            info = DEVICEINFO[kind]
+            return Device(kind, info[0], info[1], kind in self.overdriveFamilies, branch)
+        return Device(kind, overdrive=kind in self.overdriveFamilies, branch=branch)
+
+    def _search(self, family=None):
+        """
+        Searches the bus for devices.
+        
+        family:
+            A optional family code. Only the branch of the search tree with the devices of the family is searched.
+        
+        returns a list of ROMs with a valid CRC.
+        """
+        backend = self._backend
+        roms = []
+        with self.metrics.time('search', family=family) as timer:
+            if family is None:
+                found = backend.first()
+            else:
+                backend.familySearchSetup(family)
+                found = backend.next()
+            while found:
+                rom = backend.rom()
+                if family is not None and rom[0] != family:
+                    break
+                roms.append(rom)
+                found = backend.next()
+            timer.details['found'] = len(roms)
+        return [rom for rom, valid in zip(roms, checkCrc8Blocks(roms)) if valid]
+
     def enumrate(self, familyFilter=None):
         """
-        Enumerates the devices on the 1-Wire bus.
+        Enumerates the devices on the 1-Wire bus. When there are DS2409 couplers on the bus, the branches behind them
+        are searched one at a time and each device is mapped to its branch, see topology.
         
         familyFilter:
             A optional list of family codes for devices to enumerate, omitting any device of a family not found in the
-            list.
+            list. Only the devices of the families in the list are searched for.
         """
-        if self._handle == 0:
-            raise TMEXException('Bus not initialized')
         if not self.valid():
             raise TMEXException('Bus not valid')
-        result = TMFirst(self._handle, self._context)
+        return self._atStandardSpeed(self._enumerate, familyFilter)
+
+    def _enumerate(self, familyFilter):
+        families = self._familyCodes(familyFilter) if familyFilter else []
+        found, couplers = self._searchTopology(families)
+        if families:
+            # Forget known devices of the searched families that are gone
+            for deviceId in list(self._devices.keys()):
+                if self._devices[deviceId].kind in families:
+                    del self._devices[deviceId]
+        else:
+            self._devices = {}
         devices = {}
-        while result != 0:
-            rom = (ctypes.c_short * 8)()
-            result = TMRom(self._handle, self._context, rom)
-            if result == 1:
+        for rom, branch in found:
+            deviceId = ''.join(['%02X' % x for x in rom])
+            devices[deviceId] = self._deviceInfo(rom, branch)
+        # The couplers are kept to reach the branches even when their family was not asked for
+        for rom, branch in couplers:
+            deviceId = ''.join(['%02X' % x for x in rom])
+            self._devices[deviceId] = self._deviceInfo(rom, branch)
+        self._devices.update(devices)
+        self._invalidatePlans()
+        self._saveCache()
+        return devices
+
+    def _searchTopology(self, families):
+        """
+        Searches the bus, and the branches behind the DS2409 couplers on it one at a time. A search of a branch finds
+        the devices on the bus and on the branches leading to it as well, the devices not found before are on the
+        branch.
+        
+        families:
+            A list of family codes to search for, all devices if empty. The couplers are searched for as well when
+            there are couplers on the bus, known from an earlier enumeration.
+        
+        returns a list of tuples of the ROM and the branch of the devices found, None for the bus itself, and the same
+        for the couplers found when their family was not searched for.
+        """
+        couplerFamily = DS2409Driver.family
+        searchCouplers = bool(families) and couplerFamily not in families and any(
+            info.kind == couplerFamily for info in self._devices.values())
+
+        def search():
+            if families:
+                roms = []
+                for family in families:
+                    roms.extend(self._search(family))
+            else:
+                roms = self._search()
+            if searchCouplers:
+                return roms, self._search(couplerFamily)
+            return roms, [rom for rom in roms if rom[0] == couplerFamily]
+
+        roms, couplerRoms = search()
+        if not couplerRoms:
+            return [(rom, None) for rom in roms], []
+        if self._activeBranch != ():
+            # Lines left on find the devices behind them as if they were on the bus
+            self._familyDriver(couplerFamily).allLinesOff()
+            self._activeBranch = ()
+            roms, couplerRoms = search()
+        found = {}
+        couplers = {}
+        # Branches to search, the bus itself first and each branch before the branches behind it
+        pending = deque([None])
+        while pending:
+            branch = pending.popleft()
+            if branch is not None:
+                self._selectBranch(branch, exact=True)
+                roms, couplerRoms = search()
+            for rom in roms:
                 deviceId = ''.join(['%02X' % x for x in rom])
-                romBytes = [x for x in rom]
-                rb = (ctypes.c_ubyte * 8)(*romBytes)
-                result = TMCRC(8, rb, 0, 0)
-                if result == 0:
-                    kind = int(rom[0])
-                    info = None
-                    if kind in DEVICEINFO:
-                        info = DEVICEINFO[kind]
-                        devices[deviceId] = {'kind': kind, 'name': info[0], 'description': info[1]}
-                    else:
-                        devices[deviceId] = {'kind': kind}
-            result = TMNext(self._handle, self._context)
-        self._devices = devices
-        filteredDevices = {}
-        if familyFilter:
-            ids = self._deviceFilter(devices.keys(), familyFilter)
-            for deviceId in ids:
-                filteredDevices[deviceId] = devices[deviceId]
+                if deviceId not in found:
+                    found[deviceId] = (rom, branch)
+            for rom in couplerRoms:
+                deviceId = ''.join(['%02X' % x for x in rom])
+                if deviceId not in couplers:
+                    couplers[deviceId] = (rom, branch)
+                    # Known to _rom before the coupler is known to the session, to switch its lines
+                    self._roms[deviceId] = bytearray(rom)
+                    pending.extend((branch or ()) + ((deviceId, line),) for line in DS2409Driver.lines)
+        if not searchCouplers:
+            return list(found.values()), []
+        return list(found.values()), list(couplers.values())
+
+    def verifyDevices(self, devices=None):
+        """
+        Check that known devices are still on the 1-Wire bus, with a search for each ROM instead of a search of the
+        whole bus. Devices that are not found are forgotten.
+        
+        devices:
+            A optional list of device ids to verify, all known devices if omitted.
+        
+        returns the devices found.
+        """
+        if not self.valid():
+            raise TMEXException('Bus not valid')
+        return self._atStandardSpeed(self._verifyDevices, devices)
+
+    def _verifyDevices(self, devices):
+        if devices is None:
+            devices = list(self._devices.keys())
+        result = {}
+        for deviceId in devices:
+            if deviceId not in self._devices:
+                continue
+            if self._devices[deviceId].branch is not None:
+                self._selectBranch(self._devices[deviceId].branch)
+            if self._backend.verify(self._rom(deviceId)):
+                result[deviceId] = self._devices[deviceId]
+            else:
+                del self._devices[deviceId]
+                self.changes.forget(deviceId)
+                self.health.forget(deviceId)
+                self._roms.pop(deviceId, None)
+                self._invalidatePlans()
+        self._saveCache()
+        return result
+
+    def setOverdrive(self, enable=True):
+        """
+        Switches the devices that support overdrive, see overdriveFamilies, to overdrive speed, or everything back to
+        standard speed.
+        
+        When all known devices support overdrive, the whole bus is switched with OVERDRIVE SKIP ROM. On a bus with
+        devices that only run at standard speed the bus stays at standard speed, and the transactions with the devices
+        that support overdrive address the device with OVERDRIVE MATCH ROM and run the rest at overdrive speed. Stays
+        at standard speed if the backend does not support overdrive, or if no device answers at overdrive speed.
+        Searches are done at standard speed.
+        
+        enable:
+            Enables overdrive when True, disables it when False.
+        
+        returns True if the whole bus runs at overdrive speed.
+        """
+        if self._overdrive:
+            self._overdrive = False
+            self._leaveOverdrive()
+        if enable:
+            try:
+                self._backend.setSpeed(SPEED_OVERDRIVE)
+                self._backend.setSpeed(SPEED_STANDARD)
+            except TMEXException:
+                return False
+            self._overdrive = True
+            self._enterOverdrive()
+        return self._overdriveBus
+
+    def overdriveDevices(self):
+        """
+        Returns the device ids of the known devices that are addressed at overdrive speed.
+        """
+        if not self._overdrive:
+            return []
+        return [deviceId for deviceId, info in iteritems(self._devices) if info.overdrive]
+
+    def _enterOverdrive(self):
+        devices = list(self._devices.values())
+        if not devices or not all(info.overdrive for info in devices):
+            return
+        backend = self._backend
+        backend.touchReset()
+        backend.touchByte(0x3C) # OVERDRIVE SKIP ROM
+        backend.setSpeed(SPEED_OVERDRIVE)
+        if backend.touchReset() in (RESET_PRESENCE, RESET_ALARMING_PRESENCE):
+            self._overdriveBus = True
         else:
-            filteredDevices = devices
-        return filteredDevices
+            # No device answers at overdrive speed, addressing them one by one would fail as well
+            self._leaveOverdrive()
+            self._overdrive = False
+
+    def _leaveOverdrive(self):
+        # A reset at standard speed returns all devices to standard speed
+        self._backend.setSpeed(SPEED_STANDARD)
+        self._backend.touchReset()
+        self._overdriveBus = False
+
+    def _atStandardSpeed(self, func, *args):
+        """
+        Runs a function with the bus at standard speed, so devices that are not in overdrive take part.
+        """
+        if not self._overdrive:
+            return func(*args)
+        self.setOverdrive(False)
+        try:
+            return func(*args)
+        finally:
+            self.setOverdrive(True)
+
+    def devices(self):
+        """
+        Returns the known devices, from enumeration or the cache file.
+        """
+        return dict(self._devices)
+
+    def topology(self):
+        """
+        Returns the known devices by branch. A branch is the path to the devices through DS2409 couplers, see
+        tmex.records.Device.branch. The session connects the branch of a device before it talks to it, and readDevices
+        converts and reads the branches one after another.
+        
+        With pipelineBranches readDevices starts the conversions of all branches first and reads each branch while the
+        others convert. Set it only when all devices behind the couplers are externally powered: a branch is
+        disconnected while it converts, so parasite powered devices lose the strong pullup and their conversions fail.
+        
+        returns a dict of lists of device ids by branch, with the devices on the bus itself under None.
+        """
+        result = {}
+        for deviceId, info in iteritems(self._devices):
+            result.setdefault(info.branch, []).append(deviceId)
+        return result
+
+    def _hasBranches(self):
+        """
+        Returns True if there are known devices behind couplers.
+        """
+        return any(info.branch is not None for info in self._devices.values())
+
+    def _branchGroups(self, devices):
+        """
+        Groups a list of devices by branch, the deepest branches first and the bus itself last. A conversion broadcast
+        on a branch also reaches the devices on the branches leading to it, so those are converted after it.
+        
+        returns a list of tuples of the branch and the list of device ids.
+        """
+        groups = {}
+        order = []
+        for deviceId in devices:
+            info = self._devices.get(deviceId)
+            branch = info.branch if info is not None else None
+            group = groups.get(branch)
+            if group is None:
+                group = groups[branch] = []
+                order.append(branch)
+            group.append(deviceId)
+        order.sort(key=lambda branch: -len(branch or ()))
+        return [(branch, groups[branch]) for branch in order]
+
+    def _selectBranch(self, branch, exact=False):
+        """
+        Connects a branch behind couplers with SMART-ON, see tmex.drivers.DS2409Driver. The lines of the other couplers
+        are switched off first unless the branch continues the one that is connected.
+        
+        branch:
+            The branch, None for the bus itself.
+        
+        exact:
+            Disconnects the branches behind the branch when True, so a broadcast only reaches the devices on the
+            branch and on the branches leading to it. A branch is left as it is when it is already reachable when
+            False.
+        """
+        path = branch or ()
+        active = self._activeBranch
+        if active == path:
+            return
+        if not exact and (not path or active is not None and active[:len(path)] == path):
+            return
+        driver = self._familyDriver(DS2409Driver.family)
+        self.metrics.count('branch_switches')
+        try:
+            if active is None or path[:len(active)] != active:
+                driver.allLinesOff()
+                self._activeBranch = ()
+            for index in range(len(self._activeBranch), len(path)):
+                coupler, line = path[index]
+                driver.switchOn(coupler, line)
+                self._activeBranch = path[:index + 1]
+        except TMEXException:
+            self.metrics.count('branch_failures')
+            self._activeBranch = None
+            raise
+
+    def _saveCache(self):
+        if self._cache is not None:
+            self._cache.save(self._devices.keys(),
+                dict((deviceId, info.branch) for deviceId, info in iteritems(self._devices) if info.branch))
 
     def readDevice(self, deviceId, enableWireLeveling=False):
         """
@@ -158,18 +525,132 @@ class Session(object):
         enableWireLeveling:
             Enables the reader to use wire leveling to read from certain devices.
         """
+        return self._readDevice(deviceId, enableWireLeveling, convert=True)
+
+    def _readDevice(self, deviceId, enableWireLeveling=False, convert=True):
+        """
+        Reads the value from a device on the 1-Wire bus.
+        
+        convert:
+            Starts the conversions of the device before reading it when True. readDevices starts the conversions of
+            all devices with broadcasts instead.
+        """
         if deviceId not in self._devices:
             raise ValueError()
-        deviceName = self._devices[deviceId]['name']
-        func = None
+        driver = self._driver(deviceId)
+        if driver is None:
+            return {}
+        self._backend.deviceId = deviceId
         try:
-            func = getattr(self, '_read_' + deviceName)
-        except AttributeError:
-            func = None
-        if func:
-            return func(deviceId, enableWireLeveling)
+            with self.metrics.time('read', deviceId, convert=convert):
+                values = driver.read(deviceId, enableWireLeveling, convert)
+        except CRCError:
+            self._failure(deviceId, FAILURE_CRC)
+            raise
+        except ConversionTimeout:
+            self._failure(deviceId, FAILURE_TIMEOUT)
+            raise
+        finally:
+            self._backend.deviceId = None
+        if driver.isPowerOnValue(values):
+            self._failure(deviceId, FAILURE_POWER_ON)
         else:
-            return {}
+            self.health.success(deviceId)
+        return values
+
+    def _failure(self, deviceId, kind):
+        """
+        Records a failed read of a device in the health monitor and the metrics.
+        """
+        self.metrics.count('read_failures', 1, deviceId)
+        if self.health.failure(deviceId, kind):
+            self.metrics.count('quarantines', 1, deviceId)
+
+    def _driver(self, deviceId):
+        """
+        Returns the driver of a known device, None if there is no driver for its family.
+        """
+        return self._familyDriver(self._devices[deviceId].kind)
+
+    def _familyDriver(self, kind):
+        """
+        Returns the driver of a family, None if there is no driver for it.
+        """
+        driver = self._drivers.get(kind)
+        if driver is None:
+            driverClass = DRIVERS.get(kind)
+            if driverClass is None:
+                return None
+            driver = driverClass(self)
+            self._drivers[kind] = driver
+        return driver
+
+    def _plan(self, devices):
+        """
+        Returns the read plan of a list of devices, compiled on first use.
+        """
+        key = tuple(devices)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._compilePlan(key)
+            if len(self._plans) >= PLAN_CACHE_SIZE:
+                self._plans = {}
+            self._plans[key] = plan
+        return plan
+
+    def _invalidatePlans(self):
+        """
+        Drops the compiled read plans, after a change of the devices or of what they read.
+        """
+        self._plans = {}
+
+    def _compilePlan(self, devices):
+        """
+        Compiles the read plan of a list of devices, see tmex.drivers.ReadPlan.
+        """
+        conversionTime = 0
+        broadcasts = []
+        steps = []
+        for deviceId in devices:
+            driver = self._driver(deviceId) if deviceId in self._devices else None
+            transactions = []
+            if driver is not None:
+                conversionTime = max(conversionTime, driver.expectedConversionTime(deviceId))
+                for broadcast in driver.broadcasts:
+                    if broadcast not in broadcasts:
+                        broadcasts.append(broadcast)
+                for command, readCount in driver.transactions(deviceId):
+                    if isinstance(command, int):
+                        command = [command]
+                    transactions.append((self._frame(deviceId, command, readCount), command, readCount))
+            steps.append((deviceId, driver, transactions))
+        # The bus reads busy until the last device on it is done, so a poll only tells when the devices in the plan
+        # are done if none of the others converts for longer
+        polled = True
+        for deviceId in self._devices:
+            driver = self._driver(deviceId)
+            if driver is not None and driver.expectedConversionTime(deviceId) > conversionTime:
+                polled = False
+                break
+        return ReadPlan(list(devices), conversionTime, polled, broadcasts, steps)
+
+    def _runStep(self, step):
+        """
+        Runs the transactions of a device in a read plan.
+        
+        returns the bytes read by the last transaction, None if the device has nothing to read.
+        """
+        deviceId, driver, transactions = step
+        if deviceId not in self._devices:
+            raise ValueError()
+        data = None
+        self._backend.deviceId = deviceId
+        try:
+            for frame, command, readCount in transactions:
+                data = self._runFrame(deviceId, frame, command, readCount)
+        finally:
+            self._backend.deviceId = None
+        return data
 
     def readDevices(self, devices, familyFilter=None, timeStamp=True):
         """
@@ -184,132 +665,696 @@ class Session(object):
         
         timeStamp:
             A optional boolean to enable value timestamps and request timing.
+        
+        returns a dict of reading dicts by device id, see tmex.records.ReadingBatch.asDict. Use readBatch to keep the
+        readings in compact form.
         """
         if familyFilter:
             devices = self._deviceFilter(devices, familyFilter)
         if len(devices) == 0:
             return {}
-        if timeStamp:
-            startTime = datetime.now()
+        return self.readBatch(devices, timeStamp=timeStamp).asDict()
 
-        TMTouchReset(self._handle)
-        TMOneWireLevel(self._handle, 0, 1, 2)
+    def readBatch(self, devices, familyFilter=None, timeStamp=True):
+        """
+        Same as readDevices but returns the readings as a tmex.records.ReadingBatch, arrays of values and monotonic
+        timestamps instead of a dict per device.
+        """
+        if familyFilter:
+            devices = self._deviceFilter(devices, familyFilter)
+        batch = ReadingBatch(devices, timeStamp)
+        if len(devices) > 0:
+            self._wait(self._readSteps(batch, devices))
+        batch.finish()
+        return batch
 
-        TMTouchByte(self._handle, 0xCC)
-        TMTouchByte(self._handle, 0x44)
+    def _readSteps(self, batch, devices):
+        """
+        Generator reading devices into a batch, see readBatch. The bus is idle while the devices convert, the
+        generator yields the time in seconds to wait then and goes on when it is advanced. Runs with _wait, or with
+        _nextWait by tmex.asyncsession.AsyncSession, which waits in the event loop.
+        """
+        with self.metrics.time('cycle', devices=len(devices)):
+            for delay in self._convertBranches(devices, lambda group: self._collectReadings(batch, group)):
+                yield delay
 
-        time.sleep(.750)
-        data = TMTouchByte(self._handle, 0xFF)
+    def _wait(self, steps):
+        """
+        Runs a generator of waits, like _readSteps, sleeping with the backend for every wait.
+        """
+        sleep = self._backend.sleep
+        for delay in steps:
+            sleep(delay)
 
-        while data == 0:
-            data = TMTouchByte(self._handle, 0xFF)
+    def _nextWait(self, steps, until=None):
+        """
+        Advances a generator of waits, like _readSteps, to its next wait.
+        
+        until:
+            The time of the backend clock the previous wait ended at. A backend with a virtual clock, like
+            tmex.replay.ReplayBackend, sleeps until then first, as the wait was done elsewhere.
+        
+        returns a tuple of the time in seconds to wait and the time of the backend clock it ends at, None when the
+        generator is done.
+        """
+        if until is not None:
+            remaining = until - self._backend.clock()
+            if remaining > 0:
+                self._backend.sleep(remaining)
+        delay = next(steps, None)
+        if delay is None:
+            return None
+        return delay, self._backend.clock() + delay
 
-        TMOneWireLevel(self._handle, 0, 0, 0)
-        result = {}
+    def readChanges(self, devices, familyFilter=None, timeStamp=True):
+        """
+        Same as readBatch but only returns the readings that changed since they were last returned, by more than the
+        deadband or after the maximum silence of the family, see changes.
+        
+        returns a tmex.records.ReadingBatch of the changed readings.
+        """
+        return self.changes.filter(self.readBatch(devices, familyFilter, timeStamp))
 
-        for deviceId in devices:
-            t = self.readDevice(deviceId, enableWireLeveling=False)
-            result[deviceId] = {}
-            for key, value in iteritems(t):
-                result[deviceId][key] = value
-            if timeStamp:
-                result[deviceId]['timestamp'] = datetime.now()
-
-        if timeStamp:
-            stopTime = datetime.now()
-            result['time'] = (startTime, stopTime)
-            result['delta'] = stopTime - startTime
+    def setAlarm(self, deviceId, low, high, copyToEeprom=False):
+        """
+        Sets the alarm thresholds of a DS18x20 thermometer, see pollAlarms. The device has an alarm condition after a
+        conversion when the integer part of its temperature is at or below the low threshold, or at or above the high
+        threshold.
+        
+        deviceId:
+            The device id of the device. Must have been enumerated.
+        
+        low:
+            The lower alarm threshold TL in whole degrees Celsius.
+        
+        high:
+            The upper alarm threshold TH in whole degrees Celsius.
+        
+        copyToEeprom:
+            Copies the thresholds to EEPROM when True, where they are kept through power loss.
+        
+        returns the configuration read back from the device, see readConfiguration.
+        """
+        if low >= high:
+            raise ValueError('The low alarm threshold must be below the high threshold')
+        return self.writeConfiguration(deviceId, th=high, tl=low, copyToEeprom=copyToEeprom)
+
+    def alarmingDevices(self):
+        """
+        Finds the devices with an alarm condition with ALARM SEARCH, on the bus and on each branch behind couplers. The
+        thermometers update their alarm condition with every temperature conversion.
+        
+        returns a list of the device ids of the alarming devices.
+        """
+        return self._atStandardSpeed(self._alarmingDevices)
+
+    def _alarmingDevices(self):
+        if not self._hasBranches():
+            return self._alarmSearch()
+        result = []
+        for branch, group in self._branchGroups(self._devices):
+            self._selectBranch(branch, exact=True)
+            for deviceId in self._alarmSearch():
+                if deviceId not in result:
+                    result.append(deviceId)
         return result
 
-    def _addressDevice(self, deviceId):
+    def _alarmSearch(self):
         """
-        Addresses a device on the 1-Wire bus directly.
+        Searches the connected devices with an alarm condition.
+        """
+        backend = self._backend
+        roms = []
+        with self.metrics.time('alarm_search') as timer:
+            found = backend.firstAlarm()
+            while found:
+                roms.append(backend.rom())
+                found = backend.nextAlarm()
+            timer.details['found'] = len(roms)
+        return [''.join(['%02X' % x for x in rom]) for rom, valid in zip(roms, checkCrc8Blocks(roms)) if valid]
+
+    def pollAlarms(self, devices=None, familyFilter=None, timeStamp=True, sweepInterval=ALARM_SWEEP_INTERVAL):
+        """
+        Reads the devices that are outside their alarm thresholds, see setAlarm. The temperatures are converted with a
+        broadcast as in readDevices, followed by an ALARM SEARCH, and only the alarming devices are read. Devices of
+        families without alarms are read every time. All of the devices are read on the first poll and then every
+        sweepInterval seconds, in case a device lost its thresholds.
+        
+        devices:
+            A optional list of device ids of the devices to poll, all known devices if omitted.
+        
+        familyFilter:
+            A optional list of integers or strings where integers are the device family code and strings is the device
+            family name.
+        
+        timeStamp:
+            A optional boolean to enable value timestamps.
+        
+        sweepInterval:
+            A optional time in seconds between the full reads.
+        
+        returns a tmex.records.ReadingBatch of the devices that were read.
+        """
+        if devices is None:
+            devices = list(self._devices.keys())
+        if familyFilter:
+            devices = self._deviceFilter(devices, familyFilter)
+        now = self._backend.clock()
+        if self._lastSweep is None or now - self._lastSweep >= sweepInterval:
+            self._lastSweep = now
+            return self.readBatch(devices, timeStamp=timeStamp)
+        if len(devices) == 0:
+            return self.readBatch(devices, timeStamp=timeStamp)
+        batch = ReadingBatch(devices, timeStamp)
+        read = []
+        def readAlarming(group):
+            alarming = set(self._atStandardSpeed(self._alarmSearch))
+            selected = [deviceId for deviceId in group if deviceId in alarming or not self._hasAlarms(deviceId)]
+            self._collectReadings(batch, selected)
+            read.extend(selected)
+        with self.metrics.time('cycle', devices=len(devices), alarms=True):
+            self._wait(self._convertBranches(devices, readAlarming))
+        batch.finish()
+        indexes = batch._lookup()
+        return batch.select(sorted(indexes[deviceId] for deviceId in read))
+
+    def _hasAlarms(self, deviceId):
+        """
+        Returns True if a known device takes part in ALARM SEARCH.
+        """
+        driver = self._driver(deviceId) if deviceId in self._devices else None
+        return driver is not None and driver.alarms
+
+    def readScratchpads(self, devices, familyFilter=None, convert=True):
+        """
+        Reads the raw scratchpads of a list of devices into one contiguous block, for decoding in bulk with
+        tmex.decode.decodeScratchpads. Devices of families without a decoder are left out. Corrupt scratchpads are
+        kept, the decoder checks the CRCs.
+        
+        devices:
+            A list of device id of the devices to read. Must have been enumerated.
+        
+        familyFilter:
+            A optional list of integers or strings where integers are the device family code and strings is the device
+            family name.
+        
+        convert:
+            Starts the conversions of all devices with broadcasts before reading them when True.
+        
+        returns a Scratchpads.
+        """
+        if familyFilter:
+            devices = self._deviceFilter(devices, familyFilter)
+        devices = [deviceId for deviceId in devices if self._hasDecoder(deviceId)]
+        block = bytearray()
+        if devices:
+            # The scratchpads are in the order the branches are read in
+            order = []
+            def readGroup(group):
+                order.extend(group)
+                for step in self._plan(group).steps:
+                    block.extend(self._runStep(step))
+            with self.metrics.time('cycle', devices=len(devices)):
+                if convert:
+                    self._wait(self._convertBranches(devices, readGroup))
+                else:
+                    readGroup(devices)
+            devices = order
+        families = bytearray([self._devices[deviceId].kind for deviceId in devices])
+        return Scratchpads(devices, families, bytes(block))
+
+    def _hasDecoder(self, deviceId):
+        """
+        Returns True if a device is known and tmex.decode.decodeScratchpads decodes its family.
+        """
+        info = self._devices.get(deviceId)
+        return info is not None and info.kind in DECODERS
+
+    def stream(self, interval, devices=None, familyFilter=None, bufferSize=1, timeStamp=True, changesOnly=False):
+        """
+        Reads devices on a fixed-rate schedule in a background thread.
+        
+        interval:
+            The time in seconds between the scheduled reads.
+        
+        devices:
+            A optional list of device ids of the devices to read, all known devices if omitted.
+        
+        familyFilter:
+            A optional list of integers or strings where integers are the device family code and strings is the device
+            family name.
+        
+        bufferSize:
+            A optional number of batches kept for a slow consumer, older batches are dropped.
+        
+        timeStamp:
+            A optional boolean to enable value timestamps and request timing.
+        
+        changesOnly:
+            Reads with readChanges when True, and only hands out the batches with changed readings.
+        
+        returns a ReadingStream, an iterator of StreamBatch that must be closed when done.
+        """
+        return ReadingStream(self, interval, devices, familyFilter, bufferSize, timeStamp, changesOnly)
+
+    def _convert(self, devices):
+        """
+        Generator converting the values of all devices on the bus with broadcasts, see _startConversion, yields the
+        waits like _readSteps. A conversion that times out, a device holding the bus low, is not an error here: the
+        devices that did not convert fail their reads, see _collectReadings, and the others are read.
+        """
+        expected = self._startConversion(devices)
+        if expected:
+            try:
+                for delay in self._conversionWaits(expected, poll=self._plan(devices).polled):
+                    yield delay
+            except ConversionTimeout:
+                pass
+        wait = self._endConversion(devices)
+        if wait:
+            yield wait
+
+    def _convertBranches(self, devices, read):
+        """
+        Generator converting the values of devices on the branches behind couplers, see _convert, yields the waits
+        like _readSteps.
+        
+        read:
+            A function called with the list of devices on each branch when its conversion is done, with the branch
+            connected.
+        
+        With pipelineBranches the conversions of all branches are started one after another first, and each branch is
+        read while the branches after it convert, so a read of many branches takes about one conversion time and not
+        one per branch. This needs externally powered devices, see topology. A branch that cannot be connected is
+        yielded without a conversion, its devices fail their reads.
+        """
+        groups = self._branchGroups(devices)
+        if len(groups) == 1 and groups[0][0] is None:
+            for delay in self._convert(devices):
+                yield delay
+            read(devices)
+            return
+        if len(groups) == 1 or not self.pipelineBranches:
+            for branch, group in groups:
+                if self._connectBranch(branch, exact=True):
+                    for delay in self._convert(group):
+                        yield delay
+                read(group)
+            return
+        backend = self._backend
+        started = []
+        for branch, group in groups:
+            expected = None
+            if self._connectBranch(branch, exact=True):
+                expected = self._startConversion(group)
+                if expected:
+                    # No strong pullup, the branch is disconnected while it converts
+                    backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+            started.append((branch, group, expected, self._backend.clock() + (expected or 0)))
+        for branch, group, expected, readyAt in started:
+            if expected is not None and self._connectBranch(branch):
+                if expected:
+                    # Sleeps, a poll answers done at once after the reset and the SMART-ON of the branch switch
+                    for delay in self._conversionWaits(max(0, readyAt - self._backend.clock()), poll=False):
+                        yield delay
+                wait = self._endConversion(group)
+                if wait:
+                    yield wait
+            read(group)
+
+    def _connectBranch(self, branch, exact=False):
+        """
+        Same as _selectBranch but returns False instead of raising TMEXException when the branch cannot be connected.
+        """
+        try:
+            self._selectBranch(branch, exact)
+        except TMEXException:
+            return False
+        return True
+
+    def _startConversion(self, devices):
+        """
+        Starts the temperature conversion of all devices on the bus with a broadcast. The bus stays on strong pullup
+        until _endConversion.
+        
+        returns the expected conversion time in seconds, the longest conversion time of the devices, 0 if none of the
+        devices converts. The DS18B20s convert in the time of their resolution, see readConfiguration.
+        """
+        expected = self._plan(devices).conversionTime
+        if not expected:
+            return 0
+        backend = self._backend
+        backend.touchReset()
+        backend.oneWireLevel(LEVEL_STRONG_PULLUP, PRIME_BYTE)
+
+        backend.touchByte(0xCC)
+        backend.touchByte(0x44)
+        return expected
+
+    def _waitConversion(self, expected, deviceId=None, poll=True):
+        """
+        Waits for a conversion to finish, see _conversionWaits.
+        """
+        self._wait(self._conversionWaits(expected, deviceId, poll))
+
+    def _conversionWaits(self, expected, deviceId=None, poll=True):
+        """
+        Generator waiting for a conversion to finish, see tmex.wait.waitForConversion, yields the waits like
+        _readSteps. Records the conversion in the metrics.
         
         deviceId:
-            The device id of the device to read. Must have been enumerated.
+            The device id of the converting device, None for a broadcast conversion.
+        
+        poll:
+            Polls the bus for the end of the conversion when True, waits for the expected time when False.
+        
+        Raises ConversionTimeout if a polled conversion is not done in time.
+        """
+        self.metrics.count('conversions', 1, deviceId)
+        timeout = self.conversionTimeout
+        if self._waitDeadline is not None:
+            if timeout is None:
+                timeout = expected * TIMEOUT_FACTOR + TIMEOUT_MARGIN
+            timeout = max(0, min(timeout, self._waitDeadline - self._backend.clock()))
+        try:
+            with self.metrics.time('conversion', deviceId, expected=expected):
+                if not poll:
+                    yield expected
+                    return
+                for delay in pollSchedule(expected, timeout, self._backend.clock):
+                    if delay > 0:
+                        yield delay
+                    if self._conversionDone():
+                        return
+                raise ConversionTimeout('Conversion not done in time')
+        except ConversionTimeout:
+            self.metrics.count('timeouts', 1, deviceId)
+            raise
+
+    def _conversionDone(self):
+        """
+        Check if the conversions started by _startConversion are done.
+        """
+        return self._backend.touchByte(0xFF) != 0
+
+    def _endConversion(self, devices):
+        """
+        Ends the conversions started by _startConversion and sends the broadcasts of the drivers that have to follow.
+        
+        returns the time in seconds to wait before _collectReadings.
+        """
+        plan = self._plan(devices)
+        if not plan.conversionTime:
+            return 0
+        backend = self._backend
+        backend.oneWireLevel(LEVEL_NORMAL, PRIME_NONE)
+
+        wait = 0
+        for frame, delay in plan.broadcasts:
+            backend.touchBlock(frame, reset=True)
+            wait = max(wait, delay)
+        return wait
+
+    def _collectReadings(self, batch, devices=None):
+        """
+        Reads the converted values from the devices of a batch with their read plan into the batch.
+        
+        devices:
+            A optional list of the devices of the batch to read, all of them if omitted.
+        
+        Quarantined devices are skipped, see health. A failed read is retried up to retries times while the cycle has
+        spent less than retryBudget seconds on retries, a read of the power-on value after a conversion of the device
+        alone. The conversion of a retry is given up when the budget runs out. Devices that still fail, like the
+        quarantined devices, are left unread in the batch, without values or a timestamp.
+        """
+        health = self.health
+        retryTime = 0.0
+        if devices is None:
+            devices = batch.devices
+            indexes = range(len(devices))
+        else:
+            lookup = batch._lookup()
+            indexes = [lookup[deviceId] for deviceId in devices]
+        for index, step in zip(indexes, self._plan(devices).steps):
+            deviceId, driver = step[0], step[1]
+            if not health.available(deviceId):
+                self.metrics.count('quarantine_skips', 1, deviceId)
+                continue
+            values, failure = self._readStep(step)
+            attempts = 0
+            while failure is not None and attempts < self.retries:
+                reconvert = failure in (FAILURE_POWER_ON, FAILURE_TIMEOUT)
+                needed = driver.expectedConversionTime(deviceId) if reconvert else 0
+                if retryTime + needed > self.retryBudget:
+                    break
+                self.metrics.count('retries', 1, deviceId)
+                started = self._backend.clock()
+                self._waitDeadline = started + self.retryBudget - retryTime
+                try:
+                    values, failure = self._readStep(step, reconvert)
+                finally:
+                    self._waitDeadline = None
+                retryTime += self._backend.clock() - started
+                attempts += 1
+            if failure is None:
+                health.success(deviceId)
+                batch.set(index, values)
+            else:
+                self._failure(deviceId, failure)
+        return batch
+
+    def _readStep(self, step, convert=False):
+        """
+        Reads a device of a read plan once.
+        
+        convert:
+            Converts the values of the device alone before the read when True.
+        
+        returns a tuple of the decoded values and the kind of failure, None if the read succeeded.
+        """
+        deviceId, driver = step[0], step[1]
+        with self.metrics.time('read', deviceId, convert=convert):
+            try:
+                if convert:
+                    self._backend.deviceId = deviceId
+                    try:
+                        driver.convert(deviceId, True)
+                    finally:
+                        self._backend.deviceId = None
+                data = self._runStep(step)
+                if data is None:
+                    return {}, None
+                self._checkScratchpad(deviceId, data)
+            except CRCError:
+                return {}, FAILURE_CRC
+            except ConversionTimeout:
+                return {}, FAILURE_TIMEOUT
+            except TMEXException:
+                return {}, FAILURE_ERROR
+            values = driver.decode(data, deviceId)
+        if driver.isPowerOnValue(values):
+            return {}, FAILURE_POWER_ON
+        return values, None
+
+    def _configurableDriver(self, deviceId):
+        """
+        Returns the driver of a known device, raises TMEXException if the device has no configuration.
         """
         if deviceId not in self._devices:
             raise ValueError()
-        TMTouchReset(self._handle)
-        TMTouchByte(self._handle, 0x55) # MATCH ROM
-        if ISPYTHON3:
-            # FIXME: Bad code
-            address = [ord(chr(x)) for x in bytes.fromhex(deviceId) ]
-        else:
-            address = [ord(x) for x in binascii.unhexlify(deviceId)]
-        for i in range(8):
-            TMTouchByte(self._handle, address[i]) # Send Id
-        return 1
+        driver = self._driver(deviceId)
+        if driver is None or not driver.configurable:
+            raise TMEXException('{} has no configuration'.format(deviceId))
+        return driver
 
-    def _read_DS18B2(self, deviceId, enableWireLeveling=False):
+    def _configurableDevices(self, devices, familyFilter, resolution=None):
         """
-        Reads the value from a DS18B2 device on the 1-Wire bus.
+        Returns the device ids of a list of devices, or of all known devices, that have a configuration.
+        """
+        if devices is None:
+            devices = []
+            for deviceId in self._devices:
+                driver = self._driver(deviceId)
+                if driver is not None and driver.configurable and (resolution is None or driver.resolutions):
+                    devices.append(deviceId)
+        if familyFilter:
+            devices = self._deviceFilter(devices, familyFilter)
+        return devices
+
+    def readConfiguration(self, deviceId):
+        """
+        Reads the configuration of a DS18x20 thermometer from its scratchpad.
         
         deviceId:
-            The device id of the device to read. Must have been enumerated.
+            The device id of the device. Must have been enumerated.
         
-        enableWireLeveling:
-            Enables the reader to use wire leveling to read from certain devices.
+        returns a dict with the alarm thresholds 'th' and 'tl' in degrees Celsius, and the 'resolution' in bits of a
+        DS18B20.
         """
-        result = self._addressDevice(deviceId)
-        temp = None
-        if result == 1:
-            if enableWireLeveling:
-                TMOneWireLevel(self._handle, 0, 1, 2)
-                data = TMTouchByte(self._handle, 0x44)
-                time.sleep(0.6)
-                data = TMTouchByte(self._handle, 0xFF)
-                while data == 0:
-                    data = TMTouchByte(self._handle, 0xFF)
-                TMOneWireLevel(self._handle, 0, 0, 0)
-            result = self._addressDevice(deviceId)
-            data = TMTouchByte(self._handle, 0xBE)
-            data = [TMTouchByte(self._handle, 0xFF) for i in range(9)]
-            temp = ((0x07 & data[1]) << 4) + ((0xF0 & data[0]) >> 4) + (((0x08 & data[0]) >> 3) * 0.5) + (((0x04 & data[0]) >> 2) * 0.25) + (((0x02 & data[0]) >> 1) * 0.125) + (((0x01 & data[0])) * 0.0625)
-            if (0x08 & data[1]) == 0x08:
-                temp = -temp
-        return {'temperature': temp}
-
-    def _read_DS2438(self, deviceId, enableWireLeveling=False):
-        """
-        Reads the value from a DS2438 device connected to a HIH-4021 family device on the 1-Wire bus.
+        driver = self._configurableDriver(deviceId)
+        self._backend.deviceId = deviceId
+        try:
+            return driver.readConfiguration(deviceId)
+        finally:
+            self._backend.deviceId = None
+
+    def writeConfiguration(self, deviceId, resolution=None, th=None, tl=None, copyToEeprom=False):
+        """
+        Writes the configuration of a DS18x20 thermometer to its scratchpad and checks it. The DS18B20 converts in the
+        time of its resolution, from 94 ms at 9 bits to 750 ms at 12 bits, and readDevices waits for the slowest
+        device it reads.
         
         deviceId:
-            The device id of the device to read. Must have been enumerated.
+            The device id of the device. Must have been enumerated.
         
-        enableWireLeveling:
-            Enables the reader to use wire leveling to read from certain devices. Not used for DS2438.
-        """
-        result = self._addressDevice(deviceId)
-        temp = None
-        if result == 1:
-            data = TMTouchByte(self._handle, 0x44)
-            data = TMTouchByte(self._handle, 0xFF)
-            while data == 0:
-
-                data = TMTouchByte(self._handle, 0xFF)
-            result = self._addressDevice(deviceId)
-            data = TMTouchByte(self._handle, 0xB4)
-            data = TMTouchByte(self._handle, 0xFF)
-            while data == 0:
-                data = TMTouchByte(self._handle, 0xFF)
-            result = self._addressDevice(deviceId)
-            data = TMTouchByte(self._handle, 0xB8)
-            data = TMTouchByte(self._handle, 0x00)
-            result = self._addressDevice(deviceId)
-            data = TMTouchByte(self._handle, 0xBE)
-            data = TMTouchByte(self._handle, 0x00)
-            data = [TMTouchByte(self._handle, 0xFF) for i in range(9)]
-            temp = (0x7F & data[2])
-            temp += ((0x80 & data[1]) >> 7) * 0.5
-            temp += ((0x40 & data[1]) >> 6) * 0.25
-            temp += ((0x20 & data[1]) >> 5) * 0.125
-            temp += ((0x10 & data[1]) >> 4) * 0.0625
-            temp += ((0x08 & data[1]) >> 3) * 0.03125
-            if (0x80 & data[2]) == 0x80:
-                temp = -temp
-            voltage = (((data[4] & 0x03) << 8) + (data[3])) * 0.01
-            # conversion from voltage to humidity, see HIH-4021 datasheet
-            humidity = ((voltage / 5.0) - 0.16) / 0.0062
-            humidity = humidity / (1.0546 - (0.00216 * temp))
-        return {'temperature': temp, 'humidity': humidity}
+        resolution:
+            A optional resolution in bits, 9 to 12, DS18B20 only.
+        
+        th:
+            A optional upper alarm threshold in degrees Celsius.
+        
+        tl:
+            A optional lower alarm threshold in degrees Celsius.
+        
+        copyToEeprom:
+            Copies the configuration to EEPROM when True, where it is kept through power loss.
+        
+        returns the configuration read back from the device, see readConfiguration.
+        """
+        driver = self._configurableDriver(deviceId)
+        self._backend.deviceId = deviceId
+        try:
+            return driver.writeConfiguration(deviceId, resolution, th, tl, copyToEeprom)
+        finally:
+            self._backend.deviceId = None
+
+    def readConfigurations(self, devices=None, familyFilter=None):
+        """
+        Reads the configuration of a list of devices, see readConfiguration.
+        
+        devices:
+            A optional list of device ids, all known devices with a configuration if omitted.
+        
+        familyFilter:
+            A optional list of integers or strings where integers are the device family code and strings is the device
+            family name.
+        
+        returns a dict of configurations by device id.
+        """
+        return dict((deviceId, self.readConfiguration(deviceId))
+            for deviceId in self._configurableDevices(devices, familyFilter))
+
+    def writeConfigurations(self, devices=None, familyFilter=None, resolution=None, th=None, tl=None,
+            copyToEeprom=False):
+        """
+        Writes the configuration of a list of devices, see writeConfiguration. For example
+        writeConfigurations(familyFilter=[0x28], resolution=10) sets all DS18B20s to 10 bits.
+        
+        devices:
+            A optional list of device ids, all known devices with a configuration if omitted. Only the devices with a
+            programmable resolution are included if a resolution is given.
+        
+        familyFilter:
+            A optional list of integers or strings where integers are the device family code and strings is the device
+            family name.
+        
+        returns a dict of the configurations read back by device id.
+        """
+        return dict((deviceId, self.writeConfiguration(deviceId, resolution, th, tl, copyToEeprom))
+            for deviceId in self._configurableDevices(devices, familyFilter, resolution))
+
+    def transaction(self, deviceId, command, readCount=0):
+        """
+        Addresses a device and sends a command to it in a single block transfer, reset, MATCH ROM, the command and
+        the read time slots.
+        
+        deviceId:
+            The device id of the device. Must have been enumerated.
+        
+        command:
+            The command as an integer, or a sequence of bytes for commands with parameters.
+        
+        readCount:
+            A optional number of bytes to read after the command.
+        
+        returns the bytes read as a bytes object.
+        """
+        return bytes(self._transaction(deviceId, command, readCount))
+
+    def _transaction(self, deviceId, command, readCount=0):
+        """
+        Same as transaction but returns a bytearray.
+        """
+        if isinstance(command, int):
+            command = [command]
+        return self._runFrame(deviceId, self._frame(deviceId, command, readCount), command, readCount)
+
+    def _frame(self, deviceId, command, readCount):
+        """
+        Returns the frame of a transaction, MATCH ROM, the ROM, the command and the read time slots.
+        """
+        return bytearray([0x55]) + self._rom(deviceId) + bytearray(command) + bytearray([0xFF] * readCount)
+
+    def _runFrame(self, deviceId, frame, command, readCount):
+        """
+        Sends the frame of a transaction, see _frame, and returns the bytes read.
+        """
+        info = self._devices.get(deviceId)
+        if info is not None and info.branch is not None:
+            self._selectBranch(info.branch)
+        if self._overdrive and not self._overdriveBus and self._devices[deviceId].overdrive:
+            return self._overdriveTransaction(deviceId, command, readCount)
+        with self.metrics.time('transaction', deviceId, size=len(frame)):
+            result = self._backend.touchBlock(frame, reset=True)
+        return result[len(frame) - readCount:]
+
+    def _overdriveTransaction(self, deviceId, command, readCount):
+        """
+        Same as _transaction but addresses the device with OVERDRIVE MATCH ROM and runs the rest of the transaction at
+        overdrive speed, for a device that supports overdrive on a bus that runs at standard speed.
+        """
+        backend = self._backend
+        frame = self._rom(deviceId) + bytearray(command) + bytearray([0xFF] * readCount)
+        with self.metrics.time('transaction', deviceId, size=len(frame) + 1, overdrive=True):
+            backend.touchReset()
+            backend.touchByte(0x69) # OVERDRIVE MATCH ROM
+            backend.setSpeed(SPEED_OVERDRIVE)
+            try:
+                result = backend.touchBlock(frame)
+            finally:
+                backend.setSpeed(SPEED_STANDARD)
+        return result[len(frame) - readCount:]
+
+    def _rom(self, deviceId):
+        """
+        Returns the ROM of a device as a bytearray.
+        """
+        rom = self._roms.get(deviceId)
+        if rom is None:
+            if deviceId not in self._devices:
+                raise ValueError()
+            rom = bytearray(binascii.unhexlify(deviceId))
+            self._roms[deviceId] = rom
+        return rom
+
+    def _checkScratchpad(self, deviceId, data):
+        """
+        Raises CRCError if a scratchpad read from a device is corrupt. A block of zeros has a valid CRC but is what a
+        shorted bus reads, so it is rejected as well.
+        """
+        if not any(data) or not checkCrc8(data):
+            self.metrics.count('crc_failures', 1, deviceId)
+            raise CRCError('CRC error reading {}'.format(deviceId))
+
+    def _addressDevice(self, deviceId):
+        """
+        Addresses a device on the 1-Wire bus directly.
+        
+        deviceId:
+            The device id of the device to read. Must have been enumerated.
+        """
+        info = self._devices.get(deviceId)
+        if info is not None and info.branch is not None:
+            self._selectBranch(info.branch)
+        self._backend.touchBlock(bytearray([0x55]) + self._rom(deviceId), reset=True) # MATCH ROM
+        return 1
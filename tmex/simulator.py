@@ -0,0 +1,542 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+from collections import deque
+from .system import monotonic
+from .crc import crc8
+from .backend import Backend
+from .backend import LEVEL_NORMAL, PRIME_NONE, RESET_NO_PRESENCE, RESET_PRESENCE, SPEED_STANDARD, SPEED_OVERDRIVE
+from .drivers import BRANCH_MAIN, BRANCH_AUX
+
+# Bus modes of the simulated bus
+_MODE_IDLE = 0
+_MODE_ROM = 1
+_MODE_MATCH = 2
+_MODE_READ_ROM = 3
+_MODE_SEARCH = 4
+_MODE_FUNCTION = 5
+
+# Time on the wire in seconds of a reset and of a time slot, by speed
+_RESET_TIME = {SPEED_STANDARD: 0.00096, SPEED_OVERDRIVE: 0.000099}
+_SLOT_TIME = {SPEED_STANDARD: 0.000065, SPEED_OVERDRIVE: 0.0000095}
+
+class SimulatedDevice(object):
+    """
+    SimulatedDevice is the base class for devices on a simulated 1-Wire bus.
+
+    The bus handles the ROM commands and passes every byte of the function commands to the selected devices through
+    touch. A device answers read time slots by returning the byte it drives on the bus, 0xFF when it is silent.
+
+    Devices with overdriveCapable set enter overdrive on the overdrive ROM commands and only talk at overdrive speed
+    until a reset at standard speed.
+    """
+
+    family = 0x00
+    overdriveCapable = False
+
+    def __init__(self, serial):
+        """
+        Initializes a simulated device.
+
+        serial:
+            The 48-bit serial number of the device.
+        """
+        rom = [self.family] + [(serial >> (8 * i)) & 0xFF for i in range(6)]
+        self.rom = rom + [crc8(rom)]
+        self.deviceId = ''.join(['%02X' % x for x in self.rom])
+        self.overdrive = False
+        self.reset()
+
+    def reset(self):
+        """
+        Called by the bus on a reset pulse.
+        """
+        self._output = deque()
+        self._status = None
+        self._handler = self._command
+
+    def touch(self, byte, now):
+        """
+        Called by the bus for every byte sent to the device after a ROM command has selected it.
+
+        byte:
+            The byte sent by the bus master.
+
+        now:
+            The time of the simulated bus.
+
+        returns the byte the device drives on the bus.
+        """
+        self._update(now)
+        if self._output:
+            return self._output.popleft()
+        if self._status is not None:
+            return self._status(now)
+        handler = self._handler
+        self._handler = None
+        if handler:
+            handler(byte, now)
+        return 0xFF
+
+    def alarming(self, now):
+        """
+        Returns True if the device has an alarm condition and takes part in ALARM SEARCH.
+        """
+        return False
+
+    def connected(self):
+        """
+        Returns the devices the device connects to the bus, the devices on the connected line of a coupler.
+        """
+        return []
+
+    def _update(self, now):
+        pass
+
+    def _command(self, byte, now):
+        pass
+
+    def _sendBlock(self, data):
+        """
+        Queues a block of data followed by its CRC8 to be read by the bus master.
+        """
+        self._output.extend(data)
+        self._output.append(crc8(data))
+
+class SimulatedDS1990A(SimulatedDevice):
+    """
+    Simulated DS1990A serial number iButton.
+    """
+
+    family = 0x01
+
+class SimulatedDS18B20(SimulatedDevice):
+    """
+    Simulated DS18B20 programmable resolution thermometer.
+    """
+
+    family = 0x28
+    conversionTimes = {9: 0.09375, 10: 0.1875, 11: 0.375, 12: 0.75}
+
+    def __init__(self, serial, temperature=20.0, resolution=12, th=75, tl=70):
+        """
+        Initializes a simulated DS18B20.
+
+        serial:
+            The 48-bit serial number of the device.
+
+        temperature:
+            The temperature measured by the device, may be changed at any time.
+
+        resolution:
+            The initial resolution in bits, 9 to 12.
+        """
+        self.temperature = temperature
+        self.resolution = resolution
+        self.th = th
+        self.tl = tl
+        # TH, TL and the resolution in EEPROM, see COPY SCRATCHPAD
+        self.eeprom = (th, tl, resolution)
+        self._latched = 85.0 # Power-on value
+        self._conversionEnd = None
+        self._alarm = False
+        SimulatedDevice.__init__(self, serial)
+
+    def alarming(self, now):
+        self._update(now)
+        return self._alarm
+
+    def _update(self, now):
+        if self._conversionEnd is not None and now >= self._conversionEnd:
+            self._latched = self.temperature
+            self._conversionEnd = None
+            # The alarm flag is updated by every conversion, from the integer part of the temperature
+            whole = int(round(self._latched * 16)) >> 4
+            self._alarm = whole >= self.th or whole <= self.tl
+
+    def _converting(self, now):
+        return 0x00 if self._conversionEnd is not None else 0xFF
+
+    def _command(self, byte, now):
+        if byte == 0x44: # CONVERT T
+            self._conversionEnd = now + self.conversionTimes[self.resolution]
+            self._status = self._converting
+        elif byte == 0xBE: # READ SCRATCHPAD
+            self._output.extend(self.scratchpad())
+        elif byte == 0x4E: # WRITE SCRATCHPAD
+            self._handler = self._writeTH
+        elif byte == 0x48: # COPY SCRATCHPAD
+            self.eeprom = (self.th, self.tl, self.resolution)
+        elif byte == 0xB8: # RECALL E2
+            (self.th, self.tl, self.resolution) = self.eeprom
+        elif byte == 0xB4: # READ POWER SUPPLY, externally powered
+            self._status = lambda now: 0xFF
+
+    def _writeTH(self, byte, now):
+        self.th = byte - 256 if byte > 127 else byte
+        self._handler = self._writeTL
+
+    def _writeTL(self, byte, now):
+        self.tl = byte - 256 if byte > 127 else byte
+        self._handler = self._writeConfiguration
+
+    def _writeConfiguration(self, byte, now):
+        self.resolution = ((byte >> 5) & 0x03) + 9
+
+    def scratchpad(self):
+        """
+        Returns the scratchpad of the device including the CRC.
+        """
+        raw = int(round(self._latched * 16)) & 0xFFFF
+        raw &= ~((1 << (12 - self.resolution)) - 1) & 0xFFFF
+        data = [raw & 0xFF, raw >> 8, self.th & 0xFF, self.tl & 0xFF, ((self.resolution - 9) << 5) | 0x1F, 0xFF, 0x0C,
+            0x10]
+        return data + [crc8(data)]
+
+class SimulatedDS18S20(SimulatedDS18B20):
+    """
+    Simulated DS18S20 thermometer, 9 bits with COUNT REMAIN and COUNT PER C for higher resolution.
+    """
+
+    family = 0x10
+    conversionTimes = {9: 0.75, 10: 0.75, 11: 0.75, 12: 0.75}
+
+    def _writeTL(self, byte, now):
+        # The DS18S20 has no configuration register
+        self.tl = byte - 256 if byte > 127 else byte
+
+    def scratchpad(self):
+        """
+        Returns the scratchpad of the device including the CRC.
+        """
+        raw = int(round(self._latched * 2))
+        countRemain = 16 - int(round((self._latched - (raw >> 1) + 0.25) * 16))
+        countRemain = max(0, min(16, countRemain))
+        raw &= 0xFFFF
+        data = [raw & 0xFF, raw >> 8, self.th & 0xFF, self.tl & 0xFF, 0xFF, 0xFF, countRemain, 0x10]
+        return data + [crc8(data)]
+
+class SimulatedDS2438(SimulatedDevice):
+    """
+    Simulated DS2438 smart battery monitor connected to a HIH-4021 humidity sensor on the VAD input.
+    """
+
+    family = 0x26
+    conversionTime = 0.010
+
+    def __init__(self, serial, temperature=20.0, humidity=50.0, supply=5.0):
+        """
+        Initializes a simulated DS2438.
+
+        serial:
+            The 48-bit serial number of the device.
+
+        temperature:
+            The temperature measured by the device, may be changed at any time.
+
+        humidity:
+            The relative humidity measured by the humidity sensor, may be changed at any time.
+
+        supply:
+            The supply voltage, VDD, of the device and the humidity sensor.
+        """
+        self.temperature = temperature
+        self.humidity = humidity
+        self.supply = supply
+        self._memory = dict((page, [0] * 8) for page in range(8))
+        self._scratchpad = dict((page, [0] * 8) for page in range(8))
+        self._conversion = None
+        SimulatedDevice.__init__(self, serial)
+
+    def _update(self, now):
+        if self._conversion is None or now < self._conversion[1]:
+            return
+        page = self._memory[0]
+        if self._conversion[0] == 0x44:
+            raw = (int(round(self.temperature / 0.03125)) << 3) & 0xFFFF
+            page[1] = raw & 0xFF
+            page[2] = raw >> 8
+        else:
+            if page[0] & 0x08:
+                voltage = self.supply
+            else:
+                rh = self.humidity * (1.0546 - 0.00216 * self.temperature)
+                voltage = self.supply * (0.0062 * rh + 0.16)
+            raw = max(0, min(0x3FF, int(round(voltage / 0.01))))
+            page[3] = raw & 0xFF
+            page[4] = raw >> 8
+        self._conversion = None
+
+    def _converting(self, now):
+        return 0x00 if self._conversion is not None else 0xFF
+
+    def _command(self, byte, now):
+        if byte in (0x44, 0xB4): # CONVERT T, CONVERT V
+            self._conversion = (byte, now + self.conversionTime)
+            self._status = self._converting
+        elif byte == 0xB8: # RECALL MEMORY
+            self._handler = self._recall
+        elif byte == 0xBE: # READ SCRATCHPAD
+            self._handler = self._read
+        elif byte == 0x4E: # WRITE SCRATCHPAD
+            self._handler = self._write
+        elif byte == 0x48: # COPY SCRATCHPAD
+            self._handler = self._copy
+
+    def _recall(self, byte, now):
+        if byte in self._memory:
+            self._scratchpad[byte] = list(self._memory[byte])
+
+    def _read(self, byte, now):
+        if byte in self._scratchpad:
+            self._sendBlock(self._scratchpad[byte])
+
+    def _write(self, byte, now):
+        if byte in self._scratchpad:
+            self._writing = (byte, 0)
+            self._handler = self._writeData
+
+    def _writeData(self, byte, now):
+        page, offset = self._writing
+        self._scratchpad[page][offset] = byte
+        if offset < 7:
+            self._writing = (page, offset + 1)
+            self._handler = self._writeData
+
+    def _copy(self, byte, now):
+        if byte in self._memory:
+            self._memory[byte] = list(self._scratchpad[byte])
+
+class SimulatedDS2409(SimulatedDevice):
+    """
+    Simulated DS2409 MicroLAN coupler with devices on its main and auxiliary lines. The lines are off at power-on.
+    """
+
+    family = 0x1F
+
+    def __init__(self, serial, main=None, aux=None):
+        """
+        Initializes a simulated DS2409.
+
+        serial:
+            The 48-bit serial number of the device.
+
+        main:
+            A optional list of simulated devices on the main line.
+
+        aux:
+            A optional list of simulated devices on the auxiliary line.
+        """
+        self.main = list(main) if main else []
+        self.aux = list(aux) if aux else []
+        # The connected line, BRANCH_MAIN, BRANCH_AUX or None when all lines are off
+        self.line = None
+        SimulatedDevice.__init__(self, serial)
+
+    def connected(self):
+        if self.line == BRANCH_MAIN:
+            return self.main
+        if self.line == BRANCH_AUX:
+            return self.aux
+        return []
+
+    def _command(self, byte, now):
+        if byte == 0x66: # ALL LINES OFF
+            self.line = None
+            self._output.append(byte)
+        elif byte in (0xCC, 0x33): # SMART-ON MAIN, SMART-ON AUXILIARY
+            self.line = BRANCH_MAIN if byte == 0xCC else BRANCH_AUX
+            for device in self.connected():
+                device.reset()
+            # The reset stimulus, then the confirmation byte
+            self._output.extend([0xFF, byte])
+        elif byte == 0xA5: # DIRECT-ON MAIN
+            self.line = BRANCH_MAIN
+            self._output.append(byte)
+
+class SimulatedBackend(Backend):
+    """
+    Backend simulating a 1-Wire bus and its devices in process. Useful for testing and benchmarking without hardware.
+    """
+
+    def __init__(self, devices=None, clock=monotonic):
+        """
+        Initializes a simulated bus.
+
+        devices:
+            A optional list of simulated devices on the bus.
+
+        clock:
+            A optional function returning the time of the bus in seconds.
+        """
+        Backend.__init__(self)
+        self.devices = list(devices) if devices else []
+        self.clock = clock
+        self.level = LEVEL_NORMAL
+        self.speed = SPEED_STANDARD
+        # Total time on the wire in seconds of the resets and time slots so far
+        self.wireTime = 0.0
+        self._present = []
+        self._open = False
+        self._mode = _MODE_IDLE
+        self._selected = []
+
+    def addDevice(self, device):
+        """
+        Connects a simulated device to the bus.
+        """
+        self.devices.append(device)
+
+    def removeDevice(self, device):
+        """
+        Disconnects a simulated device from the bus.
+        """
+        self.devices.remove(device)
+
+    def open(self, port=0):
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def valid(self):
+        return self._open
+
+    def touchReset(self):
+        self.wireTime += _RESET_TIME[self.speed]
+        devices = self._connected()
+        if self.speed == SPEED_STANDARD:
+            # A reset at standard speed returns all devices to standard speed
+            for device in devices:
+                device.overdrive = False
+            self._present = devices
+        else:
+            self._present = [device for device in devices if device.overdrive]
+        for device in self._present:
+            device.reset()
+        self._selected = []
+        if not self._present:
+            self._mode = _MODE_IDLE
+            return RESET_NO_PRESENCE
+        self._mode = _MODE_ROM
+        return RESET_PRESENCE
+
+    def touchBit(self, bit):
+        bit &= 0x01
+        self.wireTime += _SLOT_TIME[self.speed]
+        if self._mode == _MODE_SEARCH:
+            return self._searchBit(bit)
+        return bit
+
+    def touchByte(self, byte):
+        byte &= 0xFF
+        if self._mode == _MODE_SEARCH:
+            return Backend.touchByte(self, byte)
+        self.wireTime += 8 * _SLOT_TIME[self.speed]
+        if self._mode == _MODE_FUNCTION:
+            now = self.clock()
+            overdrive = self.speed == SPEED_OVERDRIVE
+            result = byte
+            for device in self._selected:
+                # A device only sees the time slots at its own speed
+                if device.overdrive == overdrive:
+                    result &= device.touch(byte, now)
+            return result
+        if self._mode == _MODE_ROM:
+            return self._romCommand(byte)
+        if self._mode == _MODE_MATCH:
+            self._buffer.append(byte)
+            if len(self._buffer) == 8:
+                if self._overdriveMatch:
+                    # The ROM of OVERDRIVE MATCH ROM is sent at overdrive speed
+                    self._selected = []
+                    if self.speed == SPEED_OVERDRIVE:
+                        for device in self._present:
+                            if device.overdriveCapable and device.rom == self._buffer:
+                                device.overdrive = True
+                                self._selected.append(device)
+                else:
+                    self._selected = [device for device in self._present if device.rom == self._buffer]
+                self._mode = _MODE_FUNCTION
+            return byte
+        if self._mode == _MODE_READ_ROM:
+            result = byte
+            for device in self._present:
+                result &= device.rom[self._index]
+            self._index += 1
+            if self._index == 8:
+                self._selected = list(self._present)
+                self._mode = _MODE_FUNCTION
+            return result
+        return byte
+
+    def _connected(self):
+        """
+        Returns the devices on the bus and on the lines connected by the couplers.
+        """
+        result = []
+        pending = deque(self.devices)
+        while pending:
+            device = pending.popleft()
+            result.append(device)
+            pending.extend(device.connected())
+        return result
+
+    def oneWireLevel(self, level, prime=PRIME_NONE):
+        self.level = level
+        return level
+
+    def setSpeed(self, speed):
+        self.speed = speed
+        return speed
+
+    def _romCommand(self, byte):
+        if byte == 0xCC: # SKIP ROM
+            self._selected = list(self._present)
+            self._mode = _MODE_FUNCTION
+        elif byte == 0x3C: # OVERDRIVE SKIP ROM
+            self._selected = [device for device in self._present if device.overdriveCapable]
+            for device in self._selected:
+                device.overdrive = True
+            self._mode = _MODE_FUNCTION
+        elif byte in (0x55, 0x69): # MATCH ROM, OVERDRIVE MATCH ROM
+            self._buffer = []
+            self._overdriveMatch = byte == 0x69
+            self._mode = _MODE_MATCH
+        elif byte == 0x33: # READ ROM
+            self._index = 0
+            self._mode = _MODE_READ_ROM
+        elif byte == 0xF0: # SEARCH ROM
+            self._participants = list(self._present)
+            self._index = 0
+            self._phase = 0
+            self._mode = _MODE_SEARCH
+        elif byte == 0xEC: # ALARM SEARCH
+            now = self.clock()
+            self._participants = [device for device in self._present if device.alarming(now)]
+            self._index = 0
+            self._phase = 0
+            self._mode = _MODE_SEARCH
+        else:
+            self._mode = _MODE_IDLE
+        return byte
+
+    def _searchBit(self, bit):
+        index = self._index >> 3
+        mask = 1 << (self._index & 0x07)
+        if self._phase < 2:
+            # Read the bit, then the complement of the bit, of the participating devices
+            value = bit
+            for device in self._participants:
+                deviceBit = 1 if device.rom[index] & mask else 0
+                value &= deviceBit ^ self._phase
+            self._phase += 1
+            return value
+        self._participants = [device for device in self._participants if (1 if device.rom[index] & mask else 0) == bit]
+        self._index += 1
+        self._phase = 0
+        if self._index == 64:
+            self._selected = self._participants
+            self._mode = _MODE_FUNCTION
+        return bit
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import threading
+from collections import deque, namedtuple
+from .system import monotonic
+
+# A batch of readings from a stream.
+#   sequence:  The number of the schedule tick the batch was read at.
+#   scheduled: The monotonic time of the tick.
+#   readout:   The result of Session.readDevices, of Session.readChanges as a dict for a stream of changes.
+#   overruns:  The total number of ticks skipped so far because a read took longer than the interval.
+#   dropped:   The total number of batches dropped so far because the consumer did not keep up.
+StreamBatch = namedtuple('StreamBatch', ['sequence', 'scheduled', 'readout', 'overruns', 'dropped'])
+
+class ReadingStream(object):
+    """
+    ReadingStream reads devices on a fixed-rate schedule in a background thread and hands out the readings as an
+    iterator of StreamBatch.
+
+    The schedule is kept on a monotonic clock, so it does not drift. A read that overruns the interval skips the
+    ticks it overlapped instead of queueing them, and when the consumer is slow the oldest batches in the bounded
+    buffer are dropped. Both are counted in the batches.
+
+    The session must not be used by others while it is streaming.
+    """
+
+    def __init__(self, session, interval, devices=None, familyFilter=None, bufferSize=1, timeStamp=True,
+            changesOnly=False):
+        """
+        Starts a stream, see Session.stream.
+        """
+        if interval <= 0:
+            raise ValueError('interval must be positive')
+        if bufferSize < 1:
+            raise ValueError('bufferSize must be at least 1')
+        self.interval = interval
+        self._session = session
+        self._devices = devices
+        self._familyFilter = familyFilter
+        self._timeStamp = timeStamp
+        self._changesOnly = changesOnly
+        self._buffer = deque(maxlen=bufferSize)
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._error = None
+        self._finished = False
+        self.overruns = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='tmex-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._condition:
+            while not self._buffer and not self._finished:
+                self._condition.wait()
+            if self._buffer:
+                return self._buffer.popleft()
+            if self._error is not None:
+                error = self._error
+                self._error = None
+                raise error
+            raise StopIteration()
+
+    next = __next__ # Python 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Stops the stream and waits for the read in progress to finish.
+        """
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def _run(self):
+        start = monotonic()
+        tick = 0
+        try:
+            while not self._stopped.is_set():
+                scheduled = start + tick * self.interval
+                delay = scheduled - monotonic()
+                if delay > 0 and self._stopped.wait(delay):
+                    break
+                if self._devices is None:
+                    devices = list(self._session.devices().keys())
+                else:
+                    devices = self._devices
+                if self._changesOnly:
+                    changes = self._session.readChanges(devices, self._familyFilter, self._timeStamp)
+                    readout = changes.asDict() if len(changes) else None
+                else:
+                    readout = self._session.readDevices(devices, self._familyFilter, self._timeStamp)
+                if readout is not None:
+                    with self._condition:
+                        if len(self._buffer) == self._buffer.maxlen:
+                            self.dropped += 1
+                        self._buffer.append(StreamBatch(tick, scheduled, readout, self.overruns, self.dropped))
+                        self._condition.notify()
+                tick += 1
+                # Skip the ticks that passed during the read
+                due = int((monotonic() - start) // self.interval) + 1
+                if due > tick:
+                    self.overruns += due - tick
+                    tick = due
+        except Exception as e:
+            self._error = e
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
@@ -2,7 +2,7 @@
 # Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
 # Licensed under the MIT license.
 
-import sys, platform
+import sys, platform, time
 
 ARCHITECTURE_BITS = 0
 # arch_bits should be either '32bit' or '64bit', arch_linker should be 'WindowsPE' on Windows.
@@ -29,4 +29,28 @@ def itervalues(d):
     if ISPYTHON3:
         return d.values()
     else:
-        return d.itervalues()
\ No newline at end of file
+        return d.itervalues()
+
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+else:
+    # Python 2 has no monotonic clock
+    monotonic = time.time
+
+if hasattr(time, 'monotonic_ns'):
+    monotonicNs = time.monotonic_ns
+else:
+    def monotonicNs():
+        """
+        Returns the monotonic clock in nanoseconds.
+        """
+        return int(monotonic() * 1000000000)
+
+if hasattr(time, 'time_ns'):
+    timeNs = time.time_ns
+else:
+    def timeNs():
+        """
+        Returns the time in nanoseconds since the epoch.
+        """
+        return int(time.time() * 1000000000)
@@ -7,10 +7,35 @@ from .system import ARCHITECTURE_BITS
 
 library = "IBFS64.DLL" if ARCHITECTURE_BITS == 64 else "IBFS32.DLL"
 
+class TMEXException(Exception):
+    pass
+
+class _MissingFunction(object):
+    """
+    Stands in for a TMEX function when the TMEX library could not be loaded. Calling it raises a TMEXException so that
+    the package can still be imported on platforms that use another bus backend.
+    """
+
+    def __init__(self, name):
+        self.__name__ = name
+
+    def __call__(self, *args):
+        raise TMEXException("Library '{}' not found".format(library))
+
+class _MissingLibrary(object):
+    def __getattr__(self, name):
+        return _MissingFunction(name)
+
 try:
     dll = ctypes.windll.LoadLibrary(library)
 except:
-    raise Exception("Library '{}' not found".format(library))
+    dll = _MissingLibrary()
+
+def available():
+    """
+    Returns True if the TMEX library was loaded.
+    """
+    return not isinstance(dll, _MissingLibrary)
 
 PortTypes = {
     1: "Older DS9097E-type serial port adapter",
@@ -100,6 +125,44 @@ TMNextMessages = {
     -201: "Required hardware driver not found",
 }
 
+TMFirstAlarm = dll.TMFirstAlarm
+TMFirstAlarm.argtypes = [ctypes.c_long, ctypes.c_char_p]
+TMFirstAlarm.restype = ctypes.c_short
+TMFirstAlarmMessages = {
+    0: "Device not found",
+    1: "Device found",
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
+TMNextAlarm = dll.TMNextAlarm
+TMNextAlarm.argtypes = [ctypes.c_long, ctypes.c_char_p]
+TMNextAlarm.restype = ctypes.c_short
+TMNextAlarmMessages = {
+    0: "Device not found",
+    1: "Device found",
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
+TMFamilySearchSetup = dll.TMFamilySearchSetup
+TMFamilySearchSetup.argtypes = [ctypes.c_long, ctypes.c_char_p, ctypes.c_short]
+TMFamilySearchSetup.restype = ctypes.c_short
+TMFamilySearchSetupMessages = {
+    1: "Success",
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
 TMRom = dll.TMRom
 TMRom.argtypes = [ctypes.c_long, ctypes.c_char_p, ctypes.POINTER(ctypes.c_short)]
 TMRom.restype = ctypes.c_short
@@ -125,6 +188,19 @@ TMAccessMessages = {
     -201: "Required hardware driver not found",
 }
 
+TMStrongAccess = dll.TMStrongAccess
+TMStrongAccess.argtypes = [ctypes.c_long, ctypes.c_char_p]
+TMStrongAccess.restype = ctypes.c_short
+TMStrongAccessMessages = {
+    0: "Device not found",
+    1: "Device found",
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
 TMCRC = dll.TMCRC
 TMCRC.argtypes = [ctypes.c_short, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_ushort, ctypes.c_short]
 TMCRC.restype = ctypes.c_short
@@ -170,6 +246,19 @@ TMTouchResetMessages = {
     -201: "Required hardware driver not found",
 }
 
+TMTouchBit = dll.TMTouchBit
+TMTouchBit.argtypes = [ctypes.c_long, ctypes.c_short]
+TMTouchBit.restype = ctypes.c_short
+TMTouchBitMessages = {
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -12: "Failed to communicate with hardware adapter",
+    -13: "An unsolicited event occurred on the 1-Wire",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
 TMTouchByte = dll.TMTouchByte
 TMTouchByte.argtypes = [ctypes.c_long, ctypes.c_short]
 TMTouchByte.restype = ctypes.c_short
@@ -184,6 +273,32 @@ TMTouchByteMessages = {
     -201: "Required hardware driver not found",
 }
 
+TMBlockIO = dll.TMBlockIO
+TMBlockIO.argtypes = [ctypes.c_long, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_short]
+TMBlockIO.restype = ctypes.c_short
+TMBlockIOMessages = {
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -12: "Failed to communicate with hardware adapter",
+    -13: "An unsolicited event occurred on the 1-Wire",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
+TMBlockStream = dll.TMBlockStream
+TMBlockStream.argtypes = [ctypes.c_long, ctypes.POINTER(ctypes.c_ubyte), ctypes.c_short]
+TMBlockStream.restype = ctypes.c_short
+TMBlockStreamMessages = {
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -12: "Failed to communicate with hardware adapter",
+    -13: "An unsolicited event occurred on the 1-Wire",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
+
 TMOneWireLevel = dll.TMOneWireLevel
 TMOneWireLevel.argtypes = [ctypes.c_long, ctypes.c_short, ctypes.c_short, ctypes.c_short]
 TMOneWireLevel.restype = ctypes.c_short
@@ -197,5 +312,15 @@ TMOneWireLevelMessages = {
     -201: "Required hardware driver not found",
 }
 
-class TMEXException(Exception):
-    pass
+TMOneWireCom = dll.TMOneWireCom
+TMOneWireCom.argtypes = [ctypes.c_long, ctypes.c_short, ctypes.c_short]
+TMOneWireCom.restype = ctypes.c_short
+TMOneWireComMessages = {
+    -1: "1-Wire network not initialized",
+    -2: "1-Wire network does not exists",
+    -3: "Function not supported",
+    -12: "Failed to communicate with hardware adapter",
+    -13: "An unsolicited event occurred on the 1-Wire",
+    -200: "Session is invalid",
+    -201: "Required hardware driver not found",
+}
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Erik Svensson <erik.public@gmail.com>
+# Licensed under the MIT license.
+
+import time
+from .tmex import TMEXException
+from .system import monotonic
+
+# Part of the expected conversion time to sleep before the first poll
+FIRST_POLL = 0.8
+# Shortest time in seconds between two polls
+MIN_POLL_INTERVAL = 0.002
+# Default timeout as a multiple of the expected conversion time, plus a fixed margin in seconds
+TIMEOUT_FACTOR = 2.0
+TIMEOUT_MARGIN = 0.1
+
+class ConversionTimeout(TMEXException):
+    pass
+
+def pollSchedule(expected, timeout=None, clock=monotonic):
+    """
+    Generator of the delays between polls while waiting for a conversion.
+
+    The first delay covers most of the expected conversion time. The following polls come at a fraction of the
+    expected time, and the interval doubles for each poll once the expected time has passed, so a late device costs
+    few bus transactions. The generator ends at the timeout.
+
+    expected:
+        The expected conversion time in seconds.
+
+    timeout:
+        A optional time in seconds after which the wait fails, TIMEOUT_FACTOR times the expected time plus
+        TIMEOUT_MARGIN if omitted.
+    """
+    if timeout is None:
+        timeout = expected * TIMEOUT_FACTOR + TIMEOUT_MARGIN
+    start = clock()
+    deadline = start + timeout
+    interval = max(MIN_POLL_INTERVAL, expected / 16.0)
+    delay = expected * FIRST_POLL
+    while True:
+        now = clock()
+        if now >= deadline:
+            return
+        yield min(delay, deadline - now)
+        if clock() - start >= expected:
+            interval = min(interval * 2, max(MIN_POLL_INTERVAL, expected / 2.0))
+        delay = interval
+
+def waitForConversion(poll, expected, timeout=None, sleep=time.sleep, clock=monotonic):
+    """
+    Waits for a conversion to finish, following pollSchedule.
+
+    poll:
+        A function returning True when the conversion is done.
+
+    expected:
+        The expected conversion time in seconds.
+
+    timeout:
+        A optional timeout in seconds, see pollSchedule.
+
+    Raises ConversionTimeout if the conversion is not done before the timeout.
+    """
+    for delay in pollSchedule(expected, timeout, clock):
+        if delay > 0:
+            sleep(delay)
+        if poll():
+            return
+    raise ConversionTimeout('Conversion not done in time')